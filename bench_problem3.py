@@ -0,0 +1,465 @@
+"""
+Benchmarks for the contact manager in problem3.py.
+
+Usage:
+    python bench_problem3.py lookup
+    python bench_problem3.py lookup --sizes 1000 100000 1000000
+    python bench_problem3.py search
+    python bench_problem3.py cache --write-share 0.01
+    python bench_problem3.py delete
+    python bench_problem3.py memory --sizes 1000000 10000000
+    python bench_problem3.py fuzzy
+    python bench_problem3.py dedupe --size 1000000
+    python bench_problem3.py concurrent --threads 1 2 4 8 --write-share 0.05
+    python bench_problem3.py server --clients 16 --pipeline 8
+
+Every benchmark builds synthetic contacts with make_contacts(), so the numbers
+can be compared between runs.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+import tracemalloc
+
+from contact_dedupe import find_duplicate_clusters
+from contact_index import levenshtein
+from contact_server import ContactClient, start_server
+from contact_store import ConcurrentContactBook
+from problem3 import (
+    Contact, ContactBook, find_contact_by_name, search_contacts, delete_contact, bulk_delete
+)
+
+
+def make_contacts(n, seed=0):
+    """
+    Build n synthetic contact dictionaries with unique names.
+
+    Args:
+        n (int): Number of contacts
+        seed (int): Seed for the random generator
+
+    Returns:
+        list: List of contact dictionaries
+    """
+    rng = random.Random(seed)
+    first_names = ["Alice", "Bob", "Charlie", "Diana", "Eve", "Frank", "Grace", "Heidi"]
+    last_names = ["Smith", "Jones", "Miller", "Brown", "Davis", "Wilson", "Moore", "Taylor"]
+    domains = ["example.com", "mail.com", "unil.ch", "test.org"]
+    contacts = []
+    for i in range(n):
+        first = rng.choice(first_names)
+        last = rng.choice(last_names)
+        # the number at the end keeps every name unique
+        name = f"{first} {last} {i}"
+        phone = f"555-{rng.randrange(10000):04d}-{i:07d}"
+        # roughly two thirds of the contacts have an email
+        email = f"{first.lower()}.{i}@{rng.choice(domains)}" if rng.random() < 0.66 else ""
+        contacts.append({'name': name, 'phone': phone, 'email': email})
+    return contacts
+
+
+def time_per_call(function, arguments):
+    """
+    Call function once per argument and return the average time in microseconds.
+    """
+    start = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+
+def bench_lookup(sizes, queries=1000):
+    """
+    Compare name lookups on a plain list with lookups on a ContactBook.
+
+    The list functions scan the whole list, so their cost grows with the size;
+    the ContactBook cost should stay flat. The list is only timed up to
+    100000 contacts because it gets too slow after that.
+    """
+    print(f"{'contacts':>10} {'list find':>12} {'book find':>12} {'book exists':>12} {'book miss':>12}")
+    for size in sizes:
+        contacts = make_contacts(size)
+        book = ContactBook(contacts)
+        rng = random.Random(1)
+        # mix of existing names (in another case) and names that do not exist
+        hits = [rng.choice(contacts)['name'].upper() for _ in range(queries)]
+        misses = [f"Nobody {i}" for i in range(queries)]
+
+        if size <= 100000:
+            list_time = time_per_call(lambda name: find_contact_by_name(contacts, name), hits[:100])
+            list_column = f"{list_time:10.2f}us"
+        else:
+            list_column = f"{'-':>12}"
+        find_time = time_per_call(book.find_contact_by_name, hits)
+        exists_time = time_per_call(book.contact_exists, hits)
+        miss_time = time_per_call(book.contact_exists, misses)
+        print(f"{size:>10} {list_column} {find_time:10.2f}us {exists_time:10.2f}us {miss_time:10.2f}us")
+
+
+def bench_search(sizes, queries=200):
+    """
+    Compare search_contacts on a plain list with a ContactBook using the trigram index.
+
+    Uses selective terms (a name suffix and a phone fragment) plus a two letter
+    term, which is too short for the index and falls back to scanning.
+    """
+    print(f"{'contacts':>10} {'term':>10} {'list':>12} {'indexed':>12} {'matches':>8}")
+    for size in sizes:
+        contacts = make_contacts(size)
+        book = ContactBook(contacts, substring_index=True)
+        rng = random.Random(2)
+        picks = [rng.choice(contacts) for _ in range(queries)]
+        term_sets = {
+            "name": [c['name'].split()[-1] for c in picks],
+            "phone": [c['phone'][-7:] for c in picks],
+            "short": ["sm"] * 3,
+        }
+        for label, terms in term_sets.items():
+            list_terms = terms[:20]
+            list_time = time_per_call(lambda term: search_contacts(contacts, term), list_terms)
+            book_time = time_per_call(book.search_contacts, terms)
+            matches = len(book.search_contacts(terms[0]))
+            print(f"{size:>10} {label:>10} {list_time:10.1f}us {book_time:10.1f}us {matches:>8}")
+
+
+def bench_cache(size, queries, popular, write_share, cache_size):
+    """
+    Repeated search_contacts terms with and without the search cache.
+
+    Terms are drawn with a skew (a few popular prefixes asked most of the time)
+    and a share of the calls adds a contact, which invalidates matching terms.
+    """
+    contacts = make_contacts(size)
+    rng = random.Random(3)
+    pool = sorted({c['name'].split()[1][:3].lower() for c in contacts})[:popular]
+    pool += [c['phone'][4:8] for c in contacts[:popular]]
+    # weight 1/rank, so the first terms are asked much more often
+    terms = rng.choices(pool, weights=[1 / (rank + 1) for rank in range(len(pool))], k=queries)
+    writes = [rng.random() < write_share for _ in range(queries)]
+    print(f"{'cache size':>10} {'per call':>12} {'hits':>8} {'misses':>8} {'evictions':>9} {'invalidated':>11}")
+    for maxsize in (0, cache_size):
+        book = ContactBook(contacts, search_cache_size=maxsize)
+        start = time.perf_counter()
+        for i, (term, write) in enumerate(zip(terms, writes)):
+            if write:
+                book.add_contact(f"New Person {i}", f"555-{i:04d}")
+            else:
+                book.search_contacts(term)
+        per_call = (time.perf_counter() - start) / queries * 1e6
+        stats = book.search_cache_stats() or {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        print(f"{maxsize:>10} {per_call:10.1f}us {stats['hits']:>8} {stats['misses']:>8} "
+              f"{stats['evictions']:>9} {stats['invalidations']:>11}")
+
+
+def bench_delete(size, deletes):
+    """
+    Delete the same contacts from a list of size contacts in three ways.
+
+    One delete_contact() call per name pops from the list, which shifts the
+    rest of it every time; tombstones avoid the shift; bulk_delete() does a
+    single pass for all names.
+    """
+    contacts = make_contacts(size)
+    names = [contact['name'] for contact in random.Random(3).sample(contacts, deletes)]
+
+    def run(label, delete):
+        work = list(contacts)
+        start = time.perf_counter()
+        delete(work)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>12}: {elapsed:8.3f}s, {len(work)} entries left")
+
+    print(f"deleting {len(names)} of {size} contacts")
+    run("pop", lambda work: [delete_contact(work, name) for name in names])
+    run("tombstone", lambda work: [delete_contact(work, name, tombstone=True) for name in names])
+    run("bulk_delete", lambda work: bulk_delete(work, names))
+
+
+def traced_bytes(build):
+    """
+    Return the bytes tracemalloc sees allocated while build() runs, and its result.
+    """
+    tracemalloc.start()
+    result = build()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used, result
+
+
+def bench_memory(sizes):
+    """
+    Bytes per contact for contact dictionaries and for Contact records.
+
+    The strings are built before tracing starts and shared by both
+    representations, so the numbers are the cost of the record itself plus
+    the list slot pointing to it. The string column shows what the three
+    strings of a contact cost on top of that.
+    """
+    print(f"{'contacts':>10} {'dict':>12} {'Contact':>12} {'strings':>12}")
+    for size in sizes:
+        fields = [(f"Person {i}", f"555-{i:07d}", f"person{i}@example.com") for i in range(size)]
+        string_bytes = sum(len(name) + len(phone) + len(email) + 3 * 49 for name, phone, email in fields)
+
+        dict_bytes, records = traced_bytes(
+            lambda: [{'name': name, 'phone': phone, 'email': email} for name, phone, email in fields]
+        )
+        del records
+        slots_bytes, records = traced_bytes(lambda: [Contact(*row) for row in fields])
+        del records
+        print(f"{size:>10} {dict_bytes / size:10.1f} B {slots_bytes / size:10.1f} B "
+              f"{string_bytes / size:10.1f} B")
+
+
+def bench_fuzzy(sizes, queries=20, max_distance=2):
+    """
+    Typo-tolerant name lookup: brute-force edit distance against the BK-tree.
+
+    Queries are existing names with one character replaced. Brute force is
+    only run for the smaller sizes.
+    """
+    print(f"{'contacts':>10} {'brute force':>14} {'BK-tree':>12} {'build':>10} {'matches':>8}")
+    for size in sizes:
+        contacts = make_contacts(size)
+        book = ContactBook(contacts)
+        rng = random.Random(4)
+        typos = []
+        for contact in rng.sample(contacts, queries):
+            name = contact['name'].lower()
+            position = rng.randrange(len(name))
+            typos.append(name[:position] + "x" + name[position + 1:])
+
+        start = time.perf_counter()
+        book.find_contacts_fuzzy("warm up", max_distance)
+        build_time = time.perf_counter() - start
+
+        if size <= 20000:
+            brute = time_per_call(
+                lambda typo: [c for c in contacts if levenshtein(typo, c['name'].lower()) <= max_distance],
+                typos[:5],
+            )
+            brute_column = f"{brute / 1000:12.1f}ms"
+        else:
+            brute_column = f"{'-':>14}"
+        tree_time = time_per_call(lambda typo: book.find_contacts_fuzzy(typo, max_distance), typos)
+        matches = len(book.find_contacts_fuzzy(typos[0], max_distance))
+        print(f"{size:>10} {brute_column} {tree_time / 1000:10.1f}ms {build_time:9.1f}s {matches:>8}")
+
+
+def make_duplicates(contacts, share, seed=5):
+    """
+    Append reformatted copies of a share of the contacts (in place).
+
+    The copies write the name as "Last, First N", add a country prefix and
+    different separators to the phone, and sometimes contain a typo.
+
+    Returns:
+        int: Number of copies added
+    """
+    rng = random.Random(seed)
+    originals = rng.sample(contacts, int(len(contacts) * share))
+    for contact in originals:
+        first, last, number = contact['name'].split()
+        name = f"{last}, {first} {number}"
+        if rng.random() < 0.3:
+            position = rng.randrange(len(name))
+            name = name[:position] + "x" + name[position + 1:]
+        phone = "+1 " + contact['phone'].replace("-", " ")
+        contacts.append({'name': name, 'phone': phone, 'email': ""})
+    return len(originals)
+
+
+def bench_dedupe(size, share=0.05):
+    """
+    Find the duplicates planted by make_duplicates() in size synthetic contacts.
+    """
+    contacts = make_contacts(size)
+    planted = make_duplicates(contacts, share)
+    start = time.perf_counter()
+    clusters = find_duplicate_clusters(contacts)
+    elapsed = time.perf_counter() - start
+    # every planted copy should land in a cluster with its original
+    found = sum(1 for cluster in clusters if any(index >= size for index in cluster))
+    print(f"{len(contacts)} contacts, {planted} planted duplicates")
+    print(f"{len(clusters)} clusters in {elapsed:.1f}s, {found}/{planted} planted duplicates found")
+
+
+def bench_concurrent(size, thread_counts, write_share, seconds):
+    """
+    Read throughput of a ConcurrentContactBook under a mix of writes.
+
+    Every thread loops for the given time; each operation is a write (add a
+    contact, then delete it again) with probability write_share, otherwise a
+    name lookup. With the GIL the total stays roughly flat as threads are
+    added; the point is that it does not collapse and nothing breaks.
+    """
+    contacts = make_contacts(size)
+    names = [contact['name'] for contact in contacts]
+    print(f"{'threads':>8} {'reads/s':>12} {'writes/s':>10}")
+    for thread_count in thread_counts:
+        book = ConcurrentContactBook(contacts)
+        stop = threading.Event()
+        totals = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            reads = writes = 0
+            while not stop.is_set():
+                if rng.random() < write_share:
+                    name = f"Temp {seed} {writes}"
+                    book.add_contact(name, "555-0000")
+                    book.delete_contact(name)
+                    writes += 1
+                else:
+                    book.find_contact_by_name(rng.choice(names))
+                    reads += 1
+            totals.append((reads, writes))
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        book.check_consistency()
+        reads = sum(r for r, _ in totals)
+        writes = sum(w for _, w in totals)
+        print(f"{thread_count:>8} {reads / seconds:12.0f} {writes / seconds:10.0f}")
+
+
+def percentile(sorted_values, share):
+    """Value below which the given share of sorted_values lies."""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * share))]
+
+
+async def _load(size, clients, pipeline, seconds, host, port):
+    server = None
+    if port is None:
+        # no server given: serve synthetic contacts from this process
+        contacts = make_contacts(size)
+        server = await start_server(ContactBook(contacts), "127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        names = [contact['name'] for contact in contacts]
+    else:
+        names = [contact['name'] for contact in make_contacts(1000)]
+
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def lane(client, seed):
+        # one lane sends a request, waits for it, sends the next
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if rng.random() < 0.8:
+                await client.find(rng.choice(names))
+            else:
+                await client.exists(rng.choice(names))
+            latencies.append(time.perf_counter() - start)
+
+    connections = [await ContactClient.connect(host, port) for _ in range(clients)]
+    start = time.perf_counter()
+    # pipeline lanes per connection share its socket
+    await asyncio.gather(*(
+        lane(client, number * pipeline + depth)
+        for number, client in enumerate(connections)
+        for depth in range(pipeline)
+    ))
+    elapsed = time.perf_counter() - start
+    for client in connections:
+        await client.close()
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    latencies.sort()
+    print(f"{clients} clients x {pipeline} pipelined requests, {len(latencies)} requests in {elapsed:.1f}s")
+    print(f"{len(latencies) / elapsed:.0f} requests/s, "
+          f"p50 {percentile(latencies, 0.5) * 1e3:.2f}ms, p99 {percentile(latencies, 0.99) * 1e3:.2f}ms")
+
+
+def bench_server(size, clients, pipeline, seconds, host, port):
+    """
+    Load generator for contact_server.py, reporting throughput and latency.
+
+    Without --port it starts a server on synthetic contacts in this process,
+    so client and server share one CPU; pass --host/--port of a separately
+    started server for cleaner numbers.
+    """
+    asyncio.run(_load(size, clients, pipeline, seconds, host, port))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for problem3.py")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    lookup = subparsers.add_parser("lookup", help="name lookup cost as the book grows")
+    lookup.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    lookup.add_argument("--queries", type=int, default=1000)
+
+    search = subparsers.add_parser("search", help="substring search with and without the trigram index")
+    search.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    search.add_argument("--queries", type=int, default=200)
+
+    cache = subparsers.add_parser("cache", help="skewed repeated searches with the search cache")
+    cache.add_argument("--size", type=int, default=100000)
+    cache.add_argument("--queries", type=int, default=2000)
+    cache.add_argument("--popular", type=int, default=50)
+    cache.add_argument("--write-share", type=float, default=0.01)
+    cache.add_argument("--cache-size", type=int, default=64)
+
+    delete = subparsers.add_parser("delete", help="one-by-one deletes versus bulk_delete")
+    delete.add_argument("--size", type=int, default=100000)
+    delete.add_argument("--deletes", type=int, default=500)
+
+    memory = subparsers.add_parser("memory", help="bytes per contact, dict versus Contact")
+    memory.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+
+    fuzzy = subparsers.add_parser("fuzzy", help="fuzzy name lookup with the BK-tree")
+    fuzzy.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    fuzzy.add_argument("--max-distance", type=int, default=2)
+
+    dedupe = subparsers.add_parser("dedupe", help="duplicate clusters in synthetic contacts")
+    dedupe.add_argument("--size", type=int, default=1000000)
+    dedupe.add_argument("--share", type=float, default=0.05)
+
+    concurrent = subparsers.add_parser("concurrent", help="multi-threaded reads with a write mix")
+    concurrent.add_argument("--size", type=int, default=100000)
+    concurrent.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    concurrent.add_argument("--write-share", type=float, default=0.05)
+    concurrent.add_argument("--seconds", type=float, default=2.0)
+
+    server = subparsers.add_parser("server", help="load generator for contact_server.py")
+    server.add_argument("--size", type=int, default=100000)
+    server.add_argument("--clients", type=int, default=16)
+    server.add_argument("--pipeline", type=int, default=8)
+    server.add_argument("--seconds", type=float, default=5.0)
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, help="port of a running server (default: start one)")
+
+    args = parser.parse_args()
+    if args.benchmark == "lookup":
+        bench_lookup(args.sizes, args.queries)
+    elif args.benchmark == "search":
+        bench_search(args.sizes, args.queries)
+    elif args.benchmark == "cache":
+        bench_cache(args.size, args.queries, args.popular, args.write_share, args.cache_size)
+    elif args.benchmark == "delete":
+        bench_delete(args.size, args.deletes)
+    elif args.benchmark == "memory":
+        bench_memory(args.sizes)
+    elif args.benchmark == "fuzzy":
+        bench_fuzzy(args.sizes, max_distance=args.max_distance)
+    elif args.benchmark == "dedupe":
+        bench_dedupe(args.size, args.share)
+    elif args.benchmark == "concurrent":
+        bench_concurrent(args.size, args.threads, args.write_share, args.seconds)
+    elif args.benchmark == "server":
+        bench_server(args.size, args.clients, args.pipeline, args.seconds, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Benchmarks for the JSON persistence functions in problem4.py.
+
+Usage:
+    python bench_problem4.py append
+    python bench_problem4.py append --count 100000 --json-count 2000
+    python bench_problem4.py lookup --count 10000000
+    python bench_problem4.py prefilter --count 1000000
+    python bench_problem4.py groupcommit --threads 1 8 32
+    python bench_problem4.py backup --count 1000000
+    python bench_problem4.py stats --count 1000000
+    python bench_problem4.py merge --files 8 --count 100000
+    python bench_problem4.py binary --count 1000000
+
+Contacts come from make_contacts() in bench_problem3.py, and every file is
+written to a temporary directory that is removed afterwards.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from bench_problem3 import make_contacts
+from contact_writer import GroupCommitWriter
+from json_index import load_json_index
+from json_stream import iter_json_array
+from problem4 import (
+    append_contact_to_file, backup_file, get_file_stats, index_json_file, load_contacts_from_file,
+    load_from_json, merge_many_json_files, save_contacts_to_file, save_to_json, search_json_file
+)
+
+
+def time_appends(contacts, filename, file_format):
+    """
+    Append every contact to a new file, one call each.
+
+    Returns:
+        tuple: (seconds for all appends, seconds for the last 10% of them)
+    """
+    tail_start = len(contacts) - max(1, len(contacts) // 10)
+    start = time.perf_counter()
+    tail = start
+    for i, contact in enumerate(contacts):
+        if i == tail_start:
+            tail = time.perf_counter()
+        append_contact_to_file(contact, filename, file_format)
+    end = time.perf_counter()
+    return end - start, end - tail
+
+
+def bench_append(count, json_count):
+    """
+    Compare appends to a JSON list file with appends to a JSON Lines file.
+
+    Every JSON append rewrites the whole file, so N appends take O(N^2) time;
+    the JSON run stops at json_count appends and the time for count appends
+    is extrapolated from that.
+    """
+    contacts = make_contacts(count)
+    print(f"{'format':>8} {'appends':>9} {'total':>10} {'per append':>12} {'last 10%':>12} {'file':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format, n in (('json', min(json_count, count)), ('jsonl', count)):
+            filename = os.path.join(directory, "contacts." + file_format)
+            total, tail = time_appends(contacts[:n], filename, file_format)
+            tail_count = max(1, n // 10)
+            size = os.path.getsize(filename)
+            print(f"{file_format:>8} {n:>9} {total:9.2f}s {total / n * 1e6:10.1f}us "
+                  f"{tail / tail_count * 1e6:10.1f}us {size / 1e6:8.1f}MB")
+            if n < count:
+                print(f"{'':>8} {count:>9} {total * (count / n) ** 2:9.0f}s (estimated, quadratic)")
+
+
+def write_contacts(filename, count, batch=100000):
+    """
+    Write count synthetic contacts as an indented JSON array, a batch at a time,
+    so files larger than memory can be made. Names end in their record number.
+
+    Returns:
+        list: A few of the written names, to look up later
+    """
+    samples = []
+    rng = random.Random(4)
+    with open(filename, "w") as f:
+        f.write("[")
+        for first in range(0, count, batch):
+            contacts = make_contacts(min(batch, count - first), seed=first)
+            lines = []
+            for i, contact in enumerate(contacts):
+                contact['name'] = contact['name'].rsplit(" ", 1)[0] + f" {first + i}"
+                lines.append(json.dumps(contact, indent=2).replace("\n", "\n  "))
+            f.write(("," if first else "") + "\n  " + ",\n  ".join(lines))
+            samples.append(rng.choice(contacts)['name'])
+        f.write("\n]" if count else "]")
+    return samples
+
+
+def bench_lookup(count, queries, scans):
+    """
+    Point lookups by name with the sidecar index versus a full streaming scan.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "contacts.json")
+        start = time.perf_counter()
+        names = write_contacts(filename, count)
+        print(f"wrote {count} contacts ({os.path.getsize(filename) / 1e6:.0f}MB) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        scan_results = [search_json_file(filename, 'name', name) for name in names[:scans]]
+        scan_time = (time.perf_counter() - start) / len(scan_results)
+        print(f"scan:  {scan_time * 1e3:12.1f}ms per lookup ({len(scan_results)} lookups)")
+
+        start = time.perf_counter()
+        index_json_file(filename, ['name', 'phone'])
+        print(f"index: built in {time.perf_counter() - start:.1f}s, "
+              f"{os.path.getsize(filename + '.idx') / 1e6:.0f}MB")
+
+        lookups = [names[i % len(names)] for i in range(queries)]
+        start = time.perf_counter()
+        for name in lookups:
+            search_json_file(filename, 'name', name)
+        index_time = (time.perf_counter() - start) / queries
+        print(f"index: {index_time * 1e3:12.3f}ms per lookup ({queries} lookups, index opened each time)")
+
+        with load_json_index(filename) as index:
+            start = time.perf_counter()
+            for name in lookups:
+                index.search('name', name)
+            open_time = (time.perf_counter() - start) / queries
+        print(f"index: {open_time * 1e3:12.3f}ms per lookup (index kept open)")
+        assert [search_json_file(filename, 'name', name) for name in names[:scans]] == scan_results
+
+
+def bench_prefilter(count, queries):
+    """
+    Selective searches by name: full streaming decode versus the mmap byte prefilter.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "contacts.json")
+        names = write_contacts(filename, count)
+        print(f"{count} contacts, {os.path.getsize(filename) / 1e6:.0f}MB")
+        lookups = [names[i % len(names)] for i in range(queries)]
+        print(f"{'mode':>10} {'per search':>12} {'matches':>8}")
+        for label, prefilter in (("decode", False), ("prefilter", True)):
+            start = time.perf_counter()
+            matches = sum(len(search_json_file(filename, 'name', name, prefilter=prefilter)) for name in lookups)
+            per_search = (time.perf_counter() - start) / queries
+            print(f"{label:>10} {per_search * 1e3:10.1f}ms {matches:>8}")
+
+
+def sustained_writes(write, thread_count, seconds):
+    """
+    Call write(contact) from thread_count threads for about seconds seconds.
+
+    Returns:
+        float: Completed writes per second
+    """
+    stop = threading.Event()
+    counts = [0] * thread_count
+
+    def worker(number):
+        contact = {'name': f"Writer {number}", 'phone': '555-0000', 'email': ''}
+        while not stop.is_set():
+            write(contact)
+            counts[number] += 1
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(thread_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def bench_groupcommit(thread_counts, seconds, initial, max_latency, max_batch):
+    """
+    Sustained appends from many threads: one append_contact_to_file per call
+    (under a lock, since concurrent rewrites would lose contacts) versus a
+    GroupCommitWriter. Each run starts from a file with initial contacts.
+    """
+    print(f"{'threads':>8} {'per call':>14} {'group commit':>14} {'commits':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "contacts.json")
+        lock = threading.Lock()
+
+        def locked_append(contact):
+            with lock:
+                append_contact_to_file(contact, filename)
+
+        for thread_count in thread_counts:
+            save_contacts_to_file(make_contacts(initial), filename)
+            per_call = sustained_writes(locked_append, thread_count, seconds)
+            save_contacts_to_file(make_contacts(initial), filename)
+            with GroupCommitWriter(filename, max_latency, max_batch) as writer:
+                grouped = sustained_writes(writer.append, thread_count, seconds)
+                commits = writer.commits
+            print(f"{thread_count:>8} {per_call:10.0f}/s {grouped:12.0f}/s {commits:>8}")
+
+
+def bench_backup(count):
+    """
+    Back up one contacts file: decode and encode it again (the old backup_file)
+    versus copying the bytes, with and without validation, and an incremental
+    backup of an unchanged file.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "contacts.json")
+        backup = os.path.join(directory, "backup.json")
+        write_contacts(filename, count)
+        print(f"{count} contacts, {os.path.getsize(filename) / 1e6:.0f}MB")
+        runs = [
+            ("parse + dump", lambda: save_to_json(load_from_json(filename), backup)),
+            ("copy", lambda: backup_file(filename, backup, validate=False)),
+            ("copy + validate", lambda: backup_file(filename, backup)),
+            ("incremental, first", lambda: backup_file(filename, backup, incremental=True)),
+            ("incremental, again", lambda: backup_file(filename, backup, incremental=True)),
+        ]
+        for label, run in runs:
+            start = time.perf_counter()
+            run()
+            print(f"{label:>20} {time.perf_counter() - start:8.3f}s")
+
+
+def bench_stats(count):
+    """
+    get_file_stats on one file: json.load, decoding item by item, the byte
+    scan, and the cached result for the unchanged file.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "contacts.json")
+        write_contacts(filename, count)
+        print(f"{count} contacts, {os.path.getsize(filename) / 1e6:.0f}MB")
+        runs = [
+            ("json.load", lambda: len(load_from_json(filename))),
+            ("iter_json_array", lambda: sum(1 for _ in iter_json_array(filename))),
+            ("scan", lambda: get_file_stats(filename, use_cache=False)['count']),
+            ("scan, fill cache", lambda: get_file_stats(filename)['count']),
+            ("cached", lambda: get_file_stats(filename)['count']),
+        ]
+        for label, run in runs:
+            start = time.perf_counter()
+            items = run()
+            print(f"{label:>18} {time.perf_counter() - start:10.4f}s {items:>10}")
+
+
+def bench_merge(file_count, count):
+    """
+    Merge file_count files of count contacts each: loading every file into one
+    list (the old merge_json_files) versus the streaming merge, plain, with
+    dedupe and sorted. Every run is timed, then run again to measure its peak
+    Python memory with tracemalloc.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = []
+        for i in range(file_count):
+            filename = os.path.join(directory, f"contacts{i}.json")
+            # sorted by email, and the files overlap, so dedupe has work to do
+            contacts = make_contacts(count, seed=i // 2)
+            save_to_json(sorted(contacts, key=lambda contact: contact['email']), filename)
+            inputs.append(filename)
+        output = os.path.join(directory, "merged.json")
+        size = sum(os.path.getsize(filename) for filename in inputs)
+        print(f"{file_count} files of {count} contacts, {size / 1e6:.0f}MB")
+
+        def load_all():
+            merged = []
+            for filename in inputs:
+                merged.extend(load_from_json(filename))
+            return save_to_json(merged, output)
+
+        runs = [
+            ("load all", load_all),
+            ("stream", lambda: merge_many_json_files(inputs, output)),
+            ("stream, dedupe", lambda: merge_many_json_files(inputs, output, dedupe_key='email')),
+            ("heap merge, dedupe", lambda: merge_many_json_files(inputs, output, dedupe_key='email', sort_key='email')),
+        ]
+        for label, run in runs:
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:>20} {elapsed:8.3f}s {peak / 1e6:10.1f}MB peak")
+
+
+def bench_binary(count):
+    """
+    Save and load count contacts as indented JSON, JSON Lines and in the
+    binary format: file size, save time and load time.
+    """
+    contacts = make_contacts(count)
+    print(f"{count} contacts")
+    print(f"{'format':>8} {'size':>10} {'save':>9} {'load':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in ('json', 'jsonl', 'binary'):
+            filename = os.path.join(directory, "contacts." + file_format)
+            start = time.perf_counter()
+            save_contacts_to_file(contacts, filename, file_format)
+            saved = time.perf_counter()
+            loaded = load_contacts_from_file(filename, file_format)
+            end = time.perf_counter()
+            assert loaded == contacts
+            size = os.path.getsize(filename)
+            print(f"{file_format:>8} {size / 1e6:8.1f}MB {saved - start:8.2f}s {end - saved:8.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for problem4.py")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    append = subparsers.add_parser("append", help="appends to a JSON list versus JSON Lines")
+    append.add_argument("--count", type=int, default=100000)
+    append.add_argument("--json-count", type=int, default=2000,
+                        help="stop the JSON run after this many appends and extrapolate")
+
+    lookup = subparsers.add_parser("lookup", help="point lookups with the sidecar index versus a scan")
+    lookup.add_argument("--count", type=int, default=10000000)
+    lookup.add_argument("--queries", type=int, default=1000)
+    lookup.add_argument("--scans", type=int, default=3, help="full-scan lookups to time (each reads the whole file)")
+
+    prefilter = subparsers.add_parser("prefilter", help="searches with and without the mmap byte prefilter")
+    prefilter.add_argument("--count", type=int, default=1000000)
+    prefilter.add_argument("--queries", type=int, default=5)
+
+    groupcommit = subparsers.add_parser("groupcommit", help="sustained writes, per-call saves versus group commit")
+    groupcommit.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    groupcommit.add_argument("--seconds", type=float, default=3.0)
+    groupcommit.add_argument("--initial", type=int, default=1000, help="contacts in the file at the start")
+    groupcommit.add_argument("--max-latency", type=float, default=0.005)
+    groupcommit.add_argument("--max-batch", type=int, default=1000)
+
+    backup = subparsers.add_parser("backup", help="parse-and-dump backup versus byte copy")
+    backup.add_argument("--count", type=int, default=1000000)
+
+    stats = subparsers.add_parser("stats", help="get_file_stats: full load, byte scan and cache")
+    stats.add_argument("--count", type=int, default=1000000)
+
+    merge = subparsers.add_parser("merge", help="merging many files: load everything versus streaming")
+    merge.add_argument("--files", type=int, default=8)
+    merge.add_argument("--count", type=int, default=100000, help="contacts per file")
+
+    binary = subparsers.add_parser("binary", help="file size, save and load time: JSON versus the binary format")
+    binary.add_argument("--count", type=int, default=1000000)
+
+    args = parser.parse_args()
+    if args.benchmark == "append":
+        bench_append(args.count, args.json_count)
+    elif args.benchmark == "lookup":
+        bench_lookup(args.count, args.queries, args.scans)
+    elif args.benchmark == "prefilter":
+        bench_prefilter(args.count, args.queries)
+    elif args.benchmark == "groupcommit":
+        bench_groupcommit(args.threads, args.seconds, args.initial, args.max_latency, args.max_batch)
+    elif args.benchmark == "backup":
+        bench_backup(args.count)
+    elif args.benchmark == "stats":
+        bench_stats(args.count)
+    elif args.benchmark == "merge":
+        bench_merge(args.files, args.count)
+    elif args.benchmark == "binary":
+        bench_binary(args.count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Compact binary file format for contacts.
+
+save_contacts_to_file() in problem4.py writes indented JSON, which repeats
+every key of every contact and spends a lot of the file on whitespace.
+A binary contacts file stores every distinct string once, in a string
+table at the start, and every contact as a short record of numbers into
+that table:
+
+    header      magic "PS4C", version, number of records, strings, scalars
+                and shapes, sizes of the two text blocks
+    strings     every distinct key and string value, UTF-8, separated by NUL
+    scalars     every distinct number, true, false and null as JSON text (and
+                strings holding a NUL, JSON-escaped), separated by NUL
+    shapes      the key lists of the contacts: number of keys, then the
+                string number of every key
+    records     length (uint32, bytes after the length), shape number, then
+                one int32 per key: n >= 0 is string n, n < 0 is scalar -1 - n
+
+A contact that is not a dictionary of such values (e.g. one holding a list)
+is stored as a record of shape RAW_RECORD followed by its JSON text.
+Everything is little-endian and packed with struct.
+"""
+
+import json
+import os
+import struct
+from itertools import repeat
+
+from problem3 import Contact
+
+MAGIC = b"PS4C"
+VERSION = 1
+# magic, version, records, strings, scalars, shapes, bytes of strings, bytes of scalars
+_HEADER = struct.Struct("<4sIQIIIQQ")
+_COUNT = struct.Struct("<I")
+# length, shape
+_RECORD_HEAD = struct.Struct("<II")
+# shape of a record that holds the JSON text of the contact
+RAW_RECORD = 0xFFFFFFFF
+CHUNK_SIZE = 1 << 20
+
+
+def write_binary_contacts(contacts, f):
+    """
+    Write contacts to a file opened in binary mode.
+
+    The whole file is built in memory first: the string table comes before
+    the records, and it is only complete after the last contact.
+
+    Args:
+        contacts (list): List of contact dictionaries (or problem3.Contact records)
+        f (file): File opened for writing in binary mode
+
+    Raises:
+        TypeError: If a contact cannot be encoded as JSON
+        OSError: If the file cannot be written
+
+    Example:
+        >>> with open('contacts.bin', 'wb') as f:
+        ...     write_binary_contacts([{'name': 'Alice', 'phone': '555-0001'}], f)
+    """
+    # string -> string number; the dictionary's order is the table's order
+    strings = {}
+    # JSON text -> scalar number
+    scalars = {}
+    # key tuple -> (shape number, Struct of a whole record of that shape)
+    shapes = {}
+    records = []
+
+    def scalar_number(value):
+        # negative number of a JSON scalar (or a string holding a NUL), None for anything else
+        if isinstance(value, str) or value is None or isinstance(value, (bool, int, float)):
+            text = json.dumps(value)
+            number = scalars.get(text)
+            if number is None:
+                number = scalars[text] = -1 - len(scalars)
+            return number
+        return None
+
+    for contact in contacts:
+        record = None
+        if isinstance(contact, Contact):
+            contact = contact.to_dict()
+        if type(contact) is dict:
+            keys = tuple(contact)
+            shape = shapes.get(keys)
+            if shape is None and all(type(key) is str and "\0" not in key for key in keys):
+                for key in keys:
+                    if key not in strings:
+                        strings[key] = len(strings)
+                layout = struct.Struct(f"<II{len(keys)}i")
+                shape = shapes[keys] = (len(shapes), layout, layout.size - 4, [strings[key] for key in keys])
+            if shape is not None:
+                numbers = []
+                for value in contact.values():
+                    if type(value) is str and "\0" not in value:
+                        number = strings.get(value)
+                        if number is None:
+                            number = strings[value] = len(strings)
+                    else:
+                        number = scalar_number(value)
+                        if number is None:
+                            break
+                    numbers.append(number)
+                else:
+                    record = shape[1].pack(shape[2], shape[0], *numbers)
+        if record is None:
+            text = json.dumps(contact).encode("utf-8")
+            record = _RECORD_HEAD.pack(4 + len(text), RAW_RECORD) + text
+        records.append(record)
+
+    string_block = "\0".join(strings).encode("utf-8", "surrogatepass")
+    scalar_block = "\0".join(scalars).encode("utf-8")
+    f.write(_HEADER.pack(MAGIC, VERSION, len(records), len(strings), len(scalars), len(shapes),
+                         len(string_block), len(scalar_block)))
+    f.write(string_block)
+    f.write(scalar_block)
+    for _, _, _, key_numbers in shapes.values():
+        f.write(_COUNT.pack(len(key_numbers)) + struct.pack(f"<{len(key_numbers)}i", *key_numbers))
+    f.write(b"".join(records))
+
+
+def _read(f, size):
+    # checked against the file size first, so a damaged size cannot ask for gigabytes
+    if size > os.fstat(f.fileno()).st_size - f.tell():
+        raise ValueError("binary contacts file is truncated")
+    return f.read(size)
+
+
+def _split(block, count):
+    # the count NUL-separated texts of a block; one split() is much faster than slicing each
+    texts = block.split("\0") if count else []
+    if len(texts) != count:
+        raise ValueError("binary contacts file is damaged: wrong number of strings")
+    return texts
+
+
+def _read_tables(f):
+    # the header, the value table and the shapes at the start of the file
+    header = _read(f, _HEADER.size)
+    magic, version, record_count, string_count, scalar_count, shape_count, string_size, scalar_size = \
+        _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("not a binary contacts file")
+    if version != VERSION:
+        raise ValueError(f"unsupported binary contacts file version {version}")
+    try:
+        strings = _split(_read(f, string_size).decode("utf-8", "surrogatepass"), string_count)
+        scalars = [json.loads(text) for text in _split(_read(f, scalar_size).decode("utf-8"), scalar_count)]
+    except UnicodeDecodeError as error:
+        raise ValueError(f"binary contacts file is damaged: {error}")
+    # scalar n is value -1 - n: Python counts negative indexes from the end
+    values = strings + scalars[::-1]
+
+    shapes = []
+    for _ in range(shape_count):
+        count, = _COUNT.unpack(_read(f, _COUNT.size))
+        key_numbers = struct.unpack(f"<{count}i", _read(f, 4 * count))
+        if any(number < 0 or number >= string_count for number in key_numbers):
+            raise ValueError("binary contacts file is damaged: unknown key")
+        keys = tuple(strings[number] for number in key_numbers)
+        # a record of this shape read as its head only, and as its value numbers only
+        shapes.append((keys, struct.Struct(f"<II{4 * count}x"), struct.Struct(f"<8x{count}i")))
+    return record_count, values, shapes
+
+
+def iter_binary_contacts(filename, chunk_size=CHUNK_SIZE):
+    """
+    Yield the contacts of a binary contacts file one at a time.
+
+    The string table is read first and kept in memory; the records are then
+    read a chunk at a time.
+
+    Args:
+        filename (str): Binary contacts file
+        chunk_size (int): Bytes read at a time
+
+    Yields:
+        The contacts, in the order they were saved
+
+    Raises:
+        ValueError: If the file is not a binary contacts file, or is damaged
+            or truncated; contacts before the damage have already been yielded
+    """
+    with open(filename, "rb") as f:
+        remaining, values, shapes = _read_tables(f)
+        value = values.__getitem__
+        unpack_head = _RECORD_HEAD.unpack_from
+        buffer = b""
+        position = 0
+        while remaining:
+            chunk = f.read(max(chunk_size, 2 * (len(buffer) - position)))
+            if not chunk:
+                raise ValueError("binary contacts file is truncated")
+            buffer = buffer[position:] + chunk
+            position = 0
+            end = len(buffer)
+            view = memoryview(buffer)
+            while remaining and position + 8 <= end:
+                length, shape = unpack_head(buffer, position)
+                if shape == RAW_RECORD:
+                    if position + 4 + length > end:
+                        break
+                    yield json.loads(buffer[position + 8:position + 4 + length])
+                    position += 4 + length
+                    remaining -= 1
+                    continue
+                if shape >= len(shapes):
+                    raise ValueError("binary contacts file is damaged: unknown shape")
+                keys, heads, numbers = shapes[shape]
+                size = numbers.size
+                if length != size - 4:
+                    raise ValueError("binary contacts file is damaged: record does not match its shape")
+                # the records that follow usually have the same shape, so they are decoded
+                # as a run of fixed-size records with iter_unpack(), up to the first one that is not
+                count = min(remaining, (end - position) // size)
+                if not count:
+                    break
+                run_heads = list(heads.iter_unpack(view[position:position + count * size]))
+                head = (length, shape)
+                if run_heads.count(head) != count:
+                    count = next(i for i, other in enumerate(run_heads) if other != head)
+                run = view[position:position + count * size]
+                try:
+                    # one dict(zip(keys, values)) per record, every loop in C
+                    yield from map(dict, map(zip, repeat(keys), map(map, repeat(value), numbers.iter_unpack(run))))
+                except IndexError:
+                    raise ValueError("binary contacts file is damaged: unknown value")
+                position += count * size
+                remaining -= count
+        if position != len(buffer) or f.read(1):
+            raise ValueError("extra data after the last record")
+
+
+def load_binary_contacts(filename):
+    """
+    Load all contacts of a binary contacts file.
+
+    Args:
+        filename (str): Binary contacts file
+
+    Returns:
+        list: List of contacts
+
+    Raises:
+        ValueError: If the file is not a binary contacts file, or is damaged
+    """
+    return list(iter_binary_contacts(filename))
+
+
+def is_binary_contacts_file(filename):
+    """
+    Check whether a file starts like a binary contacts file.
+
+    Args:
+        filename (str): File to check
+
+    Returns:
+        bool: True if the file starts with MAGIC
+    """
+    try:
+        with open(filename, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def count_binary_contacts(filename):
+    """
+    Number of contacts in a binary contacts file, read from its header.
+
+    Args:
+        filename (str): Binary contacts file
+
+    Returns:
+        int: Number of records
+
+    Raises:
+        ValueError: If the file is not a binary contacts file
+    """
+    with open(filename, "rb") as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size or not header.startswith(MAGIC):
+        raise ValueError("not a binary contacts file")
+    return _HEADER.unpack(header)[2]
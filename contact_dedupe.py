@@ -0,0 +1,244 @@
+"""
+Duplicate detection for contact lists merged from several sources.
+
+Comparing every pair of contacts is O(n^2). Instead every contact gets a few
+blocking keys (its email, the last digits of its phone, a phonetic code of its
+name), contacts are grouped by key, and only contacts in the same group are
+compared. Likely duplicates are joined into clusters with a union-find.
+"""
+
+import unicodedata
+from itertools import permutations
+
+from contact_index import levenshtein
+from problem3 import normalize_phone
+
+# phones are compared on their last digits, so "+41 21 692 0001" and "021 692 0001" match
+PHONE_TAIL_DIGITS = 7
+# one typo is allowed per this many characters of the shorter name (at least one)
+NAME_CHARS_PER_TYPO = 5
+# names with more differing words than this are compared in sorted order only
+MAX_PERMUTED_WORDS = 4
+
+# letter -> soundex digit; vowels, h, w and y have no digit
+_SOUNDEX_CODES = {}
+for _letters, _digit in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"), ("l", "4"), ("mn", "5"), ("r", "6")):
+    for _letter in _letters:
+        _SOUNDEX_CODES[_letter] = _digit
+
+
+def normalize_name(name):
+    """
+    Normalize a name for comparing: no accents, no punctuation, lowercase,
+    words sorted so "Smith, John" and "john smith" become the same.
+
+    Args:
+        name (str): Name in any format
+
+    Returns:
+        str: Normalized name
+
+    Example:
+        >>> normalize_name("Müller-Lüdenscheidt, Zoë")
+        'ludenscheidt muller zoe'
+    """
+    # split accented letters into letter + accent and drop the accents
+    decomposed = unicodedata.normalize("NFKD", name.lower())
+    letters = "".join(char for char in decomposed if not unicodedata.combining(char))
+    words = "".join(char if char.isalnum() else " " for char in letters).split()
+    return " ".join(sorted(words))
+
+
+def soundex(word):
+    """
+    American soundex code of a word: first letter plus three digits.
+
+    Args:
+        word (str): A single word (letters only)
+
+    Returns:
+        str: Soundex code, '' for an empty word
+
+    Example:
+        >>> soundex("Robert"), soundex("Rupert")
+        ('R163', 'R163')
+    """
+    word = word.lower()
+    if not word:
+        return ""
+    code = word[0].upper()
+    previous = _SOUNDEX_CODES.get(word[0], "")
+    for letter in word[1:]:
+        digit = _SOUNDEX_CODES.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate two letters with the same code, vowels do
+        if letter not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def name_key(normalized_name):
+    """
+    Blocking key of a normalized name: soundex of every word, numbers kept.
+
+    Example:
+        >>> name_key(normalize_name("Jon Smyth")) == name_key(normalize_name("John Smith"))
+        True
+    """
+    codes = [word if word.isdigit() else soundex(word) for word in normalized_name.split()]
+    return " ".join(sorted(codes))
+
+
+def name_distance(name_a, name_b):
+    """
+    Edit distance between two normalized names, whatever their word order.
+
+    normalize_name() sorts the words, so a typo in a first letter or in the
+    space between two words can move a word to another place. The words the
+    names share are left out, and the rest are compared in every order of
+    the first name's words.
+
+    Example:
+        >>> name_distance(normalize_name("Brown, Eve 12"), normalize_name("Eve xrown 12"))
+        1
+    """
+    words_b = name_b.split()
+    rest_a = []
+    for word in name_a.split():
+        if word in words_b:
+            words_b.remove(word)
+        else:
+            rest_a.append(word)
+    rest_b = " ".join(words_b)
+    if len(rest_a) > MAX_PERMUTED_WORDS:
+        return levenshtein(" ".join(rest_a), rest_b)
+    return min(levenshtein(" ".join(order), rest_b) for order in permutations(rest_a))
+
+
+def _prepare(contact):
+    # the normalized fields of one contact, computed once
+    digits = normalize_phone(contact.get('phone') or "")
+    return (
+        normalize_name(contact.get('name') or ""),
+        digits[-PHONE_TAIL_DIGITS:] if len(digits) >= PHONE_TAIL_DIGITS else "",
+        (contact.get('email') or "").strip().lower(),
+    )
+
+
+def is_likely_duplicate(first, second, max_name_distance=2):
+    """
+    Decide whether two prepared contacts (see _prepare) are the same person.
+
+    They are if they have the same email, or if their names are close and
+    their phones match or one phone is missing. Names are close if they are
+    equal, or within one edit (see name_distance()) per NAME_CHARS_PER_TYPO
+    characters of the shorter name, and at most max_name_distance edits. A fixed distance
+    would join short names of different people, e.g. "Ann Lee" and "Ben Lee"
+    on a shared home phone. With only one phone there is less evidence, so
+    the names must also sound alike (same name_key()).
+
+    Args:
+        first (tuple): (normalized name, phone tail, email) of one contact
+        second (tuple): The same for the other contact
+        max_name_distance (int): Most typos allowed between the names
+
+    Returns:
+        bool: True if they look like duplicates
+    """
+    name_a, phone_a, email_a = first
+    name_b, phone_b, email_b = second
+    if email_a and email_a == email_b:
+        return True
+    if phone_a and phone_b and phone_a != phone_b:
+        return False
+    if not (phone_a or phone_b) and name_a != name_b:
+        # without any phone, only an exact (normalized) name is enough evidence
+        return False
+    if name_a == name_b:
+        return True
+    allowed = min(max_name_distance, max(1, min(len(name_a), len(name_b)) // NAME_CHARS_PER_TYPO))
+    if name_distance(name_a, name_b) > allowed:
+        return False
+    # a matching phone is enough evidence for a typo, a missing one is not
+    return bool(phone_a and phone_b) or name_key(name_a) == name_key(name_b)
+
+
+def find_duplicate_clusters(contacts, max_name_distance=2, max_block_size=1000):
+    """
+    Find groups of contacts that are probably the same person.
+
+    Contacts are grouped into blocks by email, by the last PHONE_TAIL_DIGITS
+    digits of the phone and by name_key(); only pairs inside a block are
+    compared with is_likely_duplicate(). Blocks larger than max_block_size
+    (e.g. a placeholder phone shared by thousands) are skipped, which keeps
+    the work bounded. Tombstones (None) are ignored.
+
+    Args:
+        contacts (list): List of contact dictionaries
+        max_name_distance (int): Most typos allowed between two names (see is_likely_duplicate)
+        max_block_size (int): Largest block that is still compared
+
+    Returns:
+        list: Clusters of two or more indices into contacts, each sorted,
+        ordered by their first index
+
+    Example:
+        >>> find_duplicate_clusters([
+        ...     {'name': 'John Smith', 'phone': '+41 21 692 0001', 'email': ''},
+        ...     {'name': 'Alice', 'phone': '555-0002', 'email': ''},
+        ...     {'name': 'Smith, Jon', 'phone': '021-692-0001', 'email': ''},
+        ... ])
+        [[0, 2]]
+    """
+    prepared = {}
+    blocks = {}
+    for index, contact in enumerate(contacts):
+        if contact is None:
+            continue
+        fields = prepared[index] = _prepare(contact)
+        name, phone_tail, email = fields
+        keys = [('name', name_key(name))] if name else []
+        if phone_tail:
+            keys.append(('phone', phone_tail))
+        if email:
+            keys.append(('email', email))
+        for key in keys:
+            blocks.setdefault(key, []).append(index)
+
+    # union-find over indices; parent only holds indices that were joined
+    parent = {}
+
+    def find(index):
+        root = index
+        while parent.get(root, root) != root:
+            root = parent[root]
+        # point the whole path at the root so later finds are short
+        while parent.get(index, index) != root:
+            parent[index], index = root, parent[index]
+        return root
+
+    compared = set()
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > max_block_size:
+            continue
+        for position, first in enumerate(members):
+            for second in members[position + 1:]:
+                # the same pair can share several blocks
+                if (first, second) in compared:
+                    continue
+                compared.add((first, second))
+                if find(first) == find(second):
+                    continue
+                if is_likely_duplicate(prepared[first], prepared[second], max_name_distance):
+                    root_a, root_b = find(first), find(second)
+                    # the smaller index becomes the root, and roots are kept in parent too
+                    parent.setdefault(min(root_a, root_b), min(root_a, root_b))
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = {}
+    for index in parent:
+        clusters.setdefault(find(index), []).append(index)
+    return sorted(sorted(members) for members in clusters.values() if len(members) > 1)
@@ -0,0 +1,571 @@
+"""
+Index structures used by the contact manager in problem3.py.
+The ContactBook indexes only know about contact keys (the integers the book
+stores its contacts under), so the book decides what text goes into them.
+"""
+
+import hashlib
+import math
+import struct
+import threading
+from bisect import insort
+from collections import OrderedDict
+
+
+class TrigramIndex:
+    """
+    Inverted n-gram index for substring search.
+
+    Every text added for a key is cut into all its substrings of length n
+    (trigrams by default). A term can only be a substring of a text if all of
+    the term's n-grams occur in it, so intersecting the posting sets of the
+    term's n-grams gives a small candidate set that still has to be checked.
+
+    Args:
+        n (int): Gram size (default: 3)
+
+    Example:
+        >>> index = TrigramIndex()
+        >>> index.add(0, ['alice smith', '555-0001'])
+        >>> index.add(1, ['bob jones', '555-0002'])
+        >>> index.candidates('smit')
+        {0}
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        # gram -> set of keys whose texts contain the gram
+        self._postings = {}
+
+    def _grams(self, texts):
+        # all distinct n-grams of all texts
+        n = self.n
+        grams = set()
+        for text in texts:
+            for i in range(len(text) - n + 1):
+                grams.add(text[i:i + n])
+        return grams
+
+    def add(self, key, texts):
+        """
+        Index the texts of one key.
+
+        Args:
+            key (int): Contact key
+            texts (list): Strings to index for this key
+        """
+        for gram in self._grams(texts):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key, texts):
+        """
+        Remove a key; texts must be the same ones that were added for it.
+
+        Args:
+            key (int): Contact key
+            texts (list): Strings that were indexed for this key
+        """
+        for gram in self._grams(texts):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def candidates(self, term):
+        """
+        Keys whose texts may contain term.
+
+        Args:
+            term (str): Search term, at least n characters long
+
+        Returns:
+            set: Candidate keys (a superset of the real matches)
+        """
+        grams = self._grams([term])
+        postings = []
+        for gram in grams:
+            keys = self._postings.get(gram)
+            if keys is None:
+                # one gram that no text has means nothing can match
+                return set()
+            postings.append(keys)
+        # start with the smallest set so the intersection stays cheap
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+
+class PhoneTrie:
+    """
+    Digit trie over normalized phone numbers.
+
+    Each node is a dict from a digit to the child node. A node where a phone
+    number ends also stores the keys of its contacts under the key None.
+    Empty branches are removed on delete, so walking below a prefix only
+    visits nodes that lead to real numbers.
+
+    Example:
+        >>> trie = PhoneTrie()
+        >>> trie.add(0, '5550002')
+        >>> trie.add(1, '5550001')
+        >>> trie.add(2, '4440000')
+        >>> list(trie.iter_keys('555'))
+        [1, 0]
+    """
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, key, digits):
+        """
+        Add a key under a phone number.
+
+        Args:
+            key (int): Contact key
+            digits (str): Normalized phone number (digits only)
+        """
+        node = self._root
+        for digit in digits:
+            node = node.setdefault(digit, {})
+        # kept in key order, so a contact that is removed and added again
+        # (e.g. by an update) keeps its place; new keys are the largest and just go last
+        insort(node.setdefault(None, []), key)
+
+    def remove(self, key, digits):
+        """
+        Remove a key that was added under this phone number.
+
+        Args:
+            key (int): Contact key
+            digits (str): Normalized phone number it was added with
+        """
+        # remember the path so empty nodes can be pruned bottom-up
+        path = [self._root]
+        for digit in digits:
+            path.append(path[-1][digit])
+        keys = path[-1][None]
+        keys.remove(key)
+        if keys:
+            return
+        del path[-1][None]
+        for depth in range(len(digits), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][digits[depth - 1]]
+
+    def iter_keys(self, prefix=""):
+        """
+        Yield the keys of all numbers starting with prefix, ordered by number.
+
+        Keys of the same number come out in key order. Reaching
+        the prefix costs one step per digit, then each result costs at most
+        one step per digit of its number.
+
+        Args:
+            prefix (str): Normalized phone prefix (digits only)
+
+        Yields:
+            int: Contact keys
+        """
+        node = self._root
+        for digit in prefix:
+            node = node.get(digit)
+            if node is None:
+                return
+        # depth-first walk; children are pushed in reverse so '0' comes out first
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            keys = node.get(None)
+            if keys:
+                yield from keys
+            for digit in sorted((d for d in node if d is not None), reverse=True):
+                stack.append(node[digit])
+
+
+def levenshtein(a, b):
+    """
+    Edit distance between two strings (insertions, deletions, substitutions).
+
+    Args:
+        a (str): First string
+        b (str): Second string
+
+    Returns:
+        int: Smallest number of single-character edits turning a into b
+
+    Example:
+        >>> levenshtein("kitten", "sitting")
+        3
+    """
+    # a shared prefix or suffix never changes the distance, and names share a lot of them
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    # only two rows of the table are needed, the shorter string goes along the row
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over words with the edit distance as metric.
+
+    Every child of a node is filed under its distance to that node. By the
+    triangle inequality, a search for words within max_distance of a query
+    at distance d from a node only has to follow the children filed under
+    d - max_distance to d + max_distance, so most of the tree is skipped.
+
+    Removed words stay in the tree as routing nodes and are just marked as
+    dead; `dead` counts them so the owner can rebuild when too many pile up.
+
+    Example:
+        >>> tree = BKTree()
+        >>> for word in ["alice", "alicia", "bob", "rob"]:
+        ...     tree.add(word)
+        >>> sorted(tree.search("alise", 1))
+        [(1, 'alice')]
+    """
+
+    def __init__(self):
+        # a node is [word, alive, {distance: child node}]
+        self._root = None
+        self.size = 0
+        self.dead = 0
+
+    def add(self, word):
+        """
+        Add a word (adding a word twice keeps one copy).
+
+        Args:
+            word (str): Word to add
+        """
+        if self._root is None:
+            self._root = [word, True, {}]
+            self.size += 1
+            return
+        node = self._root
+        while True:
+            distance = levenshtein(word, node[0])
+            if distance == 0:
+                if not node[1]:
+                    node[1] = True
+                    self.dead -= 1
+                    self.size += 1
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [word, True, {}]
+                self.size += 1
+                return
+            node = child
+
+    def remove(self, word):
+        """
+        Remove a word; unknown words are ignored.
+
+        Args:
+            word (str): Word to remove
+        """
+        node = self._root
+        while node is not None:
+            distance = levenshtein(word, node[0])
+            if distance == 0:
+                if node[1]:
+                    node[1] = False
+                    self.dead += 1
+                    self.size -= 1
+                return
+            node = node[2].get(distance)
+
+    def __iter__(self):
+        # yields the live words
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            if node[1]:
+                yield node[0]
+            stack.extend(node[2].values())
+
+    def search(self, word, max_distance):
+        """
+        Find all words within max_distance edits of word.
+
+        Args:
+            word (str): Query word
+            max_distance (int): Largest edit distance to include
+
+        Returns:
+            list: (distance, word) pairs in no particular order
+        """
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = levenshtein(word, node[0])
+            if distance <= max_distance and node[1]:
+                results.append((distance, node[0]))
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return results
+
+
+def email_domain(email):
+    """
+    Lowercased domain of an email address ('' if it has no '@').
+
+    Example:
+        >>> email_domain("Alice@Example.COM")
+        'example.com'
+    """
+    _, at, domain = email.rpartition('@')
+    return domain.lower() if at else ""
+
+
+class DomainIndex:
+    """
+    Index from email domain to the keys of the contacts at that domain.
+
+    Only contacts with a non-empty email are indexed; `total` is the number
+    of indexed keys, which is the number of contacts with an email.
+
+    Example:
+        >>> index = DomainIndex()
+        >>> index.add(0, "alice@example.com")
+        >>> index.add(1, "bob@EXAMPLE.com")
+        >>> index.add(2, "")
+        >>> index.keys("example.com"), index.total
+        ([0, 1], 2)
+    """
+
+    def __init__(self):
+        # domain -> set of keys
+        self._domains = {}
+        self.total = 0
+
+    def add(self, key, email):
+        """
+        Index a key under the domain of its email (empty emails are ignored).
+        """
+        if email == "":
+            return
+        self._domains.setdefault(email_domain(email), set()).add(key)
+        self.total += 1
+
+    def remove(self, key, email):
+        """
+        Remove a key that was added with this email.
+        """
+        if email == "":
+            return
+        domain = email_domain(email)
+        keys = self._domains[domain]
+        keys.remove(key)
+        if not keys:
+            del self._domains[domain]
+        self.total -= 1
+
+    def keys(self, domain):
+        """
+        Keys at a domain (case-insensitive), smallest first.
+        """
+        return sorted(self._domains.get(domain.lower(), ()))
+
+    def histogram(self):
+        """
+        Number of keys per domain, most common domain first.
+        """
+        counts = [(domain, len(keys)) for domain, keys in self._domains.items()]
+        counts.sort(key=lambda item: (-item[1], item[0]))
+        return dict(counts)
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings: a "no" is always right, a "yes" may be wrong.
+
+    The bit array size and the number of hash functions are chosen from the
+    expected number of items and the wanted false-positive rate. Bit
+    positions come from a blake2b digest (not hash(), which changes between
+    runs), so a filter saved with to_bytes() still works after a restart.
+
+    Args:
+        capacity (int): Expected number of items
+        error_rate (float): Wanted false-positive rate at that many items
+
+    Example:
+        >>> bloom = BloomFilter(100, error_rate=0.01)
+        >>> bloom.add("alice")
+        >>> "alice" in bloom, "bob" in bloom
+        (True, False)
+    """
+
+    _HEADER = struct.Struct("<4sQI")
+    _MAGIC = b"PS4B"
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        # standard sizing: m = -n ln(p) / ln(2)^2 bits and k = m / n ln(2) hashes
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        # double hashing: k positions from two hashes
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        """
+        Add a string.
+        """
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def to_bytes(self):
+        """
+        Serialize the filter (header and bit array).
+        """
+        return self._HEADER.pack(self._MAGIC, self.size, self.hash_count) + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuild a filter from to_bytes() output.
+
+        Raises:
+            ValueError: If data is not a serialized filter
+        """
+        header_size = cls._HEADER.size
+        if len(data) < header_size:
+            raise ValueError("not a bloom filter")
+        magic, size, hash_count = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC or len(data) - header_size != (size + 7) // 8:
+            raise ValueError("not a bloom filter")
+        bloom = cls.__new__(cls)
+        bloom.size = size
+        bloom.hash_count = hash_count
+        bloom._bits = bytearray(data[header_size:])
+        return bloom
+
+
+class SearchCache:
+    """
+    Bounded LRU cache of substring search results.
+
+    Maps a normalized search term to the keys it matched. A term can only
+    match a contact whose search texts contain it, so when a contact is
+    added, removed or changed, invalidate() drops just the terms found in
+    its texts; clear() drops everything at once. All methods take an
+    internal lock, so readers on several threads may share one cache.
+
+    Args:
+        maxsize (int): Most terms kept; the least recently used goes first
+
+    Example:
+        >>> cache = SearchCache(2)
+        >>> cache.put("ali", [0])
+        >>> cache.get("ali"), cache.get("bob")
+        ([0], None)
+        >>> cache.invalidate(["alice", "555-0001"])
+        >>> cache.get("ali")
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        # term -> tuple of keys, least recently used first
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, term):
+        """
+        Keys cached for a term (a new list), None if it is not cached.
+        """
+        with self._lock:
+            keys = self._results.get(term)
+            if keys is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(term)
+            self.hits += 1
+            return list(keys)
+
+    def put(self, term, keys):
+        """
+        Cache the keys a term matched, evicting the least recently used term if full.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._results[term] = tuple(keys)
+            self._results.move_to_end(term)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, texts):
+        """
+        Drop every cached term that is a substring of one of the texts.
+        """
+        with self._lock:
+            stale = [term for term in self._results if any(term in text for text in texts)]
+            for term in stale:
+                del self._results[term]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """
+        Drop every cached term.
+        """
+        with self._lock:
+            self.invalidations += len(self._results)
+            self._results.clear()
+
+    def stats(self):
+        """
+        Counters for monitoring.
+
+        Returns:
+            dict: hits, misses, evictions, invalidations, size and maxsize
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._results),
+                'maxsize': self.maxsize,
+            }
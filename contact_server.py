@@ -0,0 +1,223 @@
+"""
+asyncio query server that owns one ContactBook and answers many clients.
+
+Protocol: one JSON object per line in both directions. A request is
+    {"id": 1, "op": "find", "args": ["Alice"]}
+and its response is
+    {"id": 1, "ok": true, "result": {...}}   or   {"id": 1, "ok": false, "error": "..."}
+Clients may send many requests without waiting (pipelining); responses
+carry the request id. The event loop runs one request at a time, so the
+book needs no lock.
+
+Usage:
+    python contact_server.py contacts.json --port 8765
+    python contact_server.py contacts.json --unix /tmp/contacts.sock
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+
+from problem3 import ContactBook
+from problem4 import load_contacts_from_file
+
+# longest line either side accepts; search results can be long
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+def _plain(contact):
+    # Contact records are not JSON serializable, dict() turns both kinds into a dictionary
+    return None if contact is None else dict(contact)
+
+
+# op name -> function(book, *args) returning something JSON serializable
+OPERATIONS = {
+    'find': lambda book, name: _plain(book.find_contact_by_name(name)),
+    'search': lambda book, term: [_plain(c) for c in book.search_contacts(term)],
+    'exists': lambda book, name: book.contact_exists(name),
+    'delete': lambda book, name: book.delete_contact(name),
+    'add': lambda book, name, phone, email="": _plain(book.add_contact(name, phone, email)),
+    'count': lambda book: len(book),
+}
+
+
+def handle_request(book, line):
+    """
+    Run one request line against the book.
+
+    Args:
+        book (ContactBook): The contacts to query
+        line (bytes): One JSON request
+
+    Returns:
+        dict: The response
+    """
+    try:
+        request = json.loads(line)
+        request_id = request.get('id')
+    except (ValueError, AttributeError):
+        return {'id': None, 'ok': False, 'error': "invalid request"}
+    operation = OPERATIONS.get(request.get('op'))
+    if operation is None:
+        return {'id': request_id, 'ok': False, 'error': f"unknown op {request.get('op')!r}"}
+    try:
+        result = operation(book, *request.get('args', []))
+    except (TypeError, KeyError, AttributeError) as error:
+        # wrong number or type of arguments
+        return {'id': request_id, 'ok': False, 'error': str(error)}
+    return {'id': request_id, 'ok': True, 'result': result}
+
+
+async def _serve_connection(book, reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            response = handle_request(book, line)
+            writer.write(json.dumps(response).encode() + b"\n")
+            # only wait for the socket buffer when it fills up, so pipelined
+            # responses go out in as few writes as possible
+            if writer.transport.get_write_buffer_size() > 64 * 1024:
+                await writer.drain()
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(book, host="127.0.0.1", port=0, path=None):
+    """
+    Start serving a ContactBook.
+
+    Args:
+        book (ContactBook): The contacts to serve
+        host (str): TCP host (ignored when path is given)
+        port (int): TCP port, 0 picks a free one
+        path (str): Unix socket path to listen on instead of TCP
+
+    Returns:
+        asyncio.Server: The running server (see server.sockets for the address)
+    """
+    def on_connect(reader, writer):
+        return _serve_connection(book, reader, writer)
+
+    if path is not None:
+        return await asyncio.start_unix_server(on_connect, path=path, limit=LINE_LIMIT)
+    return await asyncio.start_server(on_connect, host, port, limit=LINE_LIMIT)
+
+
+class ContactClient:
+    """
+    asyncio client for the contact server.
+
+    Every call sends its request right away and waits only for its own
+    response, so many calls awaited together (e.g. with asyncio.gather) are
+    pipelined over the one connection.
+
+    Example:
+        client = await ContactClient.connect("127.0.0.1", 8765)
+        alice, bob = await asyncio.gather(client.find("Alice"), client.find("Bob"))
+        await client.close()
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count()
+        # request id -> future waiting for the response
+        self._pending = {}
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, path=None):
+        """
+        Connect over TCP, or over a Unix socket when path is given.
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._pending.pop(response['id'], None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection to contact server closed"))
+            self._pending.clear()
+
+    async def request(self, op, *args):
+        """
+        Send one request and wait for its result.
+
+        Raises:
+            RuntimeError: If the server answers with an error
+            ConnectionError: If the connection is closed
+        """
+        # once the receiver has stopped, nothing would ever answer the future
+        if self._receiver.done():
+            raise ConnectionError("connection to contact server closed")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(json.dumps({'id': request_id, 'op': op, 'args': list(args)}).encode() + b"\n")
+        response = await future
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    async def find(self, name):
+        return await self.request('find', name)
+
+    async def search(self, search_term):
+        return await self.request('search', search_term)
+
+    async def exists(self, name):
+        return await self.request('exists', name)
+
+    async def delete(self, name):
+        return await self.request('delete', name)
+
+    async def add(self, name, phone, email=""):
+        return await self.request('add', name, phone, email)
+
+    async def count(self):
+        return await self.request('count')
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        await self._receiver
+
+
+async def _main(args):
+    book = ContactBook(load_contacts_from_file(args.filename))
+    server = await start_server(book, args.host, args.port, args.unix)
+    address = args.unix or "%s:%s" % server.sockets[0].getsockname()[:2]
+    print(f"serving {len(book)} contacts on {address}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a contacts file over a socket")
+    parser.add_argument("filename", help="contacts file to load")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,302 @@
+"""
+Read-only contact store in shared memory, built once and attached by many processes.
+
+Every worker that calls load_contacts_from_file() holds its own copy of all
+contacts. Here one process packs the contacts into a single
+multiprocessing.shared_memory block and the others attach to it by name;
+reading decodes only the records a query touches.
+
+Layout of the block (integers in native byte order, the block never leaves the machine):
+    header     magic, version, count, number of contacts with email
+    4 columns  name, phone, email, lowercased name; each is count + 1 uint64
+               start offsets followed by the UTF-8 values, every value ending
+               in a NUL byte so substring searches cannot run into the next one
+    name order count uint32 record numbers sorted by lowercased name
+"""
+
+import re
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from multiprocessing import shared_memory
+
+from problem4 import load_contacts_from_file
+
+MAGIC = b"PS4S"
+VERSION = 1
+_HEADER = struct.Struct("=4sIQQ")
+FIELDS = ('name', 'phone', 'email')
+
+
+def _align(size):
+    # sections start on 8-byte boundaries so the offset arrays can be cast to uint64
+    return (size + 7) & ~7
+
+
+# held while _attach() swaps resource_tracker.register, so two attaches cannot
+# restore each other's replacement
+_register_lock = threading.Lock()
+
+
+def _attach(name):
+    # before Python 3.13 attaching registers the block with the resource tracker,
+    # which unlinks it when the attaching process exits; only the creator should own it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    from multiprocessing import resource_tracker
+    with _register_lock:
+        register = resource_tracker.register
+
+        def register_others(resource, rtype):
+            # only this block is skipped: a block created meanwhile by another thread is still tracked
+            if rtype != "shared_memory" or resource.lstrip("/") != name.lstrip("/"):
+                register(resource, rtype)
+
+        resource_tracker.register = register_others
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedContactStore:
+    """
+    Contacts packed into one shared memory block.
+
+    Build it in one process with create() (or from_file()), pass store.name
+    to the workers and attach() there. Lookups answer like the functions in
+    problem3.py: find_contact_by_name and contact_exists binary search the
+    name order, search_contacts runs a byte search over the name and phone
+    columns instead of looking at every contact in Python.
+
+    The creating process must call unlink() when the store is no longer
+    needed; every process calls close().
+
+    Example:
+        >>> store = SharedContactStore.create([{'name': 'Alice', 'phone': '555-0001', 'email': ''}])
+        >>> reader = SharedContactStore.attach(store.name)
+        >>> reader.find_contact_by_name('ALICE')
+        {'name': 'Alice', 'phone': '555-0001', 'email': ''}
+        >>> reader.close(); store.close(); store.unlink()
+    """
+
+    def __init__(self, block):
+        self._block = block
+        buffer = block.buf
+        magic, version, count, email_count = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"shared memory block {block.name!r} is not a contact store")
+        self._count = count
+        self._email_count = email_count
+        position = _align(_HEADER.size)
+        # column name -> (offsets, values), both zero-copy views into the block
+        self._columns = {}
+        for column in FIELDS + ('lower_name',):
+            offsets = buffer[position:position + 8 * (count + 1)].cast("Q")
+            position += 8 * (count + 1)
+            values = buffer[position:position + offsets[count]]
+            position = _align(position + offsets[count])
+            self._columns[column] = (offsets, values)
+        self._name_order = buffer[position:position + 4 * count].cast("I")
+
+    @property
+    def name(self):
+        """str: Name of the shared memory block, used by attach()."""
+        return self._block.name
+
+    @classmethod
+    def create(cls, contacts, name=None):
+        """
+        Pack contacts into a new shared memory block.
+
+        Args:
+            contacts (list): List of contact dictionaries (tombstones are skipped)
+            name (str): Name for the block (default: a random one)
+
+        Returns:
+            SharedContactStore: The store, owned by this process
+        """
+        contacts = [contact for contact in contacts if contact is not None]
+        count = len(contacts)
+        columns = {
+            'name': [contact['name'] for contact in contacts],
+            'phone': [contact['phone'] for contact in contacts],
+            'email': [contact.get('email', "") for contact in contacts],
+        }
+        columns['lower_name'] = [value.lower() for value in columns['name']]
+
+        encoded = {}
+        size = _align(_HEADER.size)
+        for column in FIELDS + ('lower_name',):
+            values = [value.encode("utf-8") + b"\0" for value in columns[column]]
+            offsets = [0]
+            for value in values:
+                offsets.append(offsets[-1] + len(value))
+            encoded[column] = (offsets, b"".join(values))
+            size = _align(size + 8 * (count + 1) + offsets[-1])
+        lower_values = encoded['lower_name'][1]
+        lower_offsets = encoded['lower_name'][0]
+        # UTF-8 bytes sort like the strings they encode; ties keep the record order
+        name_order = sorted(
+            range(count),
+            key=lambda i: (lower_values[lower_offsets[i]:lower_offsets[i + 1] - 1], i),
+        )
+        size += 4 * count
+
+        block = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        buffer = block.buf
+        email_count = sum(1 for value in columns['email'] if value != "")
+        _HEADER.pack_into(buffer, 0, MAGIC, VERSION, count, email_count)
+        position = _align(_HEADER.size)
+        for column in FIELDS + ('lower_name',):
+            offsets, values = encoded[column]
+            buffer[position:position + 8 * (count + 1)] = array("Q", offsets).tobytes()
+            position += 8 * (count + 1)
+            buffer[position:position + len(values)] = values
+            position = _align(position + len(values))
+        buffer[position:position + 4 * count] = array("I", name_order).tobytes()
+        return cls(block)
+
+    @classmethod
+    def from_file(cls, filename, name=None):
+        """
+        Load a contacts file (see problem4.py) into a new shared memory block.
+        """
+        return cls.create(load_contacts_from_file(filename), name)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach to a store created by another process.
+
+        Args:
+            name (str): The creator's store.name
+
+        Returns:
+            SharedContactStore: A read-only view of the same memory
+        """
+        return cls(_attach(name))
+
+    def close(self):
+        """Release this process's view of the block."""
+        # the memoryviews into the block must go before the block can close
+        for offsets, values in self._columns.values():
+            offsets.release()
+            values.release()
+        self._name_order.release()
+        self._columns = {}
+        self._block.close()
+
+    def unlink(self):
+        """Free the block for good (creating process only, after close())."""
+        self._block.unlink()
+
+    def __len__(self):
+        return self._count
+
+    def _value(self, column, index):
+        offsets, values = self._columns[column]
+        return bytes(values[offsets[index]:offsets[index + 1] - 1]).decode("utf-8")
+
+    def get(self, index):
+        """
+        Decode one record.
+
+        Args:
+            index (int): Record number, 0 to len(store) - 1
+
+        Returns:
+            dict: The contact dictionary
+        """
+        return {field: self._value(field, index) for field in FIELDS}
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self.get(index)
+
+    def _first_with_lower_name(self, lower_name):
+        # binary search in the name order for the first record with this lowercased name
+        target = lower_name.encode("utf-8")
+        offsets, values = self._columns['lower_name']
+        order = self._name_order
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record = order[middle]
+            if bytes(values[offsets[record]:offsets[record + 1] - 1]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count:
+            record = order[low]
+            if bytes(values[offsets[record]:offsets[record + 1] - 1]) == target:
+                return record
+        return None
+
+    def find_contact_by_name(self, name):
+        """
+        Find a contact by name (case-insensitive), like find_contact_by_name() in problem3.py.
+
+        Returns:
+            dict or None: The first contact with this name, None if not found
+        """
+        record = self._first_with_lower_name(name.lower())
+        return None if record is None else self.get(record)
+
+    def contact_exists(self, name):
+        """
+        Check if a contact with the given name exists.
+        """
+        return self._first_with_lower_name(name.lower()) is not None
+
+    def _matching_records(self, column, term):
+        # record numbers whose value in column contains term
+        # re searches the shared memory directly, nothing is copied or decoded;
+        # UTF-8 is self-synchronizing, so a byte match is always a character match
+        offsets, values = self._columns[column]
+        pattern = re.compile(re.escape(term.encode("utf-8")))
+        found = []
+        match = pattern.search(values)
+        while match is not None:
+            record = bisect_right(offsets, match.start()) - 1
+            found.append(record)
+            # the rest of this record does not matter any more
+            match = pattern.search(values, offsets[record + 1])
+        return found
+
+    def search_contacts(self, search_term):
+        """
+        Search for contacts by name or phone (partial match), like search_contacts() in problem3.py.
+
+        Returns:
+            list: Matching contacts in record order
+        """
+        search_term = search_term.lower()
+        if search_term == "" or "\0" in search_term:
+            # everything matches '' and NUL is the separator, so just check every record
+            return [contact for contact in self
+                    if search_term in contact['name'].lower() or search_term in contact['phone']]
+        records = set(self._matching_records('lower_name', search_term))
+        records.update(self._matching_records('phone', search_term))
+        return [self.get(record) for record in sorted(records)]
+
+    def count_contacts_with_email(self):
+        """
+        Count how many contacts have an email address (stored in the header).
+        """
+        return self._email_count
+
+    def get_all_phone_numbers(self):
+        """
+        Extract all phone numbers.
+        """
+        return [self._value('phone', index) for index in range(self._count)]
+
+    def sort_contacts_by_name(self):
+        """
+        Return a new list of contacts sorted by name (case-sensitive, like problem3.py).
+        """
+        return sorted(self, key=lambda contact: contact['name'])
@@ -0,0 +1,171 @@
+"""
+Thread-safe contact store for serving lookups from a thread pool.
+Wraps the ContactBook from problem3.py behind a reader-writer lock.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from problem3 import ContactBook
+
+
+class ReadWriteLock:
+    """
+    Lock that lets many readers in at once but a writer only alone.
+
+    Writers are preferred: once a writer is waiting, new readers wait too,
+    so a steady stream of readers cannot starve the writers. The lock is not
+    reentrant; taking it again in the same thread can deadlock.
+
+    Example:
+        >>> lock = ReadWriteLock()
+        >>> with lock.read_lock():
+        ...     pass
+        >>> with lock.write_lock():
+        ...     pass
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read_lock(self):
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class ConcurrentContactBook:
+    """
+    ContactBook that can be shared between threads.
+
+    Reads run concurrently under the read side of a ReadWriteLock, changes
+    run alone under the write side. Indexes that a ContactBook builds on
+    first use are built up front (and rebuilt after each change if a change
+    dropped one), so reads never modify the book; the only exception is the
+    optional search cache, which has its own lock. Methods that would hand
+    out a live iterator or view return a list snapshot instead.
+
+    Args:
+        contacts (list): Initial list of contact dictionaries (optional)
+        **options: Passed on to ContactBook (substring_index, search_cache_size, ...)
+
+    Example:
+        >>> book = ConcurrentContactBook([{'name': 'Alice', 'phone': '555-0001', 'email': ''}])
+        >>> book.contact_exists('alice')
+        True
+    """
+
+    def __init__(self, contacts=None, **options):
+        self._book = ContactBook(contacts, **options)
+        self._book.build_indexes()
+        self._lock = ReadWriteLock()
+
+    def _read(self, method, *args, **kwargs):
+        with self._lock.read_lock():
+            return method(*args, **kwargs)
+
+    def _write(self, method, *args, **kwargs):
+        with self._lock.write_lock():
+            result = method(*args, **kwargs)
+            self._book.build_indexes()
+            return result
+
+    def __len__(self):
+        return self._read(len, self._book)
+
+    @property
+    def contacts(self):
+        """list: Snapshot of the contacts in insertion order."""
+        return self._read(lambda: self._book.contacts)
+
+    # changes
+
+    def add_contact(self, name, phone, email=""):
+        return self._write(self._book.add_contact, name, phone, email)
+
+    def add_contacts_bulk(self, rows):
+        return self._write(self._book.add_contacts_bulk, rows)
+
+    def delete_contact(self, name):
+        return self._write(self._book.delete_contact, name)
+
+    def bulk_delete(self, names):
+        return self._write(self._book.bulk_delete, names)
+
+    def update_contact(self, name, phone=None, email=None):
+        return self._write(self._book.update_contact, name, phone, email)
+
+    # reads
+
+    def find_contact_by_name(self, name):
+        return self._read(self._book.find_contact_by_name, name)
+
+    def contact_exists(self, name):
+        return self._read(self._book.contact_exists, name)
+
+    def find_contacts_fuzzy(self, name, max_distance=2):
+        return self._read(self._book.find_contacts_fuzzy, name, max_distance)
+
+    def search_contacts(self, search_term):
+        return self._read(self._book.search_contacts, search_term)
+
+    def search_cache_stats(self):
+        return self._read(self._book.search_cache_stats)
+
+    def complete_phone(self, prefix, limit=10):
+        return self._read(self._book.complete_phone, prefix, limit)
+
+    def count_contacts_with_email(self):
+        return self._read(self._book.count_contacts_with_email)
+
+    def contacts_by_email_domain(self, domain):
+        return self._read(self._book.contacts_by_email_domain, domain)
+
+    def email_domain_histogram(self):
+        return self._read(self._book.email_domain_histogram)
+
+    def get_all_phone_numbers(self, sort_by_digits=False):
+        return self._read(self._book.get_all_phone_numbers, sort_by_digits)
+
+    def sort_contacts_by_name(self):
+        return self._read(self._book.sort_contacts_by_name)
+
+    def sorted_contacts_page(self, offset=0, limit=None):
+        """
+        One page of the contacts sorted by name, as a list
+        (the iter_sorted_contacts generator would run outside the lock).
+        """
+        return self._read(lambda: list(self._book.iter_sorted_contacts(offset, limit)))
+
+    def contacts_in_name_range(self, start, end):
+        return self._read(self._book.contacts_in_name_range, start, end)
+
+    def check_consistency(self):
+        return self._read(self._book.check_consistency)
@@ -0,0 +1,235 @@
+"""
+Group commit for contacts files written from many threads.
+
+Every save_contacts_to_file() / append_contact_to_file() call in problem4.py
+rewrites the file on its own. A GroupCommitWriter owns the file instead:
+writes that arrive within a short window are applied together and the file
+is written once for all of them, atomically (temporary file, one fsync,
+rename, fsync of the directory), so readers never see half a file and a
+crash loses no acknowledged write.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from contact_binary import write_binary_contacts
+from problem3 import Contact
+from problem4 import contacts_file_format, load_contacts_from_file
+
+
+def _fsync_directory(filename):
+    # a rename or a new file is only durable once its directory entry is on disk;
+    # Windows cannot open a directory, and makes renames durable on its own
+    if os.name == "nt":
+        return
+    directory = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+class GroupCommitWriter:
+    """
+    Coalesces contact writes from many threads into few atomic file writes.
+
+    A background thread waits for the first write, then up to max_latency
+    seconds (or until max_batch writes are waiting) for more, and commits
+    them all with one write of the file. A caller that waits is answered
+    once its write is on disk.
+
+    The writer assumes it is the only one writing the file: the contacts are
+    loaded once and kept in memory between commits. A JSON Lines file that
+    only gets appends is appended to instead of rewritten.
+
+    Args:
+        filename (str): Contacts file to write (default: contacts.json)
+        max_latency (float): Longest a write waits for others to join its batch, in seconds
+        max_batch (int): Most writes committed together
+        file_format (str): 'json', 'jsonl' or 'binary' (default: detected, see contacts_file_format())
+
+    Example:
+        >>> with GroupCommitWriter('contacts.json', max_latency=0.005) as writer:
+        ...     writer.append({'name': 'Alice', 'phone': '555-0001', 'email': ''})
+        True
+    """
+
+    def __init__(self, filename="contacts.json", max_latency=0.005, max_batch=1000, file_format=None):
+        self.filename = filename
+        self.max_latency = max_latency
+        self.max_batch = max_batch
+        self._format = contacts_file_format(filename, file_format)
+        # the file's contacts as of the last commit, loaded on the first full rewrite
+        self._contacts = None
+        # (operation, argument, future, arrival time) waiting for the next commit
+        self._pending = []
+        # writes submitted but not yet committed, for flush()
+        self._unfinished = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.commits = 0
+        self.writes = 0
+        self._thread = threading.Thread(target=self._run, name="GroupCommitWriter", daemon=True)
+        self._thread.start()
+
+    def _submit(self, operation, argument, wait):
+        future = Future()
+        try:
+            # a contact that cannot be written is refused here, so it does not fail its batch
+            for contact in (argument if operation == 'save' else [argument]):
+                json.dumps(contact, default=Contact.json_default)
+        except (TypeError, ValueError):
+            future.set_result(False)
+            return future.result() if wait else future
+        with self._condition:
+            if self._closed:
+                raise ValueError("GroupCommitWriter is closed")
+            self._pending.append((operation, argument, future, time.monotonic()))
+            self._unfinished += 1
+            self._condition.notify_all()
+        return future.result() if wait else future
+
+    def append(self, contact, wait=True):
+        """
+        Add one contact, like append_contact_to_file().
+
+        Args:
+            contact (dict): Contact dictionary to add
+            wait (bool): Wait until the contact is on disk
+
+        Returns:
+            bool or Future: True if the commit succeeded, False otherwise
+            (at once for a contact that cannot be encoded as JSON); a Future
+            of that when wait is False
+        """
+        return self._submit('append', contact, wait)
+
+    def save(self, contacts, wait=True):
+        """
+        Replace all contacts, like save_contacts_to_file().
+
+        Writes submitted after it in the same batch are applied on top.
+
+        Args:
+            contacts (list): List of contact dictionaries
+            wait (bool): Wait until the contacts are on disk
+
+        Returns:
+            bool or Future: True if the commit succeeded, False otherwise
+            (at once for a contact that cannot be encoded as JSON); a Future
+            of that when wait is False
+        """
+        return self._submit('save', list(contacts), wait)
+
+    def flush(self):
+        """
+        Wait until every write submitted so far is committed.
+        """
+        with self._condition:
+            while self._unfinished:
+                self._condition.wait()
+
+    def close(self):
+        """
+        Commit what is still waiting and stop the background thread.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # give later writes until max_latency after the oldest waiting one to join the batch;
+                # writes left over from a full batch keep their own arrival time
+                deadline = self._pending[0][3] + self.max_latency
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+
+            succeeded = self._commit(batch)
+            for _, _, future, _ in batch:
+                future.set_result(succeeded)
+            with self._condition:
+                self._unfinished -= len(batch)
+                self._condition.notify_all()
+
+    def _commit(self, batch):
+        # writes the batch to the file, returns True if it is on disk
+        try:
+            if self._format == 'jsonl' and all(operation == 'append' for operation, _, _, _ in batch):
+                self._append_lines([contact for _, contact, _, _ in batch])
+            else:
+                if self._contacts is None:
+                    self._contacts = load_contacts_from_file(self.filename, self._format)
+                # the batch is applied to a copy, so a failed write leaves the old state
+                contacts = list(self._contacts)
+                for operation, argument, _, _ in batch:
+                    if operation == 'save':
+                        contacts = list(argument)
+                    else:
+                        contacts.append(argument)
+                self._replace_file(contacts)
+                self._contacts = contacts
+        except (OSError, TypeError, ValueError):
+            return False
+        self.commits += 1
+        self.writes += len(batch)
+        return True
+
+    def _append_lines(self, contacts):
+        lines = "".join(json.dumps(contact, default=Contact.json_default) + "\n" for contact in contacts).encode()
+        created = not os.path.exists(self.filename)
+        with open(self.filename, "a+b") as f:
+            # a cut-off last line must not swallow the first new one
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    lines = b"\n" + lines
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            _fsync_directory(self.filename)
+        if self._contacts is not None:
+            self._contacts.extend(contacts)
+
+    def _replace_file(self, contacts):
+        # write a temporary file next to the real one, then rename it over the real one;
+        # only the writer thread uses the temporary name, so it can be fixed
+        temporary = self.filename + ".tmp"
+        try:
+            with open(temporary, "wb" if self._format == 'binary' else "w") as f:
+                if self._format == 'binary':
+                    write_binary_contacts(contacts, f)
+                elif self._format == 'jsonl':
+                    for contact in contacts:
+                        f.write(json.dumps(contact, default=Contact.json_default) + "\n")
+                else:
+                    json.dump(contacts, f, indent=2, default=Contact.json_default)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.filename)
+            _fsync_directory(self.filename)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
@@ -0,0 +1,299 @@
+"""
+Sidecar index for searching big contact files by key.
+
+search_json_file() in problem4.py decodes every record on every search.
+build_json_index() reads the file once and writes filename + ".idx", which
+maps the value of chosen keys to the byte ranges of the records holding it.
+A search then seeks to just those records and decodes them.
+
+The index stores an 8-byte hash of every value, not the value itself, so it
+stays small; a hash can be shared by two values, which is why every record
+found through the index is checked again after decoding. The index also
+records the size and modification time of the file it was built from and
+is ignored once the file changes.
+
+Usage:
+    python json_index.py rebuild contacts.json --keys name phone email
+    python json_index.py info contacts.json
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from json_stream import iter_json_array_spans
+
+MAGIC = b"PS4X"
+VERSION = 1
+# magic, version, byte order mark, source size, source mtime_ns, number of keys
+_HEADER = struct.Struct("=4sIIQQI")
+_BYTE_ORDER_MARK = 0x01020304
+# per key: length of the key name, number of records
+_KEY_HEADER = struct.Struct("=IQ")
+
+
+def value_token(value):
+    """
+    Text that every value equal to this one (by ==) shares.
+
+    Numbers and booleans are compared as numbers (1 == 1.0 == True), a
+    missing key counts as None, lists and dictionaries all share one token.
+
+    Example:
+        >>> value_token(1) == value_token(1.0) == value_token(True)
+        True
+        >>> value_token("1") == value_token(1)
+        False
+    """
+    if value is None:
+        return "z"
+    if isinstance(value, str):
+        return "s:" + value
+    if isinstance(value, (bool, int, float)):
+        try:
+            return "n:" + repr(float(value))
+        except OverflowError:
+            # too big for a float, so no float can be equal to it
+            return "n:" + str(value)
+    return "o"
+
+
+def _value_hash(value):
+    digest = hashlib.blake2b(value_token(value).encode("utf-8", "surrogatepass"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _iter_record_spans(filename, file_format):
+    # (record, start, end) for every record of a JSON array or JSON Lines file
+    if file_format == 'jsonl':
+        with open(filename, "rb") as f:
+            start = 0
+            for line in f:
+                end = start + len(line)
+                if line.strip():
+                    try:
+                        yield json.loads(line), start, end
+                    except ValueError:
+                        pass
+                start = end
+    else:
+        yield from iter_json_array_spans(filename)
+
+
+def build_json_index(filename, keys, file_format='json'):
+    """
+    Index a contacts file by the given keys and save it as filename + ".idx".
+
+    Args:
+        filename (str): A file holding a JSON array of dictionaries, or JSON Lines
+        keys (list): Keys to index, e.g. ['name', 'phone']
+        file_format (str): 'json' or 'jsonl'
+
+    Returns:
+        int: Number of records indexed
+
+    Raises:
+        OSError: If the file cannot be read or the index cannot be written
+        ValueError: If the file is not valid JSON
+    """
+    keys = list(dict.fromkeys(keys))
+    source = os.stat(filename)
+    hashes = {key: array("Q") for key in keys}
+    starts = array("Q")
+    ends = array("Q")
+    for record, start, end in _iter_record_spans(filename, file_format):
+        if not isinstance(record, dict):
+            continue
+        starts.append(start)
+        ends.append(end)
+        for key in keys:
+            hashes[key].append(_value_hash(record.get(key)))
+
+    # written to a temporary file first, so a reader never sees half an index
+    temporary = filename + ".idx.tmp"
+    with open(temporary, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, _BYTE_ORDER_MARK, source.st_size, source.st_mtime_ns, len(keys)))
+        for key in keys:
+            name = key.encode("utf-8")
+            # records sorted by hash; sorted() is stable, so equal hashes stay in file order
+            order = sorted(range(len(starts)), key=hashes[key].__getitem__)
+            f.write(_KEY_HEADER.pack(len(name), len(order)) + name)
+            f.write(b"\0" * (-f.tell() % 8))
+            f.write(array("Q", (hashes[key][i] for i in order)).tobytes())
+            f.write(array("Q", (starts[i] for i in order)).tobytes())
+            f.write(array("Q", (ends[i] for i in order)).tobytes())
+    os.replace(temporary, filename + ".idx")
+    return len(starts)
+
+
+class JsonIndex:
+    """
+    An index written by build_json_index(), opened with load_json_index().
+
+    The tables are memory-mapped, so opening an index reads only its
+    header; a lookup is a binary search in the hashes of one key.
+
+    Example:
+        >>> index = load_json_index('contacts.json')
+        >>> if index is not None:
+        ...     with index:
+        ...         alice = index.search('name', 'Alice')
+    """
+
+    def __init__(self, filename, index_file):
+        self.filename = filename
+        self._file = index_file
+        self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._map)
+        self._views = [buffer]
+        magic, version, mark, self.source_size, self.source_mtime_ns, key_count = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION or mark != _BYTE_ORDER_MARK:
+            self.close()
+            raise ValueError(f"{index_file.name} is not a JSON index for this machine")
+        # key -> (hashes, starts, ends), zero-copy views into the index file
+        self._tables = {}
+        position = _HEADER.size
+        for _ in range(key_count):
+            name_length, count = _KEY_HEADER.unpack_from(buffer, position)
+            position += _KEY_HEADER.size
+            key = bytes(buffer[position:position + name_length]).decode("utf-8")
+            position += name_length
+            position += -position % 8
+            tables = []
+            for _ in range(3):
+                tables.append(buffer[position:position + 8 * count].cast("Q"))
+                position += 8 * count
+            self._views.extend(tables)
+            self._tables[key] = tuple(tables)
+        if position != len(buffer):
+            self.close()
+            raise ValueError(f"{index_file.name} is damaged")
+
+    @property
+    def keys(self):
+        """list: The indexed keys."""
+        return list(self._tables)
+
+    def spans(self, key, value):
+        """
+        Byte ranges of the records whose key may equal value, in file order.
+
+        Args:
+            key (str): An indexed key
+            value: Value to look up
+
+        Returns:
+            list: (start, end) pairs; may include records that do not match
+
+        Raises:
+            KeyError: If key is not indexed
+        """
+        hashes, starts, ends = self._tables[key]
+        wanted = _value_hash(value)
+        first = bisect_left(hashes, wanted)
+        last = first
+        while last < len(hashes) and hashes[last] == wanted:
+            last += 1
+        return sorted(zip(starts[first:last], ends[first:last]))
+
+    def search(self, key, value):
+        """
+        Records whose key equals value, read straight from their byte ranges.
+
+        Args:
+            key (str): An indexed key
+            value: Value to match
+
+        Returns:
+            list: Matching records in file order
+
+        Raises:
+            KeyError: If key is not indexed
+        """
+        results = []
+        with open(self.filename, "rb") as f:
+            for start, end in self.spans(key, value):
+                f.seek(start)
+                record = json.loads(f.read(end - start))
+                if isinstance(record, dict) and record.get(key) == value:
+                    results.append(record)
+        return results
+
+    def close(self):
+        """Unmap the index file."""
+        # the views into the map must go before the map can close
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._tables = {}
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_json_index(filename):
+    """
+    Open the index saved next to a file, if it is still valid.
+
+    Args:
+        filename (str): The indexed file (not the .idx file)
+
+    Returns:
+        JsonIndex or None: The index, or None if there is none, it is
+        damaged, or the file changed since the index was built
+    """
+    try:
+        source = os.stat(filename)
+        index_file = open(filename + ".idx", "rb")
+    except OSError:
+        return None
+    try:
+        index = JsonIndex(filename, index_file)
+    except (ValueError, TypeError, struct.error):
+        index_file.close()
+        return None
+    if (index.source_size, index.source_mtime_ns) != (source.st_size, source.st_mtime_ns):
+        index.close()
+        return None
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the sidecar index of a contacts file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="(re)build filename.idx")
+    rebuild.add_argument("filename")
+    rebuild.add_argument("--keys", nargs="+", default=["name", "phone", "email"])
+    rebuild.add_argument("--format", choices=["json", "jsonl"], help="default: from the extension")
+    info = subparsers.add_parser("info", help="show whether filename.idx is valid and what it indexes")
+    info.add_argument("filename")
+
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        # problem4 imports this module, so it can only be imported once both are loaded
+        from problem4 import contacts_file_format
+        file_format = contacts_file_format(args.filename, args.format)
+        count = build_json_index(args.filename, args.keys, file_format)
+        print(f"indexed {count} records by {', '.join(args.keys)} in {args.filename}.idx")
+    else:
+        index = load_json_index(args.filename)
+        if index is None:
+            print(f"{args.filename}.idx is missing, damaged or out of date")
+            sys.exit(1)
+        with index:
+            print(f"{args.filename}.idx is valid, keys: {', '.join(index.keys)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+Incremental reader for files holding one big JSON array.
+
+json.load() needs the whole file and the whole parsed list in memory.
+iter_json_array() reads the file in chunks and yields the items of the
+top-level array one at a time, so memory stays at about one chunk plus the
+largest single item, however big the file is.
+"""
+
+import json
+import mmap
+import os
+import re
+
+CHUNK_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+_skip_whitespace_match = re.compile(r"[ \t\n\r]*").match
+# characters that can continue a number, e.g. "12" followed by ".5e3" in the next chunk
+_NUMBER_CHARS = "0123456789+-.eE"
+# the start of a string up to the end of the buffer, or up to a character that ends or breaks it
+_string_prefix_match = re.compile(r'"[^"\\\x00-\x1f]*(?:\\[\s\S][^"\\\x00-\x1f]*)*\\?').match
+# an error this close to the end of the buffer can be a value cut off by the chunk
+# boundary ("tru", "\\u12", "-Infinit"); anything earlier is a real syntax error
+_TRUNCATION_SLACK = 16
+# the start of an array written by json.dump(..., indent=n) whose first item is an object;
+# group 1 is the indentation of the items
+_INDENTED_ARRAY = re.compile(rb"\s*\[\n( +)\{")
+
+
+class _Reader:
+    # a text buffer refilled from a file; consumed text is dropped from the front
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        # characters already dropped from the front, so dropped + position is the file offset
+        self.dropped = 0
+        self.eof = False
+        self.length = 0
+
+    def fill(self):
+        # read more text, at least as much as is already buffered so an item
+        # spanning many chunks is not parsed again once per chunk
+        if self.position > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.position:]
+            self.dropped += self.position
+            self.position = 0
+        chunk = self.f.read(max(self.chunk_size, len(self.buffer) - self.position))
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
+
+    def next_char(self):
+        # the next non-whitespace character (not consumed), '' at the end of the file
+        while True:
+            self.position = _skip_whitespace_match(self.buffer, self.position).end()
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self.fill()
+
+    def decode(self):
+        # decode one value at the next non-whitespace character
+        self.next_char()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as error:
+                # only an error at the end of the buffer is one that more text could fix;
+                # refilling on any error would pull the whole file in behind a bad item
+                stop = error.pos
+                if error.msg.startswith("Unterminated string"):
+                    # the position is where the string starts, not where the decoder gave up
+                    stop = _string_prefix_match(self.buffer, stop).end()
+                if self.eof or stop < len(self.buffer) - _TRUNCATION_SLACK:
+                    raise
+                self.fill()
+                continue
+            # a number that runs up to the end of the buffer may go on in the next chunk
+            if isinstance(value, (int, float)) and not self.eof:
+                following = end
+                while following < len(self.buffer) and self.buffer[following] in _NUMBER_CHARS:
+                    following += 1
+                if following == len(self.buffer):
+                    self.fill()
+                    continue
+            # length of the value just decoded, so callers can find where it started
+            self.length = end - self.position
+            self.position = end
+            return value
+
+
+def iter_json_array(source, chunk_size=CHUNK_SIZE):
+    """
+    Yield the items of the JSON array in a file, one at a time.
+
+    Args:
+        source (str or file): File name, or a file opened in text mode
+        chunk_size (int): Characters read at a time
+
+    Yields:
+        The items of the top-level array, in order
+
+    Raises:
+        ValueError: If the file does not hold a JSON array or is not valid JSON
+            (json.JSONDecodeError is a ValueError); items before the error
+            have already been yielded
+
+    Example:
+        >>> import io
+        >>> list(iter_json_array(io.StringIO('[1, {"a": 2}, "three"]')))
+        [1, {'a': 2}, 'three']
+    """
+    if isinstance(source, str):
+        with open(source, "r") as f:
+            yield from iter_json_array(f, chunk_size)
+        return
+    for value, _, _ in _iter_array(_Reader(source, chunk_size)):
+        yield value
+
+
+def iter_json_array_spans(filename, chunk_size=CHUNK_SIZE):
+    """
+    Like iter_json_array(), but also give the byte range of every item.
+
+    The file is decoded as Latin-1, where one character is one byte, so the
+    decoder's positions are byte offsets; items that are not plain ASCII are
+    decoded again from their UTF-8 bytes.
+
+    Args:
+        filename (str): File holding a JSON array (UTF-8)
+        chunk_size (int): Bytes read at a time
+
+    Yields:
+        tuple: (item, start, end), where the file's bytes [start:end] are the item
+    """
+    with open(filename, "r", encoding="latin-1", newline="") as f:
+        reader = _Reader(f, chunk_size)
+        for value, start, end in _iter_array(reader):
+            text = reader.buffer[start - reader.dropped:end - reader.dropped]
+            if not text.isascii():
+                value = json.loads(text.encode("latin-1"))
+            yield value, start, end
+
+
+def _iter_array(reader):
+    # yields (item, start, end) for the items of the array, offsets counted in characters
+    if reader.next_char() != "[":
+        raise ValueError("file does not hold a JSON array")
+    reader.position += 1
+    if reader.next_char() == "]":
+        reader.position += 1
+    else:
+        while True:
+            value = reader.decode()
+            end = reader.dropped + reader.position
+            yield value, end - reader.length, end
+            separator = reader.next_char()
+            reader.position += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError(f"expected ',' or ']' in JSON array, found {separator!r}")
+    if reader.next_char() != "":
+        raise ValueError("extra data after the JSON array")
+
+
+# a string as json.loads() accepts it: no control characters, only known escapes
+_STRING_PATTERN = re.compile(rb'"[^"\\\x00-\x1f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f]*)*"')
+# a backslash that does not start an escape json.loads() accepts (\\ and \" are gone by then)
+_BAD_ESCAPE = re.compile(rb'\\(?![/bfnrt]|u[0-9a-fA-F]{4})')
+# a number or literal, as json.loads() accepts them
+_SCALAR_PATTERN = re.compile(rb"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?|true|false|null|NaN|-?Infinity")
+_JSON_WHITESPACE = b" \t\r\n"
+# bytes -> brackets, commas, colons and quotes as they are; n for a line break, tab or
+# carriage return and c for any other control character, which a string cannot hold;
+# v for anything else (spaces are deleted before)
+_TOKEN_CLASSES = bytes(
+    byte if byte in b'[]{},:"' else 0x6E if byte in b"\t\n\r" else 0x63 if byte < 0x20 else 0x76
+    for byte in range(256)
+)
+# token classes -> x for brackets, commas, colons and line breaks, to find a v next to one
+_STRUCTURE_CLASSES = bytes(0x78 if byte in b"[]{},:n" else byte for byte in range(256))
+# a complete container in a token stream whose items are single tokens already
+_CONTAINER = re.compile(rb"\[(?:[sv](?:,[sv])*)?\]|\{(?:s:[sv](?:,s:[sv])*)?\}")
+_BRACKET = re.compile(rb"[\[\]{}]")
+_BRACKET_CLOSE = re.compile(rb"[\]}]")
+# the items of the top-level container, each with its comma, and one item alone
+_ITEMS = {"list": re.compile(rb"(?:[sv],)*"), "dict": re.compile(rb"(?:s:[sv],)*")}
+_ITEM = {"list": re.compile(rb"[sv]"), "dict": re.compile(rb"s:[sv]")}
+_CLOSER = {"list": 0x5D, "dict": 0x7D}
+
+
+def scan_json_file(filename, chunk_size=1 << 20):
+    """
+    Type and item count of the top-level JSON value, without decoding it.
+
+    The file is cut at line breaks, which a JSON string cannot contain, and
+    each part is reduced to a stream of string, value, bracket, comma and
+    colon tokens with whole-buffer bytes operations; the file is rejected
+    wherever json.loads() would reject it (strings, escapes, literals,
+    commas between items, trailing commas or data). Items are counted from
+    the commas, and no Python objects are built, so it takes about as long
+    as json.load() but needs memory for a chunk only. A file without line
+    breaks, or whose value is not an array or object, is decoded instead.
+
+    Args:
+        filename (str): JSON file (UTF-8)
+        chunk_size (int): Bytes read at a time
+
+    Returns:
+        tuple: (type, count) with type 'list', 'dict' or 'other'; count is the
+        number of items, of members (keys) or 1
+
+    Raises:
+        ValueError: If the file is empty or not valid JSON
+    """
+    with open(filename, "rb") as f:
+        result = _scan_lines(f, chunk_size)
+    if result is None:
+        result = _scan_decoded(filename, chunk_size)
+    return result
+
+
+def _tokens(segment):
+    # the segment as a token stream: s for a string, v for a number or literal, and the
+    # brackets, commas and colons; ValueError for anything json.loads() would reject
+    if not segment.isascii():
+        segment.decode("utf-8")
+    text = segment
+    if b"\\" in text:
+        # escaped backslashes and quotes are ordinary string content
+        text = text.replace(b"\\\\", b"vv").replace(b'\\"', b"vv")
+    classes = text.translate(_TOKEN_CLASSES, b" ")
+    structure = classes.translate(_STRUCTURE_CLASSES)
+    if not (b"xv" in structure or b"vx" in structure or structure[:1] == b"v" or structure[-1:] == b"v"
+            or (b"\\" in text and _BAD_ESCAPE.search(text))):
+        # every run of v is between two quotes, so it is the content of a string (in valid
+        # JSON two strings are never next to each other); a quote pair around a line break
+        # is left over and goes to the regexes below
+        tokens = classes.translate(None, b"v").replace(b'""', b"s").translate(None, b"n")
+        if not tokens.translate(None, b"[]{},:s"):
+            return tokens
+    # numbers, literals, or strings holding brackets or commas: tokenize with regexes
+    if b"\0" in segment:
+        raise ValueError("invalid JSON: NUL byte")
+    # a NUL stands for each string, so no string can join a literal or another string
+    tokens = _STRING_PATTERN.sub(b"\0", segment)
+    tokens = _SCALAR_PATTERN.sub(b"v", tokens).translate(None, _JSON_WHITESPACE)
+    rest = tokens.translate(None, b"[]{},:\0v")
+    if rest:
+        if rest.startswith(b'"'):
+            raise ValueError("unterminated or invalid string")
+        raise ValueError(f"invalid JSON near {rest[:20]!r}")
+    return tokens.replace(b"\0", b"s")
+
+
+def _collapse(tokens):
+    # replaces every complete container with a single v, innermost first; most records
+    # have one of a few shapes, and bytes.replace() of a whole shape beats a regex
+    for _ in range(8):
+        match = _CONTAINER.search(tokens)
+        if match is None:
+            return tokens
+        tokens = tokens.replace(match.group(), b"v")
+    replaced = 1
+    while replaced:
+        tokens, replaced = _CONTAINER.subn(b"v", tokens)
+    return tokens
+
+
+def _scan_lines(f, chunk_size):
+    # scan of a file with line breaks, every step a C-level bytes operation; None if
+    # the file does not suit it (a top-level scalar, or a line too long to buffer)
+    top = None
+    # the tokens after the last top-level comma: an unfinished item, maybe with
+    # open nested containers
+    pending = b""
+    count = 0
+    done = False
+    carry = b""
+    limit = 4 * max(chunk_size, 1 << 16)
+    while True:
+        chunk = f.read(chunk_size)
+        buffer = carry + chunk
+        if chunk:
+            # JSON strings cannot hold a raw line break, so a segment cut after one
+            # never splits a string, number or literal
+            cut = buffer.rfind(b"\n") + 1
+            if not cut:
+                if len(buffer) > limit:
+                    return None
+                carry = buffer
+                continue
+            segment, carry = buffer[:cut], buffer[cut:]
+        else:
+            segment, carry = buffer, b""
+        tokens = _tokens(segment)
+        if top is None and tokens:
+            if tokens[0] not in b"[{":
+                return None
+            top = "list" if tokens[0] == 0x5B else "dict"
+            tokens = tokens[1:]
+        if done:
+            if tokens:
+                raise ValueError("extra data after the JSON value")
+        elif top is not None:
+            tokens = _collapse(pending + tokens)
+            match = _BRACKET.search(tokens)
+            end = match.start() if match else len(tokens)
+            items_end = tokens.rfind(b",", 0, end) + 1
+            if not _ITEMS[top].fullmatch(tokens, 0, items_end):
+                raise ValueError("invalid JSON: items and commas do not alternate")
+            count += tokens.count(b",", 0, items_end)
+            if match is None or tokens[end] in b"[{":
+                # an unfinished item; a closing bracket after an open one that did not
+                # become a v means the brackets or the items inside are wrong
+                pending = tokens[items_end:]
+                if match is not None and _BRACKET_CLOSE.search(tokens, end):
+                    raise ValueError("invalid JSON: brackets do not match or an item is wrong")
+            else:
+                if tokens[end] != _CLOSER[top]:
+                    raise ValueError("brackets do not match")
+                last = tokens[items_end:end]
+                if _ITEM[top].fullmatch(last):
+                    count += 1
+                elif last or count:
+                    # e.g. "[1,]" or "[1 2]"
+                    raise ValueError("invalid JSON: items and commas do not alternate")
+                if end + 1 < len(tokens):
+                    raise ValueError("extra data after the JSON value")
+                done = True
+        if not chunk:
+            break
+    if top is None:
+        raise ValueError("empty file")
+    if not done:
+        raise ValueError("unexpected end of file")
+    return top, count
+
+
+def _scan_decoded(filename, chunk_size):
+    # a top-level scalar, or a file with too long lines: decoded, a list one item at a time
+    top = json_top_level_type(filename)
+    if top is None:
+        raise ValueError("empty file")
+    if top == "list":
+        return top, sum(1 for _ in iter_json_array(filename, chunk_size))
+    with open(filename, "rb") as f:
+        value = json.load(f)
+    return top, len(value) if top == "dict" else 1
+
+
+def json_top_level_type(source):
+    """
+    Type of the top-level JSON value in a file, from its first character.
+
+    Args:
+        source (str): File name
+
+    Returns:
+        str: 'list', 'dict', 'other', or None for an empty file
+    """
+    with open(source, "r") as f:
+        reader = _Reader(f, 64)
+        first = reader.next_char()
+    if first == "":
+        return None
+    return {"[": "list", "{": "dict"}.get(first, "other")
+
+
+def _record_markers(data):
+    # the bytes that open and close a top-level record of an indented JSON array:
+    # a line break, the indentation of the items and the brace; None for any other layout
+    match = _INDENTED_ARRAY.match(data)
+    if match is None:
+        return None
+    indent = match.group(1)
+    if not data[-len(indent) - 64:].rstrip().endswith(b"\n" + indent + b"}\n]"):
+        return None
+    return b"\n" + indent + b"{", b"\n" + indent + b"}"
+
+
+def _enclosing_record(data, position, markers):
+    # (start, end) of the top-level record around position; a JSON string cannot hold a
+    # raw line break, so the markers are never inside one, and nested objects are
+    # indented deeper
+    opening, closing = markers
+    start = data.rfind(opening, 0, position)
+    if start == -1 or data[start - 1] not in b"[,":
+        return None
+    end = data.find(closing, start)
+    if end == -1 or end + len(closing) <= position:
+        return None
+    return start + len(opening) - 1, end + len(closing)
+
+
+def iter_records_containing(filename, needles, json_lines=False):
+    """
+    Yield the records of a file whose raw bytes contain one of the needles.
+
+    The file is memory-mapped and searched for the needles as bytes, which is
+    much faster than decoding every record; only the records around a hit are
+    decoded. It is a prefilter: a record can contain the bytes somewhere else
+    than the caller cares about, so the caller still checks each record.
+
+    A JSON array has to be laid out as json.dump(..., indent=n) writes a list
+    of objects, with n >= 1: a record is then the object between a line that
+    starts with n spaces and "{" and the next line that starts with n spaces
+    and "}", and an object nested in a record is indented deeper. Any other
+    layout (e.g. a compact file) raises ValueError, and so does a hit outside
+    such a record; the caller then has to decode the whole file.
+
+    Args:
+        filename (str): JSON array or JSON Lines file (UTF-8)
+        needles (list): Byte strings to look for
+        json_lines (bool): The file has one record per line
+
+    Yields:
+        The records with a hit, each once, in file order
+
+    Raises:
+        ValueError: If a JSON array is not laid out as above, or the record
+            around a hit cannot be found or does not decode; records before
+            it may have been yielded
+    """
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            markers = None
+            if not json_lines:
+                markers = _record_markers(data)
+                if markers is None:
+                    raise ValueError("not an indented JSON array of objects")
+            # record start -> record end
+            spans = {}
+            for needle in needles:
+                position = data.find(needle)
+                while position != -1:
+                    if json_lines:
+                        span = (data.rfind(b"\n", 0, position) + 1, data.find(b"\n", position))
+                        if span[1] == -1:
+                            span = (span[0], len(data))
+                    else:
+                        span = _enclosing_record(data, position, markers)
+                        if span is None:
+                            raise ValueError(f"no record found around the match at byte {position}")
+                    spans[span[0]] = span[1]
+                    # the rest of this record does not matter any more
+                    position = data.find(needle, span[1])
+            for start in sorted(spans):
+                try:
+                    record = json.loads(data[start:spans[start]])
+                except ValueError:
+                    # a cut-off line of a JSON Lines file is skipped, as _iter_json_lines() does;
+                    # in an array the layout was not what it looked like
+                    if json_lines:
+                        continue
+                    raise ValueError(f"the record guessed at byte {start} does not decode")
+                yield record
@@ -4,6 +4,102 @@ Build a simple contact manager using lists and dictionaries.
 Practice combining data structures and writing functions.
 """
 
+from bisect import bisect_left, insort
+from itertools import islice
+
+from contact_index import BKTree, BloomFilter, DomainIndex, PhoneTrie, SearchCache, TrigramIndex
+
+# delete_contact(..., tombstone=True) compacts the list once it has seen more
+# tombstones than this share of the list
+TOMBSTONE_COMPACT_RATIO = 0.5
+
+
+class Contact:
+    """
+    Compact contact record that behaves like a contact dictionary.
+
+    Uses __slots__ instead of a per-object dict, which saves most of the
+    container overhead of a contact (see `python bench_problem3.py memory`).
+    contact['name'], contact.get('email') and dict(contact) work as for a
+    dictionary, so every function in this file accepts Contact records and
+    dictionaries alike, and a Contact is equal to the matching dictionary.
+
+    Args:
+        name (str): Contact name
+        phone (str): Contact phone number
+        email (str): Contact email (optional)
+
+    Example:
+        >>> contact = Contact("Alice", "555-0001")
+        >>> contact['name']
+        'Alice'
+        >>> contact == {'name': 'Alice', 'phone': '555-0001', 'email': ''}
+        True
+    """
+
+    __slots__ = ('name', 'phone', 'email')
+
+    def __init__(self, name, phone, email=""):
+        self.name = name
+        self.phone = phone
+        self.email = email
+
+    @classmethod
+    def from_dict(cls, contact):
+        """Build a Contact from a contact dictionary."""
+        return cls(contact['name'], contact['phone'], contact.get('email', ""))
+
+    def to_dict(self):
+        """Return the contact as a dictionary like create_contact() makes."""
+        return {'name': self.name, 'phone': self.phone, 'email': self.email}
+
+    @staticmethod
+    def json_default(value):
+        """
+        default= hook for json.dump() that writes Contact records as dictionaries.
+
+        Example:
+            >>> json.dumps([Contact("Alice", "555-0001")], default=Contact.json_default)
+            '[{"name": "Alice", "phone": "555-0001", "email": ""}]'
+        """
+        if isinstance(value, Contact):
+            return value.to_dict()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    def __getitem__(self, key):
+        if key not in Contact.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in Contact.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        if key not in Contact.__slots__:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return list(Contact.__slots__)
+
+    def __iter__(self):
+        return iter(Contact.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, Contact):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    # mutable like a dictionary, so not hashable either
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Contact(name={self.name!r}, phone={self.phone!r}, email={self.email!r})"
+
 
 def create_contact(name, phone, email=""):
     """
@@ -56,6 +152,67 @@ def add_contact(contacts, name, phone, email=""):
     return contact
 
 
+def _unpack_row(row):
+    # (name, phone) or (name, phone, email) -> (name, phone, email)
+    name, phone, *rest = row
+    return name, phone, rest[0] if rest else ""
+
+
+def add_contacts_bulk(contacts, rows):
+    """
+    Add many contacts at once, skipping duplicates.
+
+    Two contacts are duplicates when their names match case-insensitively and
+    their phones have the same digits (see normalize_phone). A duplicate of a
+    contact without an email fills in its email ("merged"), any other
+    duplicate is skipped. Duplicates are found with one hash pass over the
+    list and the rows, and the email of every row is kept.
+
+    Args:
+        contacts (list): List of contact dictionaries, extended in place
+        rows (iterable): (name, phone, email) tuples; email may be left out
+
+    Returns:
+        dict: Counts with keys 'inserted', 'skipped', 'merged'
+
+    Example:
+        >>> contacts = [{'name': 'Alice', 'phone': '555-0001', 'email': ''}]
+        >>> add_contacts_bulk(contacts, [
+        ...     ("ALICE", "(555) 0001", "alice@email.com"),
+        ...     ("Bob", "555-0002", "bob@email.com"),
+        ...     ("bob", "5550002", "other@email.com"),
+        ... ])
+        {'inserted': 1, 'skipped': 1, 'merged': 1}
+        >>> contacts[0]['email']
+        'alice@email.com'
+    """
+    # (lowercased name, phone digits) -> contact, for the list and for the rows added so far
+    seen = {}
+    for contact in contacts:
+        if contact is not None:
+            seen.setdefault((contact['name'].lower(), normalize_phone(contact['phone'])), contact)
+
+    counts = {'inserted': 0, 'skipped': 0, 'merged': 0}
+    new_contacts = []
+    for row in rows:
+        name, phone, email = _unpack_row(row)
+        dedupe_key = (name.lower(), normalize_phone(phone))
+        existing = seen.get(dedupe_key)
+        if existing is None:
+            contact = create_contact(name, phone, email)
+            seen[dedupe_key] = contact
+            new_contacts.append(contact)
+            counts['inserted'] += 1
+        elif email and not existing['email']:
+            existing['email'] = email
+            counts['merged'] += 1
+        else:
+            counts['skipped'] += 1
+    # one extend at the end instead of an append per row
+    contacts.extend(new_contacts)
+    return counts
+
+
 def find_contact_by_name(contacts, name):
     """
     Find a contact by name (case-insensitive).
@@ -66,6 +223,7 @@ def find_contact_by_name(contacts, name):
 
     Returns:
         dict or None: The contact if found, None otherwise
+        (tombstones, see delete_contact, are skipped)
 
     Example:
         >>> contacts = [{'name': 'Alice', 'phone': '555-0001', 'email': ''}]
@@ -76,6 +234,9 @@ def find_contact_by_name(contacts, name):
     # loops through the entire list of contact dicts until it finds a "name" key that is identical to the searched name
     # if no corresponding name is found, None is returned
     for contact in contacts:
+        # None is a tombstone left by delete_contact(..., tombstone=True)
+        if contact is None:
+            continue
 
         if contact["name"].lower() == name.lower():
             return contact
@@ -92,7 +253,7 @@ def search_contacts(contacts, search_term):
         search_term (str): Term to search for
 
     Returns:
-        list: List of matching contacts
+        list: List of matching contacts (tombstones are skipped)
 
     Example:
         >>> contacts = [
@@ -108,6 +269,8 @@ def search_contacts(contacts, search_term):
     search_term = search_term.lower()
     # each entry for the keys "name" and "phone" of all contact dicts is compared to the search term
     for contact in contacts:
+        if contact is None:
+            continue
         name_matches = search_term in contact['name'].lower()
         phone_matches = search_term in contact['phone']
         
@@ -118,13 +281,19 @@ def search_contacts(contacts, search_term):
     return matches
 
 
-def delete_contact(contacts, name):
+def delete_contact(contacts, name, tombstone=False):
     """
     Delete a contact by name.
 
+    With tombstone=True the contact is replaced by None instead of being
+    popped, so the following contacts are not shifted. All the read functions
+    in this file skip None entries. Once more than TOMBSTONE_COMPACT_RATIO
+    of the list are tombstones, the list is compacted.
+
     Args:
         contacts (list): List of contact dictionaries
         name (str): Name of contact to delete
+        tombstone (bool): Leave a None tombstone instead of popping
 
     Returns:
         bool: True if contact was deleted, False if not found
@@ -141,15 +310,98 @@ def delete_contact(contacts, name):
 
     # .pop() uses the contact dict's list index
     # enumerate() creates index, contact pairs
+    tombstones_seen = 0
     for index, contact in enumerate(contacts):
+        if contact is None:
+            tombstones_seen += 1
+            continue
         if contact['name'].lower() == search_name:
-            contacts.pop(index)
+            if not tombstone:
+                contacts.pop(index)
+                return True
+            contacts[index] = None
+            # the tombstones seen so far (plus the new one) are a lower bound of all of them;
+            # only when that is not enough are the ones after the match counted too
+            # (list.count runs in C, much faster than the loop above)
+            limit = len(contacts) * TOMBSTONE_COMPACT_RATIO
+            if tombstones_seen + 1 > limit or contacts.count(None) > limit:
+                compact_contacts(contacts)
             return True
             
     # If the loop finishes without finding the name, FALSE is returned
     return False
 
 
+def compact_contacts(contacts):
+    """
+    Remove the tombstones (None entries) from a contacts list in place.
+
+    Args:
+        contacts (list): List of contact dictionaries and tombstones
+
+    Returns:
+        int: Number of tombstones removed
+
+    Example:
+        >>> contacts = [None, {'name': 'Bob', 'phone': '555-0002', 'email': ''}, None]
+        >>> compact_contacts(contacts)
+        2
+        >>> contacts
+        [{'name': 'Bob', 'phone': '555-0002', 'email': ''}]
+    """
+    size = len(contacts)
+    # slice assignment replaces the content, so the caller's list object is kept
+    contacts[:] = [contact for contact in contacts if contact is not None]
+    return size - len(contacts)
+
+
+def bulk_delete(contacts, names):
+    """
+    Delete many contacts by name in a single pass over the list.
+
+    Like calling delete_contact() once per name: each name removes the first
+    remaining contact with that name (case-insensitive), and a name given
+    twice removes two contacts. Tombstones are dropped on the way.
+
+    Args:
+        contacts (list): List of contact dictionaries
+        names (list): Names of the contacts to delete
+
+    Returns:
+        int: Number of contacts deleted
+
+    Example:
+        >>> contacts = [
+        ...     {'name': 'Alice', 'phone': '555-0001', 'email': ''},
+        ...     {'name': 'Bob', 'phone': '555-0002', 'email': ''},
+        ...     {'name': 'Charlie', 'phone': '555-0003', 'email': ''}
+        ... ]
+        >>> bulk_delete(contacts, ['alice', 'CHARLIE', 'David'])
+        2
+        >>> [c['name'] for c in contacts]
+        ['Bob']
+    """
+    # lowercased name -> how many contacts with that name still have to go
+    to_delete = {}
+    for name in names:
+        search_name = name.lower()
+        to_delete[search_name] = to_delete.get(search_name, 0) + 1
+
+    kept = []
+    deleted = 0
+    for contact in contacts:
+        if contact is None:
+            continue
+        search_name = contact['name'].lower()
+        if to_delete.get(search_name, 0) > 0:
+            to_delete[search_name] -= 1
+            deleted += 1
+        else:
+            kept.append(contact)
+    contacts[:] = kept
+    return deleted
+
+
 def count_contacts_with_email(contacts):
     """
     Count how many contacts have an email address.
@@ -158,7 +410,7 @@ def count_contacts_with_email(contacts):
         contacts (list): List of contact dictionaries
 
     Returns:
-        int: Number of contacts with non-empty email
+        int: Number of contacts with non-empty email (tombstones are skipped)
 
     Example:
         >>> contacts = [
@@ -171,7 +423,7 @@ def count_contacts_with_email(contacts):
     # problem 3.6
     counter = 0
     for contact in contacts:
-        if contact["email"] != "":
+        if contact is not None and contact["email"] != "":
             counter += 1
     return counter
 
@@ -184,7 +436,7 @@ def get_all_phone_numbers(contacts):
         contacts (list): List of contact dictionaries
 
     Returns:
-        list: List of phone numbers
+        list: List of phone numbers (tombstones are skipped)
 
     Example:
         >>> contacts = [
@@ -197,7 +449,8 @@ def get_all_phone_numbers(contacts):
     # problem 3.7
     phone_numbers = []
     for contact in contacts:
-        phone_numbers.append(contact['phone'])
+        if contact is not None:
+            phone_numbers.append(contact['phone'])
         
     return phone_numbers
 
@@ -209,7 +462,7 @@ def sort_contacts_by_name(contacts):
         contacts (list): List of contact dictionaries
 
     Returns:
-        list: New list sorted by name
+        list: New list sorted by name (tombstones are left out)
 
     Example:
         >>> contacts = [
@@ -224,23 +477,32 @@ def sort_contacts_by_name(contacts):
     # "key" tells sorted() to look at each contact's "name" when comparing items
     # lambda c: c["name"] is a function that does the following:
     # for any contact c, get me c["name"]
-    sorted_list = sorted(contacts, key=lambda c: c['name'])
+    sorted_list = sorted((c for c in contacts if c is not None), key=lambda c: c['name'])
     
     return sorted_list
 
 
-def contact_exists(contacts, name):
+def contact_exists(contacts, name, bloom=None):
     """
     Check if a contact with the given name exists.
 
+    A Bloom filter from build_name_bloom() answers most "no"s without
+    scanning the list. It must know every name in the list: rebuild it, or
+    call bloom.add(name.lower()) for every contact added after it was built.
+
     Args:
         contacts (list): List of contact dictionaries
         name (str): Name to check
+        bloom (BloomFilter): Filter over the lowercased names (optional)
 
     Returns:
         bool: True if contact exists, False otherwise
     """
     # problem 3.9
+    # a name the filter has never seen is definitely not in the list
+    if bloom is not None and name.lower() not in bloom:
+        return False
+
     # Use previous function:
     contact = find_contact_by_name(contacts, name)
     
@@ -251,6 +513,726 @@ def contact_exists(contacts, name):
         return False
 
 
+def build_name_bloom(contacts, error_rate=0.01):
+    """
+    Build a Bloom filter over the lowercased names of the contacts.
+
+    Args:
+        contacts (list): List of contact dictionaries
+        error_rate (float): Wanted false-positive rate
+
+    Returns:
+        BloomFilter: Filter for contact_exists(..., bloom=...)
+
+    Example:
+        >>> contacts = [{'name': 'Alice', 'phone': '555-0001', 'email': ''}]
+        >>> bloom = build_name_bloom(contacts)
+        >>> contact_exists(contacts, 'ALICE', bloom), contact_exists(contacts, 'Bob', bloom)
+        (True, False)
+    """
+    names = [contact['name'].lower() for contact in contacts if contact is not None]
+    bloom = BloomFilter(len(names), error_rate)
+    for name in names:
+        bloom.add(name)
+    return bloom
+
+
+def normalize_phone(phone):
+    """
+    Keep only the digits of a phone number.
+
+    Args:
+        phone (str): Phone number in any format
+
+    Returns:
+        str: The digits of the phone number
+
+    Example:
+        >>> normalize_phone("+41 (21) 692-0001")
+        '41216920001'
+    """
+    return "".join(character for character in phone if character.isdigit())
+
+
+class ContactBook:
+    """
+    A contact list with a case-insensitive name index.
+
+    Wraps a list of contact dictionaries and keeps a hash index from the
+    lowercased name to the contacts with that name, so finding, checking and
+    deleting a contact by name no longer scans the whole list. The methods
+    mirror the functions above. Contacts should be changed through the book,
+    otherwise the index gets out of date.
+
+    Args:
+        contacts (list): Initial list of contact dictionaries (optional);
+            None tombstones left by delete_contact() are skipped
+        substring_index (bool): Also keep a trigram index over names and phones
+            so search_contacts only checks likely matches (uses more memory)
+        compact (bool): Store contacts added through add_contact() as Contact
+            records instead of dictionaries
+        debug_checks (bool): Run check_consistency() after every change
+            (slow, meant for tests)
+        search_cache_size (int): Keep the results of this many recent
+            search_contacts() terms (0 turns the cache off)
+
+    Example:
+        >>> book = ContactBook([{'name': 'Alice', 'phone': '555-0001', 'email': ''}])
+        >>> book.find_contact_by_name('ALICE')
+        {'name': 'Alice', 'phone': '555-0001', 'email': ''}
+        >>> book.delete_contact('alice')
+        True
+        >>> len(book)
+        0
+    """
+
+    def __init__(self, contacts=None, substring_index=False, compact=False, debug_checks=False,
+                 search_cache_size=0):
+        # every contact is stored under an increasing integer key
+        # dicts keep insertion order, so iterating gives the same order as the list,
+        # and deleting a key does not shift all the following contacts like list.pop()
+        self._contacts = {}
+        self._next_key = 0
+        # lowercased name -> list of keys of the contacts with that name (oldest first)
+        self._name_index = {}
+        # aggregates kept up to date on every change, so the statistics are O(1) reads
+        # email domain -> keys; its total is the number of contacts with an email
+        self._domain_index = DomainIndex()
+        # key -> phone, in insertion order like self._contacts
+        self._phones = {}
+        self._compact = compact
+        self._debug_checks = debug_checks
+        self._substring_index = TrigramIndex() if substring_index else None
+        # built the first time a phone prefix query needs it, then kept up to date
+        self._phone_trie = None
+        # sorted list of (name, key) entries, also built on first use
+        # the key breaks ties the same way the stable sorted() does (insertion order)
+        self._sorted_entries = None
+        # BK-tree over the distinct lowercased names, also built on first use
+        self._name_tree = None
+        # recent search terms -> matching keys, invalidated by every change
+        self._search_cache = SearchCache(search_cache_size) if search_cache_size > 0 else None
+        for contact in contacts or []:
+            if contact is not None:
+                self._insert(contact)
+
+    def __len__(self):
+        return len(self._contacts)
+
+    def __iter__(self):
+        return iter(self._contacts.values())
+
+    @property
+    def contacts(self):
+        """list: The contacts in insertion order (a new list)."""
+        return list(self._contacts.values())
+
+    def build_indexes(self):
+        """
+        Build the indexes that are otherwise built on first use.
+
+        After this, read methods no longer change the book, which is what
+        ConcurrentContactBook in contact_store.py relies on. Indexes that are
+        already built are left alone, so calling it again is cheap.
+        """
+        self._get_phone_trie()
+        self._get_sorted_entries()
+        self._get_name_tree()
+
+    def _insert(self, contact):
+        # stores the contact and adds it to all indexes, returns its key
+        key = self._store(contact)
+        self._index(key, contact)
+        return key
+
+    def _store(self, contact):
+        # stores the contact and adds it to the name index and the aggregates, returns its key
+        key = self._next_key
+        self._next_key += 1
+        self._contacts[key] = contact
+        name = contact['name'].lower()
+        keys = self._name_index.get(name)
+        if keys is None:
+            keys = self._name_index[name] = []
+            if self._name_tree is not None:
+                self._name_tree.add(name)
+        keys.append(key)
+        self._phones[key] = contact['phone']
+        self._domain_index.add(key, contact['email'])
+        return key
+
+    def _index(self, key, contact):
+        # adds a stored contact to the optional indexes that are turned on or already built
+        if self._search_cache is not None:
+            self._search_cache.invalidate(self._search_texts(contact))
+        if self._substring_index is not None:
+            self._substring_index.add(key, self._search_texts(contact))
+        if self._phone_trie is not None:
+            self._phone_trie.add(key, normalize_phone(contact['phone']))
+        if self._sorted_entries is not None:
+            insort(self._sorted_entries, (contact['name'], key))
+
+    def _remove(self, key):
+        # removes the contact with this key from the storage and all indexes
+        contact = self._contacts.pop(key)
+        name = contact['name'].lower()
+        keys = self._name_index[name]
+        keys.remove(key)
+        if not keys:
+            del self._name_index[name]
+            if self._name_tree is not None:
+                self._name_tree.remove(name)
+                # removed names stay in the tree as dead nodes; start over once they are the majority
+                if self._name_tree.dead > self._name_tree.size:
+                    self._name_tree = None
+        del self._phones[key]
+        self._domain_index.remove(key, contact['email'])
+        self._unindex(key, contact)
+        return contact
+
+    def _unindex(self, key, contact):
+        # removes a contact from the optional indexes, the opposite of _index()
+        if self._search_cache is not None:
+            self._search_cache.invalidate(self._search_texts(contact))
+        if self._substring_index is not None:
+            self._substring_index.remove(key, self._search_texts(contact))
+        if self._phone_trie is not None:
+            self._phone_trie.remove(key, normalize_phone(contact['phone']))
+        if self._sorted_entries is not None:
+            entries = self._sorted_entries
+            del entries[bisect_left(entries, (contact['name'], key))]
+
+    def _update(self, key, phone=None, email=None):
+        # changes phone and/or email of a stored contact and fixes every index it is in
+        contact = self._contacts[key]
+        self._unindex(key, contact)
+        if phone is not None:
+            contact['phone'] = phone
+            self._phones[key] = phone
+        if email is not None:
+            self._domain_index.remove(key, contact['email'])
+            contact['email'] = email
+            self._domain_index.add(key, email)
+        self._index(key, contact)
+
+    def _changed(self):
+        # called at the end of every public method that changes the book
+        if self._debug_checks:
+            self.check_consistency()
+
+    def check_consistency(self):
+        """
+        Recompute every index and aggregate from scratch and compare.
+
+        Meant for tests and debugging; costs about as much as building the
+        book again.
+
+        Returns:
+            bool: True if everything matches
+
+        Raises:
+            RuntimeError: If an index or aggregate is out of date
+        """
+        fresh = ContactBook(self._contacts.values(), substring_index=self._substring_index is not None)
+        # the fresh book numbers the contacts 0, 1, 2, ... so map its keys back to ours
+        key_of = dict(enumerate(self._contacts))
+
+        def remap(keys):
+            return [key_of[key] for key in keys]
+
+        checks = {
+            'name index': (
+                self._name_index,
+                {name: remap(keys) for name, keys in fresh._name_index.items()},
+            ),
+            'domain index': (
+                self._domain_index._domains,
+                {domain: set(remap(keys)) for domain, keys in fresh._domain_index._domains.items()},
+            ),
+            'email count': (self._domain_index.total, fresh._domain_index.total),
+            'phone column': (list(self._phones.items()), [(key_of[k], v) for k, v in fresh._phones.items()]),
+        }
+        if self._substring_index is not None:
+            checks['substring index'] = (
+                self._substring_index._postings,
+                {gram: set(remap(keys)) for gram, keys in fresh._substring_index._postings.items()},
+            )
+        if self._phone_trie is not None:
+            checks['phone trie'] = (
+                list(self._phone_trie.iter_keys()),
+                remap(fresh._get_phone_trie().iter_keys()),
+            )
+        if self._sorted_entries is not None:
+            checks['sorted view'] = (
+                self._sorted_entries,
+                [(name, key_of[key]) for name, key in fresh._get_sorted_entries()],
+            )
+        if self._name_tree is not None:
+            checks['name tree'] = (sorted(self._name_tree), sorted(self._name_index))
+        if self._search_cache is not None:
+            cached = dict(self._search_cache._results)
+            checks['search cache'] = (
+                cached,
+                {term: tuple(key for key, contact in self._contacts.items()
+                             if term in contact['name'].lower() or term in contact['phone'])
+                 for term in cached},
+            )
+        for part, (current, expected) in checks.items():
+            if current != expected:
+                raise RuntimeError(f"ContactBook {part} is out of date")
+        return True
+
+    @staticmethod
+    def _search_texts(contact):
+        # the texts search_contacts() compares against: the name is lowercased, the phone is not
+        return [contact['name'].lower(), contact['phone']]
+
+    def add_contact(self, name, phone, email=""):
+        """
+        Add a new contact to the book.
+
+        Args:
+            name (str): Contact name
+            phone (str): Contact phone
+            email (str): Contact email (optional)
+
+        Returns:
+            dict or Contact: The newly created contact
+        """
+        if self._compact:
+            contact = Contact(name, phone, email)
+        else:
+            contact = create_contact(name, phone, email)
+        self._insert(contact)
+        self._changed()
+        return contact
+
+    def add_contacts_bulk(self, rows):
+        """
+        Add many contacts at once, skipping duplicates like add_contacts_bulk().
+
+        Existing duplicates are found through the name index, so the book is
+        not scanned. The optional indexes are updated once after all rows are
+        stored; the sorted view is extended and re-sorted in one go instead of
+        one insertion per contact.
+
+        Args:
+            rows (iterable): (name, phone, email) tuples; email may be left out
+
+        Returns:
+            dict: Counts with keys 'inserted', 'skipped', 'merged'
+        """
+        # (lowercased name, phone digits) -> key, for the rows added in this batch
+        batch = {}
+        new_keys = []
+        merges = {}
+        counts = {'inserted': 0, 'skipped': 0, 'merged': 0}
+        for row in rows:
+            name, phone, email = _unpack_row(row)
+            search_name = name.lower()
+            digits = normalize_phone(phone)
+            existing = batch.get((search_name, digits))
+            if existing is None:
+                for key in self._name_index.get(search_name, ()):
+                    if normalize_phone(self._contacts[key]['phone']) == digits:
+                        existing = key
+                        break
+            if existing is None:
+                if self._compact:
+                    contact = Contact(name, phone, email)
+                else:
+                    contact = create_contact(name, phone, email)
+                key = self._store(contact)
+                batch[(search_name, digits)] = key
+                new_keys.append(key)
+                counts['inserted'] += 1
+            elif email and not self._contacts[existing]['email'] and existing not in merges:
+                merges[existing] = email
+                counts['merged'] += 1
+            else:
+                counts['skipped'] += 1
+
+        # index the new contacts; the sorted view gets them all at once,
+        # and the search cache is cleared once instead of checked per contact
+        sorted_entries = self._sorted_entries
+        search_cache = self._search_cache
+        self._sorted_entries = None
+        self._search_cache = None
+        for key in new_keys:
+            self._index(key, self._contacts[key])
+        if sorted_entries is not None:
+            sorted_entries.extend((self._contacts[key]['name'], key) for key in new_keys)
+            sorted_entries.sort()
+            self._sorted_entries = sorted_entries
+        if search_cache is not None:
+            if new_keys:
+                search_cache.clear()
+            self._search_cache = search_cache
+        for key, email in merges.items():
+            self._update(key, email=email)
+        self._changed()
+        return counts
+
+    def find_contact_by_name(self, name):
+        """
+        Find a contact by name (case-insensitive) with one index lookup.
+
+        Args:
+            name (str): Name to search for
+
+        Returns:
+            dict or None: The first contact added with this name, None if not found
+        """
+        keys = self._name_index.get(name.lower())
+        if not keys:
+            return None
+        return self._contacts[keys[0]]
+
+    def _get_name_tree(self):
+        if self._name_tree is None:
+            self._name_tree = BKTree()
+            for known_name in self._name_index:
+                self._name_tree.add(known_name)
+        return self._name_tree
+
+    def find_contacts_fuzzy(self, name, max_distance=2):
+        """
+        Find contacts whose name is within a few typos of name.
+
+        Names are compared lowercased with the edit distance (see levenshtein
+        in contact_index.py). A BK-tree over the distinct names, built on the
+        first call and kept up to date afterwards, skips most names without
+        comparing them.
+
+        Args:
+            name (str): Name to look for, possibly misspelled
+            max_distance (int): Largest number of edits to accept
+
+        Returns:
+            list: Matching contacts, closest names first, then insertion order
+
+        Example:
+            >>> book = ContactBook()
+            >>> _ = book.add_contact("Alice Smith", "555-0001")
+            >>> _ = book.add_contact("Bob Jones", "555-0002")
+            >>> [c['name'] for c in book.find_contacts_fuzzy("alise smyth")]
+            ['Alice Smith']
+        """
+        found = []
+        for distance, known_name in self._get_name_tree().search(name.lower(), max_distance):
+            for key in self._name_index[known_name]:
+                found.append((distance, key))
+        found.sort()
+        return [self._contacts[key] for _, key in found]
+
+    def search_contacts(self, search_term):
+        """
+        Search for contacts by name or phone (partial match).
+
+        With the substring index, only the contacts that contain all trigrams
+        of the term are checked. Terms shorter than a trigram scan every contact.
+        The result is the same as search_contacts() on the list either way.
+        With search_cache_size, repeated terms are answered from the cache.
+
+        Args:
+            search_term (str): Term to search for
+
+        Returns:
+            list: List of matching contacts
+        """
+        search_term = search_term.lower()
+        cache = self._search_cache
+        if cache is not None:
+            keys = cache.get(search_term)
+            if keys is not None:
+                return [self._contacts[key] for key in keys]
+
+        index = self._substring_index
+        if index is None or len(search_term) < index.n:
+            if cache is None:
+                return search_contacts(self._contacts.values(), search_term)
+            candidates = self._contacts
+        else:
+            # keys grow with every insert, so sorting them gives the list order back
+            candidates = sorted(index.candidates(search_term))
+        keys = []
+        for key in candidates:
+            contact = self._contacts[key]
+            if search_term in contact['name'].lower() or search_term in contact['phone']:
+                keys.append(key)
+        if cache is not None:
+            cache.put(search_term, keys)
+        return [self._contacts[key] for key in keys]
+
+    def search_cache_stats(self):
+        """
+        Counters of the search cache (see SearchCache.stats()).
+
+        Returns:
+            dict or None: hits, misses, evictions, invalidations, size and
+            maxsize; None if the book has no search cache
+        """
+        if self._search_cache is None:
+            return None
+        return self._search_cache.stats()
+
+    def clear_search_cache(self):
+        """
+        Drop every cached search result, e.g. after changing contacts
+        outside the book.
+        """
+        if self._search_cache is not None:
+            self._search_cache.clear()
+
+    def delete_contact(self, name):
+        """
+        Delete the first contact added with this name.
+
+        Args:
+            name (str): Name of contact to delete (case-insensitive)
+
+        Returns:
+            bool: True if contact was deleted, False if not found
+        """
+        keys = self._name_index.get(name.lower())
+        if not keys:
+            return False
+        self._remove(keys[0])
+        self._changed()
+        return True
+
+    def update_contact(self, name, phone=None, email=None):
+        """
+        Change the phone and/or email of the first contact with this name.
+
+        Args:
+            name (str): Name of the contact to change (case-insensitive)
+            phone (str): New phone number (None keeps the old one)
+            email (str): New email (None keeps the old one)
+
+        Returns:
+            bool: True if the contact was updated, False if not found
+        """
+        keys = self._name_index.get(name.lower())
+        if not keys:
+            return False
+        self._update(keys[0], phone=phone, email=email)
+        self._changed()
+        return True
+
+    def bulk_delete(self, names):
+        """
+        Delete many contacts by name, like bulk_delete() on a list.
+
+        Each name removes the first remaining contact with that name.
+
+        Args:
+            names (list): Names of the contacts to delete
+
+        Returns:
+            int: Number of contacts deleted
+        """
+        deleted = 0
+        for name in names:
+            if self.delete_contact(name):
+                deleted += 1
+        return deleted
+
+    def count_contacts_with_email(self):
+        """
+        Count how many contacts have an email address.
+
+        Reads the total of the email domain index, which is kept up to date
+        on every change.
+
+        Returns:
+            int: Number of contacts with non-empty email
+        """
+        return self._domain_index.total
+
+    def contacts_by_email_domain(self, domain):
+        """
+        Find all contacts with an email at a domain.
+
+        Args:
+            domain (str): Email domain, e.g. "example.com" (case-insensitive)
+
+        Returns:
+            list: Contacts at that domain in insertion order
+
+        Example:
+            >>> book = ContactBook()
+            >>> _ = book.add_contact("Alice", "555-0001", "alice@example.com")
+            >>> _ = book.add_contact("Bob", "555-0002", "bob@mail.com")
+            >>> [c['name'] for c in book.contacts_by_email_domain("Example.com")]
+            ['Alice']
+        """
+        return [self._contacts[key] for key in self._domain_index.keys(domain)]
+
+    def email_domain_histogram(self):
+        """
+        Count the contacts per email domain, read from the domain index.
+
+        Emails without an '@' are counted under the domain ''.
+
+        Returns:
+            dict: Domain -> number of contacts, most common domain first
+        """
+        return self._domain_index.histogram()
+
+    def _get_phone_trie(self):
+        if self._phone_trie is None:
+            self._phone_trie = PhoneTrie()
+            for key, contact in self._contacts.items():
+                self._phone_trie.add(key, normalize_phone(contact['phone']))
+        return self._phone_trie
+
+    def complete_phone(self, prefix, limit=10):
+        """
+        Find the first contacts whose phone number starts with prefix.
+
+        Only the digits of prefix and of the phone numbers are compared, so
+        "555-01" finds "(555) 0123". Results are ordered by phone number and
+        the cost depends on the prefix length and limit, not on the book size.
+
+        Args:
+            prefix (str): Beginning of a phone number
+            limit (int): Maximum number of contacts to return
+
+        Returns:
+            list: Up to limit matching contacts
+        """
+        keys = self._get_phone_trie().iter_keys(normalize_phone(prefix))
+        return [self._contacts[key] for key in islice(keys, limit)]
+
+    def iter_phone_numbers(self, sort_by_digits=False):
+        """
+        Yield the phone numbers one at a time.
+
+        Args:
+            sort_by_digits (bool): Yield them ordered by their digits (read from
+                the phone trie) instead of insertion order
+
+        Yields:
+            str: Phone numbers as they were stored
+        """
+        if not sort_by_digits:
+            yield from self._phones.values()
+            return
+        for key in self._get_phone_trie().iter_keys():
+            yield self._contacts[key]['phone']
+
+    def phone_numbers_view(self):
+        """
+        Live read-only view of all phone numbers in insertion order.
+
+        Nothing is copied; the view follows later changes to the book.
+
+        Returns:
+            dict_values: The phone number column
+        """
+        return self._phones.values()
+
+    def get_all_phone_numbers(self, sort_by_digits=False):
+        """
+        Extract all phone numbers from the contacts.
+
+        Args:
+            sort_by_digits (bool): Order them by their digits instead of insertion order
+
+        Returns:
+            list: List of phone numbers
+        """
+        if sort_by_digits:
+            return list(self.iter_phone_numbers(sort_by_digits=True))
+        # copying the phone column runs in C, no contact is touched
+        return list(self._phones.values())
+
+    def _get_sorted_entries(self):
+        if self._sorted_entries is None:
+            self._sorted_entries = sorted(
+                (contact['name'], key) for key, contact in self._contacts.items()
+            )
+        return self._sorted_entries
+
+    def sort_contacts_by_name(self):
+        """
+        Return a new list of contacts sorted alphabetically by name.
+
+        Reads the sorted view, which is kept in order on add and delete, so
+        no sorting happens here after the first call.
+
+        Returns:
+            list: New list sorted by name
+        """
+        contacts = self._contacts
+        return [contacts[key] for _, key in self._get_sorted_entries()]
+
+    def iter_sorted_contacts(self, offset=0, limit=None):
+        """
+        Yield one page of the contacts sorted by name.
+
+        Args:
+            offset (int): Number of contacts to skip
+            limit (int): Maximum number of contacts to yield (None for all)
+
+        Yields:
+            dict: Contacts in name order
+
+        Example:
+            >>> book = ContactBook()
+            >>> for name in ["Dan", "Cat", "Bob", "Ann"]:
+            ...     _ = book.add_contact(name, "555-0000")
+            >>> [c['name'] for c in book.iter_sorted_contacts(offset=1, limit=2)]
+            ['Bob', 'Cat']
+        """
+        entries = self._get_sorted_entries()
+        stop = len(entries) if limit is None else min(offset + limit, len(entries))
+        contacts = self._contacts
+        for position in range(offset, stop):
+            yield contacts[entries[position][1]]
+
+    def contacts_in_name_range(self, start, end):
+        """
+        Return the contacts with start <= name < end, sorted by name.
+
+        Names are compared like in sort_contacts_by_name() (case-sensitive).
+        Both ends are found with a binary search on the sorted view.
+
+        Args:
+            start (str): Smallest name to include
+            end (str): First name to leave out
+
+        Returns:
+            list: Matching contacts in name order
+
+        Example:
+            >>> book = ContactBook()
+            >>> for name in ["Mary", "Mabel", "McCoy", "Mike"]:
+            ...     _ = book.add_contact(name, "555-0000")
+            >>> [c['name'] for c in book.contacts_in_name_range("Ma", "Mc")]
+            ['Mabel', 'Mary']
+        """
+        entries = self._get_sorted_entries()
+        # (name,) sorts before every (name, key) entry with the same name
+        low = bisect_left(entries, (start,))
+        high = bisect_left(entries, (end,), low)
+        contacts = self._contacts
+        return [contacts[key] for _, key in entries[low:high]]
+
+    def contact_exists(self, name):
+        """
+        Check if a contact with the given name exists.
+
+        Args:
+            name (str): Name to check
+
+        Returns:
+            bool: True if contact exists, False otherwise
+        """
+        return name.lower() in self._name_index
+
+
 # Test cases
 if __name__ == "__main__":
     print("Testing Mini Contact Manager...")
@@ -3,8 +3,35 @@ Problem 4: Data Persistence with JSON
 Learn to use Python modules (imports) and save data to files using JSON.
 """
 
+import hashlib
+import heapq
+import itertools
 import json
 # Note: json is a built-in Python module for working with JSON data
+import os
+import shutil
+import struct
+
+from contact_binary import (
+    count_binary_contacts, is_binary_contacts_file, iter_binary_contacts, load_binary_contacts,
+    write_binary_contacts
+)
+from contact_index import BloomFilter
+from json_index import build_json_index, load_json_index
+from json_stream import iter_json_array, iter_records_containing, json_top_level_type, scan_json_file
+from problem3 import Contact, build_name_bloom
+
+# a saved Bloom filter starts with the size and mtime of the contacts file it was built from
+_BLOOM_SOURCE = struct.Struct("<QQ")
+
+# absolute path -> (size, mtime_ns, stats) of the files get_file_stats() has looked at
+_file_stats_cache = {}
+
+# contacts files with these extensions are JSON Lines: one contact object per line
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+# contacts files with these extensions use the binary format of contact_binary.py
+BINARY_EXTENSIONS = ('.bin',)
+FILE_FORMATS = ('json', 'jsonl', 'binary')
 
 
 def save_to_json(data, filename):
@@ -29,7 +56,7 @@ def save_to_json(data, filename):
         # json.dump writes the data object "data" to the file "f"
         # indent=2 makes the file human-readable
         with open(filename, "w") as f:
-            json.dump(data, f, indent=2)
+            json.dump(data, f, indent=2, default=Contact.json_default)
         return True
     except (IOError, TypeError):
         # permission denied (IOError)
@@ -64,33 +91,180 @@ def load_from_json(filename):
         return None
 
 
-def save_contacts_to_file(contacts, filename="contacts.json"):
+def _sniff_format(filename):
+    # a binary file starts with its magic bytes; a contacts JSON file is a list,
+    # so first lines that are whole objects mean JSON Lines. A single object line
+    # counts only with its line break: json.dump() writes a dictionary without one
+    if is_binary_contacts_file(filename):
+        return 'binary'
+    lines = []
+    try:
+        with open(filename, "r") as f:
+            while len(lines) < 2:
+                # a JSON list written without indent is a single line, so do not read it all
+                line = f.readline(1 << 16)
+                if not line:
+                    break
+                if line.strip():
+                    lines.append(line)
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not lines or (len(lines) == 1 and not lines[0].endswith("\n")):
+        return 'json'
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{"):
+            return 'json'
+        try:
+            if not isinstance(json.loads(line), dict):
+                return 'json'
+        except json.JSONDecodeError:
+            return 'json'
+    return 'jsonl'
+
+
+def contacts_file_format(filename, file_format=None, sniff=True):
+    """
+    Decide whether a contacts file is a JSON list, JSON Lines or binary.
+
+    An explicit file_format wins, then the extension (see JSONL_EXTENSIONS
+    and BINARY_EXTENSIONS), then (with sniff) the start of an existing file:
+    the magic bytes of the binary format, or first lines that are each a
+    JSON object: two of them, or a single one ending with a line break, as
+    append_contact_to_file() writes it. Anything else is JSON, e.g. a
+    dictionary saved by json.dump() on one line without a line break.
+
+    Args:
+        filename (str): The contacts file
+        file_format (str): 'json', 'jsonl', 'binary' or None to detect it
+        sniff (bool): Look at the file's content if the extension says nothing
+
+    Returns:
+        str: 'json', 'jsonl' or 'binary'
+
+    Raises:
+        ValueError: If file_format is not one of FILE_FORMATS
+    """
+    if file_format is not None:
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"unknown file format {file_format!r}, expected one of {FILE_FORMATS}")
+        return file_format
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in JSONL_EXTENSIONS:
+        return 'jsonl'
+    if extension in BINARY_EXTENSIONS:
+        return 'binary'
+    if sniff:
+        return _sniff_format(filename) or 'json'
+    return 'json'
+
+
+def save_contacts_to_file(contacts, filename="contacts.json", file_format=None):
     """
     Save a list of contacts to a JSON file.
 
+    With file_format='binary' (or a BINARY_EXTENSIONS file name) the contacts
+    are saved in the compact binary format of contact_binary.py instead,
+    which load_contacts_from_file() recognizes whatever the file is called.
+
     Args:
-        contacts (list): List of contact dictionaries
+        contacts (list): List of contact dictionaries (or Contact records)
         filename (str): File to save to (default: contacts.json)
+        file_format (str): 'json', 'jsonl' or 'binary' (default: from the extension)
 
     Returns:
         bool: True if successful, False otherwise
     """
     # problem 4.3
+    file_format = contacts_file_format(filename, file_format, sniff=False)
+    if file_format == 'binary':
+        try:
+            with open(filename, "wb") as f:
+                write_binary_contacts(contacts, f)
+            return True
+        except (IOError, TypeError):
+            return False
+    if file_format == 'jsonl':
+        try:
+            with open(filename, "w") as f:
+                for contact in contacts:
+                    f.write(json.dumps(contact, default=Contact.json_default) + "\n")
+            return True
+        except (IOError, TypeError):
+            return False
     # Uses the previous function save_to_json()
     return save_to_json(contacts, filename)
 
 
-def load_contacts_from_file(filename="contacts.json"):
+def _iter_json_lines(filename):
+    # one contact per line; blank lines and lines that do not decode
+    # (e.g. the last line of an append that was cut off) are skipped
+    try:
+        with open(filename, "r") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+    except FileNotFoundError:
+        pass
+
+
+def _load_json_lines(filename):
+    return list(_iter_json_lines(filename))
+
+
+def iter_contacts_from_file(filename="contacts.json", file_format=None):
+    """
+    Yield the contacts in a file one at a time, without loading the whole list.
+
+    Args:
+        filename (str): File to read
+        file_format (str): 'json', 'jsonl' or 'binary' (default: detected, see contacts_file_format())
+
+    Yields:
+        dict: One contact at a time; nothing if the file does not exist
+
+    Raises:
+        ValueError: If a JSON file does not hold a list or is not valid JSON,
+            or a binary file is damaged
+    """
+    file_format = contacts_file_format(filename, file_format)
+    if file_format == 'jsonl':
+        yield from _iter_json_lines(filename)
+    elif not os.path.exists(filename):
+        return
+    elif file_format == 'binary':
+        yield from iter_binary_contacts(filename)
+    else:
+        yield from iter_json_array(filename)
+
+
+def load_contacts_from_file(filename="contacts.json", file_format=None):
     """
     Load contacts from a JSON file.
 
+    A file saved in the binary format is recognized by its first bytes, so
+    it does not need a BINARY_EXTENSIONS name.
+
     Args:
         filename (str): File to load from (default: contacts.json)
+        file_format (str): 'json', 'jsonl' or 'binary' (default: detected, see contacts_file_format())
 
     Returns:
         list: List of contacts, or empty list if file doesn't exist
     """
     # problem 4.4
+    file_format = contacts_file_format(filename, file_format)
+    if file_format == 'jsonl':
+        return _load_json_lines(filename)
+    if file_format == 'binary':
+        # like a JSON file, a missing or damaged binary file gives an empty list
+        try:
+            return load_binary_contacts(filename)
+        except (FileNotFoundError, ValueError):
+            return []
     contacts = load_from_json(filename)
     
     if contacts is None:
@@ -101,57 +275,195 @@ def load_contacts_from_file(filename="contacts.json"):
         return contacts
 
 
-def append_contact_to_file(contact, filename="contacts.json"):
+def append_contact_to_file(contact, filename="contacts.json", file_format=None):
     """
     Load existing contacts, add a new contact, and save back to file.
 
+    A JSON Lines file is not rewritten: the contact is written as one more
+    line at the end, so an append costs the same however big the file is.
+
     Args:
         contact (dict): Contact dictionary to add
         filename (str): File to use
+        file_format (str): 'json', 'jsonl' or 'binary' (default: detected, see contacts_file_format())
 
     Returns:
         bool: True if successful
     """
     # problem 4.5
+    file_format = contacts_file_format(filename, file_format)
+    if file_format == 'jsonl':
+        try:
+            line = (json.dumps(contact, default=Contact.json_default) + "\n").encode()
+            with open(filename, "a+b") as f:
+                # a cut-off last line must not swallow this one
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line
+                f.write(line)
+            return True
+        except (IOError, TypeError):
+            return False
+
     # load existing contacts via the previous function (which gives an empty list if the file does not exist)
-    contacts = load_contacts_from_file(filename)
+    contacts = load_contacts_from_file(filename, file_format)
     
     # add new contact to list
     contacts.append(contact)
     
-    # save updated list back to file
-    return save_contacts_to_file(contacts, filename)
+    # save updated list back to file, in the format it was in
+    return save_contacts_to_file(contacts, filename, file_format)
+
+
+def _copy_file_bytes(source_filename, target_filename):
+    # copies the bytes without reading them into Python where the OS allows it:
+    # copy_file_range (Linux, can share blocks), then sendfile, then a chunked copy
+    with open(source_filename, "rb") as source, open(target_filename, "wb") as target:
+        size = os.fstat(source.fileno()).st_size
+        copied = 0
+        for copy in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+            if copy is None:
+                continue
+            try:
+                while copied < size:
+                    if copy is os.sendfile:
+                        sent = copy(target.fileno(), source.fileno(), copied, size - copied)
+                    else:
+                        sent = copy(source.fileno(), target.fileno(), size - copied, copied, copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+                break
+            except OSError:
+                # not supported between these files (other file system, old kernel, ...)
+                if copied:
+                    raise
+        # whatever the fast paths did not copy, e.g. because the file grew since fstat
+        source.seek(copied)
+        target.seek(copied)
+        shutil.copyfileobj(source, target, 1 << 20)
+
+
+def _file_sha256(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def validate_json_file(filename, file_format=None):
+    """
+    Check that a file is valid JSON (or JSON Lines) without loading it whole.
+
+    A list is checked one item at a time with iter_json_array(); other JSON
+    values are loaded normally. A binary contacts file is checked by reading
+    every record.
+
+    Args:
+        filename (str): File to check
+        file_format (str): 'json', 'jsonl' or 'binary' (default: detected, see contacts_file_format())
+
+    Returns:
+        bool: True if the whole file decodes
+    """
+    try:
+        file_format = contacts_file_format(filename, file_format)
+        if file_format == 'binary':
+            for _ in iter_binary_contacts(filename):
+                pass
+            return True
+        if file_format == 'jsonl':
+            with open(filename, "r") as f:
+                for line in f:
+                    if line.strip():
+                        json.loads(line)
+            return True
+        if json_top_level_type(filename) == "list":
+            for _ in iter_json_array(filename):
+                pass
+            return True
+        return load_from_json(filename) is not None
+    except (OSError, ValueError):
+        return False
 
 
-def backup_file(source_filename, backup_filename):
+def backup_file(source_filename, backup_filename, validate=True, incremental=False):
     """
     Create a backup copy of a file.
 
+    The bytes are copied as they are (see _copy_file_bytes), not decoded and
+    encoded again. The copy is written next to the backup and renamed over
+    it at the end, so an old backup is never left half overwritten.
+
+    With incremental=True, the size, modification time and SHA-256 of the
+    source are saved in backup_filename + ".meta", and the next call copies
+    only if they changed: same size and time skips the copy outright, a
+    changed time with the same hash just updates the ".meta" file.
+
     Args:
         source_filename (str): Original file
         backup_filename (str): Backup file name
+        validate (bool): Check that the copy is valid JSON before keeping it
+        incremental (bool): Skip the copy when the source did not change
 
     Returns:
-        bool: True if successful
+        bool: True if successful (also when the copy was skipped)
     """
     # problem 4.6
-    # load the data from the source via previous function
-    data = load_from_json(source_filename)
-    
-    # check if loading failed
-    if data is None:
+    try:
+        source = os.stat(source_filename)
+    except OSError:
         return False
-    
-    # save the data to the new backup file
-    return save_to_json(data, backup_filename)
+    state_filename = backup_filename + ".meta"
+    state = None
+    digest = None
+    if incremental:
+        state = load_from_json(state_filename)
+        if isinstance(state, dict) and os.path.exists(backup_filename):
+            if (state.get('size'), state.get('mtime_ns')) == (source.st_size, source.st_mtime_ns):
+                return True
+            digest = _file_sha256(source_filename)
+            if state.get('sha256') == digest:
+                state.update(size=source.st_size, mtime_ns=source.st_mtime_ns)
+                return save_to_json(state, state_filename)
+
+    temporary = backup_filename + ".tmp"
+    try:
+        _copy_file_bytes(source_filename, temporary)
+        if validate and not validate_json_file(temporary, contacts_file_format(source_filename)):
+            os.remove(temporary)
+            return False
+        os.replace(temporary, backup_filename)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        return False
+
+    if incremental:
+        state = {
+            'size': source.st_size,
+            'mtime_ns': source.st_mtime_ns,
+            'sha256': digest or _file_sha256(backup_filename),
+        }
+        return save_to_json(state, state_filename)
+    return True
 
 
-def get_file_stats(filename):
+def get_file_stats(filename, use_cache=True):
     """
     Get statistics about a JSON file.
 
+    The type and count come from scan_json_file(), which counts the items
+    without decoding them. The result is remembered per file and returned
+    again while the file's size and modification time stay the same (a
+    change within the file system's timestamp resolution that keeps the
+    size is not noticed).
+
     Args:
         filename (str): File to analyze
+        use_cache (bool): Reuse the stats of an unchanged file
 
     Returns:
         dict or None: Dictionary with keys:
@@ -165,12 +477,14 @@ def get_file_stats(filename):
         {'exists': True, 'type': 'list', 'count': 5, 'size_bytes': 1234}
     """
     # problem 4.7
-    import os
-
     stats = {}
     
     # check if file exists
-    stats["exists"] = os.path.exists(filename)
+    try:
+        source = os.stat(filename)
+    except OSError:
+        source = None
+    stats["exists"] = source is not None
     
     if not stats["exists"]:
         # if the file does not exist, this sets the other stats
@@ -178,33 +492,54 @@ def get_file_stats(filename):
         stats["count"] = 0
         stats["size_bytes"] = 0
     else:
-        # if the file exists, os.path.getsize() gives the file size
-        stats["size_bytes"] = os.path.getsize(filename)
-        
-        # load the file via older function to get "internal" stats
-        data = load_from_json(filename)
-        
-        if data is None:
-            # file exists, but is not a valid JSON
-            stats["type"] = "corrupt_or_empty"
-            stats["count"] = 0
-        # find the number of items or keys
-        elif isinstance(data, list):
+        stats["size_bytes"] = source.st_size
+        path = os.path.abspath(filename)
+        cached = _file_stats_cache.get(path)
+        if use_cache and cached is not None and cached[:2] == (source.st_size, source.st_mtime_ns):
+            return dict(cached[2])
+
+        # the same detection as load_contacts_from_file()
+        file_format = contacts_file_format(filename)
+        if file_format == 'jsonl':
+            # one item per non-blank line
             stats["type"] = "list"
-            stats["count"] = len(data)
-        elif isinstance(data, dict):
-            stats["type"] = "dict"
-            stats["count"] = len(data) # Number of keys
+            with open(filename, "rb") as f:
+                stats["count"] = sum(1 for line in f if line.strip())
+        elif file_format == 'binary':
+            # a binary contacts file has the number of contacts in its header
+            stats["type"] = "list"
+            try:
+                stats["count"] = count_binary_contacts(filename)
+            except ValueError:
+                stats["type"] = "corrupt_or_empty"
+                stats["count"] = 0
         else:
-            stats["type"] = "other" # e.g., a single string or number
-            stats["count"] = 1
+            try:
+                stats["type"], stats["count"] = scan_json_file(filename)
+            except ValueError:
+                # file exists, but is not a valid JSON
+                stats["type"] = "corrupt_or_empty"
+                stats["count"] = 0
+        if use_cache:
+            _file_stats_cache[path] = (source.st_size, source.st_mtime_ns, dict(stats))
     
     return stats
 
+
+def clear_file_stats_cache():
+    """
+    Forget the stats get_file_stats() remembered.
+    """
+    _file_stats_cache.clear()
+
 def merge_json_files(file1, file2, output_file):
     """
     Merge two JSON files containing lists.
 
+    A file that does not exist or is not a valid JSON list counts as an empty list,
+    as in load_contacts_from_file(); to fail on it instead, use
+    merge_many_json_files().
+
     Args:
         file1 (str): First file
         file2 (str): Second file
@@ -218,25 +553,171 @@ def merge_json_files(file1, file2, output_file):
         output_file.json will have [1, 2, 3, 4, 5]
     """
     # problem 4.8
-    # load the data with previous function (will be [] if the file does not exist).
-    list1 = load_contacts_from_file(file1)
-    list2 = load_contacts_from_file(file2)
+    # the two files are streamed into the output, see merge_many_json_files(); a damaged
+    # file must not add the items before the damage, so the merge starts over without it
+    input_files = [file1, file2]
+    while True:
+        damaged = []
+        if _merge_files(input_files, output_file, None, None, None, damaged):
+            return True
+        if not damaged:
+            return False
+        input_files.remove(damaged[0])
+
+
+def _write_json_items(f, items, file_format, batch=1000):
+    # writes the items a batch at a time, as json.dump(list(items), f, indent=2) would;
+    # one dumps() call per batch, since setting up the indenting encoder costs more than a small item
+    items = iter(items)
+    separator = "[\n  "
+    while True:
+        chunk = list(itertools.islice(items, batch))
+        if not chunk:
+            break
+        if file_format == 'jsonl':
+            f.write("".join(json.dumps(item, default=Contact.json_default) + "\n" for item in chunk))
+        else:
+            # the items of "[\n  item,\n  item\n]", without the brackets
+            f.write(separator + json.dumps(chunk, indent=2, default=Contact.json_default)[4:-2])
+            separator = ",\n  "
+    if file_format != 'jsonl':
+        f.write("[]" if separator == "[\n  " else "\n]")
+
+
+def _sorted_by(items, field):
+    # passes the items through, checking that they come sorted by field
+    previous = None
+    for number, item in enumerate(items):
+        value = item.get(field)
+        if number and value < previous:
+            raise ValueError(f"inputs are not sorted by {field!r}")
+        previous = value
+        yield item
+
+
+def _checked_items(filename, damaged):
+    # the items of one input; a file that cannot be read is added to damaged before the error goes on
+    try:
+        yield from iter_contacts_from_file(filename)
+    except (OSError, ValueError):
+        damaged.append(filename)
+        raise
+
+
+def _without_duplicates(items, field, adjacent):
+    # keeps the first item for every value of field; items where it is missing or empty are all kept
+    seen = set()
+    previous = None
+    for item in items:
+        value = item.get(field) if isinstance(item, dict) else None
+        if value is not None and value != "":
+            # sorted by the same field, duplicates are neighbours and nothing has to be remembered
+            if adjacent:
+                if value == previous:
+                    continue
+                previous = value
+            else:
+                # lists and dictionaries cannot go into a set, their JSON text can
+                marker = value if isinstance(value, (str, int, float)) else json.dumps(value, sort_keys=True)
+                if marker in seen:
+                    continue
+                seen.add(marker)
+        yield item
+
+
+def merge_many_json_files(input_files, output_file, dedupe_key=None, sort_key=None, file_format=None):
+    """
+    Merge any number of JSON (or JSON Lines) files containing lists.
+
+    The inputs are read one item at a time and the output is written as the
+    items arrive, so memory does not grow with the file sizes (except for a
+    binary output, whose string table has to be complete before the first
+    record is written, so its items are collected first). The output is
+    written to a temporary file and renamed at the end; if an input is not a
+    valid list, the merge stops there and the output file is left as it was.
+
+    With sort_key, every input must already be sorted by that field; the
+    inputs are then merged with a k-way heap merge into one sorted output
+    (heapq.merge). With dedupe_key, only the first item (in output order) for
+    every value of that field is kept; items where the field is missing or
+    empty are never duplicates, so e.g. contacts without an email are all
+    kept with dedupe_key='email'. Removing duplicates remembers the
+    values seen so far, unless dedupe_key equals sort_key: then duplicates
+    are next to each other and memory stays constant.
 
-    # combine them
-    combined_list = list1 + list2
-    
-    # save combined list
-    return save_to_json(combined_list, output_file)
+    Args:
+        input_files (list): Files to merge, in order
+        output_file (str): Output file
+        dedupe_key (str): Field whose value identifies duplicates (optional)
+        sort_key (str): Field the inputs are sorted by (optional)
+        file_format (str): Output format, 'json', 'jsonl' or 'binary' (default: from the extension)
 
+    Returns:
+        bool: True if successful
 
-def search_json_file(filename, key, value):
+    Example:
+        If a.json has [{'id': 1}, {'id': 3}] and b.json has [{'id': 2}, {'id': 3}],
+        merge_many_json_files(['a.json', 'b.json'], 'out.json', dedupe_key='id', sort_key='id')
+        writes [{'id': 1}, {'id': 2}, {'id': 3}]
+    """
+    return _merge_files(input_files, output_file, dedupe_key, sort_key, file_format, [])
+
+
+def _merge_files(input_files, output_file, dedupe_key, sort_key, file_format, damaged):
+    # merge_many_json_files(); an input that turns out not to be a valid list is added to damaged
+    streams = [_checked_items(filename, damaged) for filename in input_files]
+    if sort_key is None:
+        items = (item for stream in streams for item in stream)
+    else:
+        # heapq.merge keeps only the next item of every input in its heap
+        streams = [_sorted_by(stream, sort_key) for stream in streams]
+        items = heapq.merge(*streams, key=lambda item: item.get(sort_key))
+    if dedupe_key is not None:
+        items = _without_duplicates(items, dedupe_key, adjacent=dedupe_key == sort_key)
+
+    file_format = contacts_file_format(output_file, file_format, sniff=False)
+    temporary = output_file + ".tmp"
+    try:
+        try:
+            if file_format == 'binary':
+                with open(temporary, "wb") as f:
+                    write_binary_contacts(list(items), f)
+            else:
+                with open(temporary, "w") as f:
+                    _write_json_items(f, items, file_format)
+            os.replace(temporary, output_file)
+        finally:
+            # whatever stopped the merge, no half-written output is left behind,
+            # and the inputs still being read are closed
+            for stream in streams:
+                stream.close()
+            if os.path.exists(temporary):
+                os.remove(temporary)
+    except (OSError, ValueError, TypeError, AttributeError):
+        # AttributeError: sort_key or dedupe_key given for items that are not dictionaries
+        return False
+    return True
+
+
+def search_json_file(filename, key, value, prefilter=False):
     """
     Search a JSON file (containing a list of dicts) for items matching a key-value pair.
 
+    With prefilter=True and a string value, the file is memory-mapped and
+    searched for the value's JSON encoding as bytes, and only the records
+    around a hit are decoded (see iter_records_containing() in json_stream.py).
+    That finds values written the way json.dump writes them, with or without
+    ensure_ascii, in JSON Lines files and in lists of dictionaries written
+    with an indent, as save_to_json() writes them; a binary contacts file is
+    always read record by record. For any other file, or when the record
+    around a match cannot be found, the whole file is decoded instead, so
+    the result is always the same as without prefilter.
+
     Args:
         filename (str): JSON file to search
         key (str): Key to search for
         value: Value to match
+        prefilter (bool): Look for the value's bytes before decoding anything
 
     Returns:
         list: List of matching items
@@ -247,18 +728,133 @@ def search_json_file(filename, key, value):
         returns [{'name': 'Alice', 'age': 25}]
     """
     # problem 4.9
-    # load the data with previous function (will be [] if the file does not exist).
-    data = load_contacts_from_file(filename)
-    
+    # with a valid index for this key (see index_json_file), only the matching records are read
+    index = load_json_index(filename)
+    if index is not None:
+        with index:
+            if key in index.keys:
+                return index.search(key, value)
+
+    file_format = contacts_file_format(filename)
+    if prefilter and isinstance(value, str) and os.path.exists(filename) and file_format != 'binary':
+        # json.dump escapes non-ASCII characters by default, files written with
+        # ensure_ascii=False hold them as UTF-8
+        needles = {json.dumps(value).encode(), json.dumps(value, ensure_ascii=False).encode("utf-8")}
+        json_lines = file_format == 'jsonl'
+        try:
+            return [item for item in iter_records_containing(filename, needles, json_lines)
+                    if isinstance(item, dict) and item.get(key) == value]
+        except ValueError:
+            # a compact file, or a match whose record could not be found:
+            # the full scan below finds every record
+            pass
+
+    # the items are read one at a time, so only the matches are kept in memory
+    # (nothing is found if the file does not exist or is not a valid list)
     results = []
-    for item in data:
-        # .get(key) to prevent a crash if key does not exist (returns None)
-        if item.get(key) == value:
-            results.append(item)
+    try:
+        for item in iter_contacts_from_file(filename, file_format):
+            # .get(key) to prevent a crash if key does not exist (returns None)
+            if item.get(key) == value:
+                results.append(item)
+    except ValueError:
+        return []
             
     return results
 
 
+def index_json_file(filename, keys, file_format=None):
+    """
+    Build the sidecar index that search_json_file() uses for these keys.
+
+    The index is saved as filename + ".idx" and is ignored as soon as the
+    file changes, so it has to be built again after the contacts are saved.
+
+    Args:
+        filename (str): JSON (or JSON Lines) file holding a list of dictionaries
+        keys (list): Keys to index, e.g. ['name', 'phone']
+        file_format (str): 'json' or 'jsonl' (default: detected, see contacts_file_format())
+
+    Returns:
+        bool: True if successful
+    """
+    try:
+        build_json_index(filename, keys, contacts_file_format(filename, file_format))
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def save_name_bloom(bloom, filename="contacts.json"):
+    """
+    Save a name Bloom filter next to its contacts file (as filename + ".bloom").
+
+    The size and modification time of the contacts file are saved with it,
+    so load_name_bloom() can tell when the contacts changed afterwards.
+
+    Args:
+        bloom (BloomFilter): Filter built from the contacts in filename
+        filename (str): The contacts file
+
+    Returns:
+        bool: True if successful
+    """
+    try:
+        source = os.stat(filename)
+        with open(filename + ".bloom", "wb") as f:
+            f.write(_BLOOM_SOURCE.pack(source.st_size, source.st_mtime_ns))
+            f.write(bloom.to_bytes())
+        return True
+    except OSError:
+        return False
+
+
+def load_name_bloom(filename="contacts.json"):
+    """
+    Load the Bloom filter saved next to a contacts file.
+
+    Args:
+        filename (str): The contacts file
+
+    Returns:
+        BloomFilter or None: The filter, or None if there is none, it is
+        damaged, or the contacts file changed since it was saved
+    """
+    try:
+        source = os.stat(filename)
+        with open(filename + ".bloom", "rb") as f:
+            data = f.read()
+        size, mtime_ns = _BLOOM_SOURCE.unpack_from(data)
+        if (size, mtime_ns) != (source.st_size, source.st_mtime_ns):
+            return None
+        return BloomFilter.from_bytes(data[_BLOOM_SOURCE.size:])
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def load_contacts_with_bloom(filename="contacts.json", error_rate=0.01):
+    """
+    Load contacts together with their name Bloom filter.
+
+    The saved filter is used when it is still valid, otherwise a new one is
+    built and saved, so it is only rebuilt after the contacts file changed.
+
+    Args:
+        filename (str): File to load from
+        error_rate (float): False-positive rate for a newly built filter
+
+    Returns:
+        tuple: (list of contacts, BloomFilter)
+    """
+    contacts = load_contacts_from_file(filename)
+    bloom = load_name_bloom(filename)
+    if bloom is None:
+        bloom = build_name_bloom(contacts, error_rate)
+        if os.path.exists(filename):
+            save_name_bloom(bloom, filename)
+    return contacts, bloom
+
+
 # Test cases
 if __name__ == "__main__":
     print("Testing JSON File Operations...")
@@ -6,6 +6,12 @@ This file contains pytest tests that will run automatically via GitHub Actions.
 import pytest
 import os
 import json
+import io
+import threading
+import time
+import asyncio
+import subprocess
+import sys
 
 # Import student solutions
 from problem1 import (
@@ -23,14 +29,33 @@ from problem2 import (
 from problem3 import (
     create_contact, add_contact, find_contact_by_name,
     search_contacts, delete_contact, count_contacts_with_email,
-    get_all_phone_numbers, sort_contacts_by_name, contact_exists
+    get_all_phone_numbers, sort_contacts_by_name, contact_exists,
+    ContactBook, normalize_phone, compact_contacts, bulk_delete, Contact,
+    add_contacts_bulk, build_name_bloom, TOMBSTONE_COMPACT_RATIO
 )
 
+from contact_dedupe import (
+    normalize_name, soundex, find_duplicate_clusters
+)
+
+from contact_store import ConcurrentContactBook, ReadWriteLock
+
+from contact_server import ContactClient, handle_request, start_server
+
+from contact_shm import SharedContactStore
+
 from problem4 import (
     save_to_json, load_from_json, save_contacts_to_file,
     load_contacts_from_file, append_contact_to_file,
-    backup_file, get_file_stats, merge_json_files, search_json_file
+    backup_file, get_file_stats, merge_json_files, search_json_file,
+    save_name_bloom, load_name_bloom, load_contacts_with_bloom, contacts_file_format,
+    iter_contacts_from_file, index_json_file, validate_json_file, clear_file_stats_cache,
+    merge_many_json_files
 )
+from json_index import load_json_index
+from contact_writer import GroupCommitWriter
+from contact_binary import load_binary_contacts
+from json_stream import iter_json_array, scan_json_file
 
 
 # Problem 1 Tests: List Operations
@@ -177,6 +202,536 @@ class TestProblem3:
         assert contact_exists(contacts, "Alice") == True
         assert contact_exists(contacts, "David") == False
 
+    def test_tombstone_delete(self):
+        contacts = [
+            {'name': 'Alice', 'phone': '555-0001', 'email': 'alice@email.com'},
+            {'name': 'Bob', 'phone': '555-0002', 'email': 'bob@email.com'},
+            {'name': 'Charlie', 'phone': '555-0003', 'email': ''}
+        ]
+        assert delete_contact(contacts, 'Alice', tombstone=True) == True
+        assert contacts[0] is None and len(contacts) == 3
+        assert find_contact_by_name(contacts, 'Alice') is None
+        assert contact_exists(contacts, 'Bob') == True
+        assert len(search_contacts(contacts, '555')) == 2
+        assert count_contacts_with_email(contacts) == 1
+        assert get_all_phone_numbers(contacts) == ['555-0002', '555-0003']
+        assert [c['name'] for c in sort_contacts_by_name(contacts)] == ['Bob', 'Charlie']
+        # the second tombstone passes the compaction ratio
+        assert delete_contact(contacts, 'Charlie', tombstone=True) == True
+        assert contacts == [{'name': 'Bob', 'phone': '555-0002', 'email': 'bob@email.com'}]
+        assert delete_contact(contacts, 'Charlie', tombstone=True) == False
+        # deleting back to front leaves every tombstone after the match
+        contacts = [{'name': f'C{i}', 'phone': '', 'email': ''} for i in range(1000)]
+        for i in reversed(range(999)):
+            assert delete_contact(contacts, f'C{i}', tombstone=True) == True
+        assert contacts.count(None) <= len(contacts) * TOMBSTONE_COMPACT_RATIO
+        assert [c['name'] for c in contacts if c is not None] == ['C999']
+
+    def test_compact_contacts(self):
+        contacts = [None, {'name': 'Bob', 'phone': '555-0002', 'email': ''}, None]
+        assert compact_contacts(contacts) == 2
+        assert len(contacts) == 1
+
+    def test_bulk_delete(self):
+        contacts = [
+            {'name': 'Alice', 'phone': '555-0001', 'email': ''},
+            {'name': 'Bob', 'phone': '555-0002', 'email': ''},
+            None,
+            {'name': 'alice', 'phone': '555-0003', 'email': ''},
+            {'name': 'Alice', 'phone': '555-0004', 'email': ''}
+        ]
+        assert bulk_delete(contacts, ['ALICE', 'alice', 'David']) == 2
+        assert [c['phone'] for c in contacts] == ['555-0002', '555-0004']
+
+
+    def test_contact_record(self):
+        contact = Contact("Alice", "555-0001", "alice@email.com")
+        assert contact == create_contact("Alice", "555-0001", "alice@email.com")
+        assert contact['phone'] == '555-0001'
+        assert contact.get('missing', 'x') == 'x'
+        assert dict(contact) == contact.to_dict()
+        assert Contact.from_dict(contact.to_dict()) == contact
+        with pytest.raises(KeyError):
+            contact['age']
+
+    def test_functions_accept_contact_records(self):
+        contacts = [Contact('Charlie', '555-0003'), Contact('Alice', '555-0001', 'a@email.com')]
+        assert find_contact_by_name(contacts, 'alice') is contacts[1]
+        assert search_contacts(contacts, '0003') == [contacts[0]]
+        assert count_contacts_with_email(contacts) == 1
+        assert get_all_phone_numbers(contacts) == ['555-0003', '555-0001']
+        assert sort_contacts_by_name(contacts)[0]['name'] == 'Alice'
+        assert delete_contact(contacts, 'Charlie') == True
+        assert contact_exists(contacts, 'Charlie') == False
+
+
+    def test_add_contacts_bulk(self):
+        contacts = [{'name': 'Alice', 'phone': '555-0001', 'email': ''}, None]
+        counts = add_contacts_bulk(contacts, [
+            ("alice", "(555) 0001", "alice@email.com"),
+            ("Bob", "555-0002", "bob@email.com"),
+            ("BOB", "555 0002"),
+            ("Bob", "555-0009"),
+        ])
+        assert counts == {'inserted': 2, 'skipped': 1, 'merged': 1}
+        assert contacts[0]['email'] == 'alice@email.com'
+        assert [c['phone'] for c in contacts[2:]] == ['555-0002', '555-0009']
+        assert contacts[2]['email'] == 'bob@email.com'
+
+
+# Problem 3 Tests: ContactBook
+class TestContactBook:
+    def make_book(self):
+        return ContactBook([
+            {'name': 'Alice Smith', 'phone': '555-0001', 'email': 'alice@email.com'},
+            {'name': 'Bob Jones', 'phone': '555-0002', 'email': ''},
+            {'name': 'Charlie', 'phone': '555-0003', 'email': 'charlie@email.com'}
+        ])
+
+    def test_skips_tombstones(self):
+        contacts = [{'name': f'C{i}', 'phone': f'555-000{i}', 'email': ''} for i in range(4)]
+        assert delete_contact(contacts, 'C1', tombstone=True) == True
+        book = ContactBook(contacts)
+        assert len(book) == 3
+        assert book.contact_exists('C1') == False
+        assert [c['name'] for c in book] == ['C0', 'C2', 'C3']
+
+    def test_find_contact_by_name(self):
+        book = self.make_book()
+        assert book.find_contact_by_name('alice SMITH')['phone'] == '555-0001'
+        assert book.find_contact_by_name('David') is None
+
+    def test_add_and_delete_contact(self):
+        book = self.make_book()
+        book.add_contact("David", "555-0004", "david@email.com")
+        assert book.contact_exists("DAVID") == True
+        assert book.find_contact_by_name("david")['email'] == 'david@email.com'
+        assert book.delete_contact("bob jones") == True
+        assert book.delete_contact("bob jones") == False
+        assert book.contact_exists("Bob Jones") == False
+        assert [c['name'] for c in book] == ['Alice Smith', 'Charlie', 'David']
+
+    def test_duplicate_names(self):
+        book = ContactBook()
+        book.add_contact("Alice", "555-0001")
+        book.add_contact("alice", "555-0009")
+        assert book.find_contact_by_name("ALICE")['phone'] == '555-0001'
+        assert book.delete_contact("Alice") == True
+        assert book.find_contact_by_name("ALICE")['phone'] == '555-0009'
+
+    def test_matches_list_functions(self):
+        book = self.make_book()
+        contacts = book.contacts
+        assert book.search_contacts('555-000') == search_contacts(contacts, '555-000')
+        assert book.count_contacts_with_email() == count_contacts_with_email(contacts)
+        assert book.get_all_phone_numbers() == get_all_phone_numbers(contacts)
+        assert book.sort_contacts_by_name() == sort_contacts_by_name(contacts)
+
+    def test_add_contacts_bulk(self):
+        book = self.make_book()
+        book.sort_contacts_by_name()
+        book.complete_phone('555')
+        counts = book.add_contacts_bulk([
+            ("bob jones", "5550002", "bob@email.com"),
+            ("Aaron", "555-0000", "aaron@email.com"),
+            ("aaron", "555 0000", "other@email.com"),
+            ("Charlie", "555-0003", "other@email.com"),
+        ])
+        assert counts == {'inserted': 1, 'skipped': 2, 'merged': 1}
+        assert book.find_contact_by_name('Bob Jones')['email'] == 'bob@email.com'
+        assert book.sort_contacts_by_name() == sort_contacts_by_name(book.contacts)
+        assert book.complete_phone('5550000')[0]['name'] == 'Aaron'
+
+    def test_aggregates_with_debug_checks(self):
+        book = ContactBook(debug_checks=True, substring_index=True)
+        book.add_contact("Alice", "555-0001", "alice@email.com")
+        book.add_contact("Bob", "555-0002")
+        book.sort_contacts_by_name()
+        book.complete_phone('555')
+        phones = book.phone_numbers_view()
+        assert book.count_contacts_with_email() == 1
+        assert book.update_contact("bob", phone="555-0009", email="bob@email.com") == True
+        assert book.update_contact("David", email="david@email.com") == False
+        assert book.count_contacts_with_email() == 2
+        assert list(phones) == ['555-0001', '555-0009']
+        assert book.search_contacts('0009')[0]['name'] == 'Bob'
+        book.add_contacts_bulk([("Charlie", "555-0003"), ("Alice", "5550001", "new@email.com")])
+        book.bulk_delete(["alice"])
+        assert book.count_contacts_with_email() == count_contacts_with_email(book.contacts)
+        assert list(phones) == get_all_phone_numbers(book.contacts)
+
+    def test_check_consistency_detects_changes(self):
+        book = self.make_book()
+        assert book.check_consistency() == True
+        # changing a contact behind the book's back leaves the aggregates behind
+        book.find_contact_by_name('Bob Jones')['email'] = 'bob@email.com'
+        with pytest.raises(RuntimeError):
+            book.check_consistency()
+
+    def test_find_contacts_fuzzy(self):
+        book = ContactBook(debug_checks=True)
+        for name in ['Alice', 'Alicia', 'Alina', 'Bob', 'alice']:
+            book.add_contact(name, '555-0000')
+        names = [c['name'] for c in book.find_contacts_fuzzy('Alise', 1)]
+        assert names == ['Alice', 'alice']
+        names = [c['name'] for c in book.find_contacts_fuzzy('alice', 2)]
+        assert names == ['Alice', 'alice', 'Alicia', 'Alina']
+        book.delete_contact('Alice')
+        book.delete_contact('Alice')
+        book.add_contact('Alise', '555-0001')
+        assert [c['name'] for c in book.find_contacts_fuzzy('alice', 1)] == ['Alise']
+        assert book.find_contacts_fuzzy('Zed', 1) == []
+
+    def test_email_domain_index(self):
+        book = ContactBook(debug_checks=True)
+        book.add_contact("Alice", "555-0001", "alice@example.com")
+        book.add_contact("Bob", "555-0002", "bob@Example.COM")
+        book.add_contact("Charlie", "555-0003", "charlie@mail.com")
+        book.add_contact("Dana", "555-0004")
+        assert [c['name'] for c in book.contacts_by_email_domain('example.com')] == ['Alice', 'Bob']
+        assert book.email_domain_histogram() == {'example.com': 2, 'mail.com': 1}
+        book.update_contact("Dana", email="dana@mail.com")
+        book.update_contact("Alice", email="")
+        book.delete_contact("Bob")
+        assert book.email_domain_histogram() == {'mail.com': 2}
+        assert book.contacts_by_email_domain('example.com') == []
+        assert book.count_contacts_with_email() == 2
+
+    def test_compact_book(self):
+        book = ContactBook(compact=True)
+        contact = book.add_contact("Alice", "555-0001", "alice@email.com")
+        assert isinstance(contact, Contact)
+        assert book.find_contact_by_name("ALICE") == contact
+        assert book.count_contacts_with_email() == 1
+
+    def test_substring_index_search(self):
+        contacts = [
+            {'name': 'Alice Smith', 'phone': '555-0001', 'email': ''},
+            {'name': 'Bob Smithers', 'phone': '555-0002', 'email': ''},
+            {'name': 'Charlie', 'phone': '555-1234', 'email': ''}
+        ]
+        book = ContactBook(contacts, substring_index=True)
+        for term in ['SMITH', 'smithe', '555-0', '1234', 'li', '', 'zzz', '555-0001']:
+            assert book.search_contacts(term) == search_contacts(contacts, term)
+        book.delete_contact('Alice Smith')
+        book.add_contact('Dana Smith', '555-9999')
+        assert [c['name'] for c in book.search_contacts('smith')] == ['Bob Smithers', 'Dana Smith']
+
+    def test_normalize_phone(self):
+        assert normalize_phone("+41 (21) 692-0001") == '41216920001'
+        assert normalize_phone("none") == ''
+
+    def test_complete_phone(self):
+        book = ContactBook([
+            {'name': 'Alice', 'phone': '555-0102', 'email': ''},
+            {'name': 'Bob', 'phone': '(555) 0101', 'email': ''},
+            {'name': 'Charlie', 'phone': '444-0100', 'email': ''}
+        ])
+        assert [c['name'] for c in book.complete_phone('555-01')] == ['Bob', 'Alice']
+        assert [c['name'] for c in book.complete_phone('5', limit=1)] == ['Bob']
+        book.add_contact('Dana', '555 0100')
+        book.delete_contact('Bob')
+        assert [c['name'] for c in book.complete_phone('55501')] == ['Dana', 'Alice']
+        assert book.complete_phone('9') == []
+
+    def test_complete_phone_after_update(self):
+        book = ContactBook(debug_checks=True)
+        book.add_contact('Ann', '555')
+        book.add_contact('Bob', '555')
+        book.build_indexes()
+        # re-indexing the updated contact must not move it behind Bob
+        book.update_contact('Ann', email='a@x.com')
+        assert [c['name'] for c in book.complete_phone('555')] == ['Ann', 'Bob']
+
+    def test_sorted_phone_numbers(self):
+        book = ContactBook([
+            {'name': 'Alice', 'phone': '555-0002', 'email': ''},
+            {'name': 'Bob', 'phone': '444-0009', 'email': ''},
+            {'name': 'Charlie', 'phone': '555-0001', 'email': ''}
+        ])
+        assert book.get_all_phone_numbers() == ['555-0002', '444-0009', '555-0001']
+        assert book.get_all_phone_numbers(sort_by_digits=True) == ['444-0009', '555-0001', '555-0002']
+        book.delete_contact('Bob')
+        assert list(book.iter_phone_numbers(sort_by_digits=True)) == ['555-0001', '555-0002']
+
+    def test_sorted_view(self):
+        book = ContactBook()
+        for name in ['Mike', 'Mabel', 'Anna', 'McCoy', 'Mary', 'Anna']:
+            book.add_contact(name, '555-0000')
+        assert book.sort_contacts_by_name() == sort_contacts_by_name(book.contacts)
+        book.add_contact('Zoe', '555-0001')
+        book.add_contact('Aaron', '555-0002')
+        book.delete_contact('mary')
+        assert book.sort_contacts_by_name() == sort_contacts_by_name(book.contacts)
+        names = [c['name'] for c in book.iter_sorted_contacts(offset=2, limit=3)]
+        assert names == ['Anna', 'Mabel', 'McCoy']
+        assert list(book.iter_sorted_contacts(offset=10)) == []
+        assert [c['name'] for c in book.contacts_in_name_range('Ma', 'Mc')] == ['Mabel']
+        assert [c['name'] for c in book.contacts_in_name_range('Ma', 'Md')] == ['Mabel', 'McCoy']
+
+    def test_search_cache(self):
+        book = ContactBook([
+            {'name': 'Alice Smith', 'phone': '555-0001', 'email': ''},
+            {'name': 'Bob Jones', 'phone': '555-0002', 'email': ''}
+        ], search_cache_size=2, debug_checks=True)
+        assert [c['name'] for c in book.search_contacts('SMITH')] == ['Alice Smith']
+        assert [c['name'] for c in book.search_contacts('smith')] == ['Alice Smith']
+        book.search_contacts('jones')
+        assert book.search_cache_stats()['hits'] == 1
+        # adding a matching contact drops 'smith' but keeps 'jones'
+        book.add_contact('Carol Smith', '555-0003')
+        assert [c['name'] for c in book.search_contacts('smith')] == ['Alice Smith', 'Carol Smith']
+        book.update_contact('Bob Jones', phone='444-0002')
+        assert book.search_contacts('555') == book.search_contacts('555')
+        assert [c['name'] for c in book.search_contacts('555')] == ['Alice Smith', 'Carol Smith']
+        book.delete_contact('alice smith')
+        assert [c['name'] for c in book.search_contacts('smith')] == ['Carol Smith']
+        book.add_contacts_bulk([('Dan Smith', '555-0004')])
+        assert [c['name'] for c in book.search_contacts('smith')] == ['Carol Smith', 'Dan Smith']
+        assert book.search_cache_stats()['size'] == 1
+        for term in ['a', 'b', 'c']:
+            book.search_contacts(term)
+        stats = book.search_cache_stats()
+        assert stats['size'] == 2 and stats['evictions'] == 2 and stats['invalidations'] > 0
+        assert ContactBook().search_cache_stats() is None
+
+
+# Problem 3 Tests: Duplicate detection
+class TestContactDedupe:
+    def test_normalize_name(self):
+        assert normalize_name("Smith, John") == normalize_name("john  SMITH")
+        assert normalize_name("Zoë") == 'zoe'
+
+    def test_soundex(self):
+        assert soundex("Robert") == soundex("Rupert") == 'R163'
+        assert soundex("Ashcraft") == 'A261'
+        assert soundex("Lee") == 'L000'
+
+    def test_find_duplicate_clusters(self):
+        contacts = [
+            {'name': 'John Smith', 'phone': '+41 21 692 0001', 'email': ''},
+            {'name': 'Alice Jones', 'phone': '555-0002', 'email': 'alice@email.com'},
+            {'name': 'Smith, Jon', 'phone': '021-692-0001', 'email': ''},
+            None,
+            {'name': 'A. Jones', 'phone': '', 'email': 'ALICE@email.com '},
+            {'name': 'John Smith', 'phone': '999-9999', 'email': ''},
+            {'name': 'Bob', 'phone': '', 'email': ''},
+            {'name': 'Bob', 'phone': '', 'email': ''},
+        ]
+        assert find_duplicate_clusters(contacts) == [[0, 2], [1, 4], [6, 7]]
+
+    def test_household_is_not_merged(self):
+        # different people on one phone, or short names close only by edit count
+        contacts = [
+            {'name': 'Ann Lee', 'phone': '555-0101', 'email': ''},
+            {'name': 'Ben Lee', 'phone': '555-0101', 'email': ''},
+            {'name': 'Al', 'phone': '', 'email': ''},
+            {'name': 'Bo', 'phone': '555-0202', 'email': ''},
+            {'name': 'Anne Lee', 'phone': '555-0101', 'email': ''},
+        ]
+        assert find_duplicate_clusters(contacts) == [[0, 4]]
+
+    def test_typo_with_shared_phone_is_merged(self):
+        # each typo changes the soundex code; the matching phone is the evidence
+        contacts = [
+            {'name': 'Carol Davis', 'phone': '555-0101', 'email': ''},
+            {'name': 'Bob Moore', 'phone': '555-0202', 'email': ''},
+            {'name': 'Davis, Carol', 'phone': '555-0303', 'email': ''},
+            {'name': 'Davis, Xarol', 'phone': '+1 555 0101', 'email': ''},
+            {'name': 'Moore, Bxb', 'phone': '555 0202', 'email': ''},
+            {'name': 'Moore, Bxb', 'phone': '', 'email': ''},
+        ]
+        assert find_duplicate_clusters(contacts) == [[0, 3], [1, 4, 5]]
+        # without a phone on one side, the names must also sound alike
+        assert find_duplicate_clusters([contacts[0], {'name': 'Xarol Davis', 'phone': '', 'email': ''}]) == []
+
+    def test_oversized_blocks_are_skipped(self):
+        contacts = [{'name': 'Same Person', 'phone': '555-0000', 'email': ''}] * 5
+        assert find_duplicate_clusters(contacts) == [[0, 1, 2, 3, 4]]
+        assert find_duplicate_clusters(contacts, max_block_size=4) == []
+
+
+# Problem 3 Tests: Thread-safe contact store
+class TestConcurrentContactBook:
+    def test_same_answers_as_contact_book(self):
+        book = ConcurrentContactBook([
+            {'name': 'Alice', 'phone': '555-0001', 'email': 'alice@email.com'},
+            {'name': 'Bob', 'phone': '555-0002', 'email': ''}
+        ])
+        book.add_contact('Charlie', '555-0003')
+        assert book.delete_contact('bob') == True
+        assert book.find_contact_by_name('ALICE')['phone'] == '555-0001'
+        assert [c['name'] for c in book.sorted_contacts_page(limit=1)] == ['Alice']
+        assert [c['name'] for c in book.complete_phone('5550003')] == ['Charlie']
+        assert book.count_contacts_with_email() == 1
+        assert len(book) == 2
+
+    def test_writers_wait_for_readers(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def write():
+            with lock.write_lock():
+                events.append('write')
+
+        with lock.read_lock():
+            writer = threading.Thread(target=write)
+            writer.start()
+            writer.join(0.05)
+            # the writer cannot get in while a reader holds the lock
+            assert events == []
+        writer.join(1)
+        assert events == ['write']
+
+    def test_concurrent_reads_and_writes(self):
+        book = ConcurrentContactBook(
+            [{'name': f'Person {i}', 'phone': f'555-{i:04d}', 'email': ''} for i in range(200)]
+        )
+        errors = []
+
+        def reader():
+            try:
+                for i in range(300):
+                    assert book.find_contact_by_name(f'person {i % 200}') is not None
+                    book.search_contacts('555-01')
+            except Exception as error:
+                errors.append(error)
+
+        def writer(number):
+            try:
+                for i in range(100):
+                    book.add_contact(f'Temp {number} {i}', '555-9999')
+                    book.delete_contact(f'Temp {number} {i}')
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        threads += [threading.Thread(target=writer, args=(n,)) for n in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(book) == 200
+        assert book.check_consistency() == True
+
+
+# Problem 3 Tests: Contact query server
+class TestContactServer:
+    def test_handle_request(self):
+        book = ContactBook([{'name': 'Alice', 'phone': '555-0001', 'email': ''}])
+        response = handle_request(book, b'{"id": 7, "op": "exists", "args": ["alice"]}')
+        assert response == {'id': 7, 'ok': True, 'result': True}
+        assert handle_request(book, b'{"id": 8, "op": "nope"}')['ok'] == False
+        assert handle_request(book, b'{"id": 9, "op": "find", "args": []}')['ok'] == False
+        assert handle_request(book, b'not json')['id'] is None
+
+    def test_pipelined_clients(self):
+        async def scenario():
+            book = ContactBook([{'name': 'Alice', 'phone': '555-0001', 'email': ''}])
+            server = await start_server(book)
+            host, port = server.sockets[0].getsockname()[:2]
+            first = await ContactClient.connect(host, port)
+            second = await ContactClient.connect(host, port)
+            results = await asyncio.gather(
+                first.add('Bob', '555-0002', 'bob@email.com'),
+                first.find('ALICE'),
+                second.search('555-000'),
+                second.exists('Nobody'),
+            )
+            deleted = await second.delete('bob')
+            count = await first.count()
+            with pytest.raises(RuntimeError):
+                await first.request('nope')
+            await first.close()
+            await second.close()
+            server.close()
+            await server.wait_closed()
+            return results, deleted, count
+
+        (added, found, matches, exists), deleted, count = asyncio.run(scenario())
+        assert added == {'name': 'Bob', 'phone': '555-0002', 'email': 'bob@email.com'}
+        assert found['phone'] == '555-0001'
+        assert len(matches) == 2
+        assert exists == False and deleted == True and count == 1
+
+    def test_request_after_connection_lost(self):
+        async def scenario():
+            book = ContactBook([{'name': 'Alice', 'phone': '555-0001', 'email': ''}])
+            server = await start_server(book)
+            host, port = server.sockets[0].getsockname()[:2]
+            client = await ContactClient.connect(host, port)
+            assert (await client.find('Alice'))['phone'] == '555-0001'
+            client._writer.transport.abort()
+            # let the receiver see the end of the connection
+            await asyncio.wait_for(asyncio.shield(client._receiver), 5)
+            with pytest.raises(ConnectionError):
+                await asyncio.wait_for(client.find('Alice'), 5)
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(scenario())
+
+
+# Problem 3 Tests: Shared-memory contact store
+class TestSharedContactStore:
+    contacts = [
+        {'name': 'Charlie', 'phone': '555-0003', 'email': 'charlie@email.com'},
+        {'name': 'Alice Smith', 'phone': '555-0001', 'email': ''},
+        None,
+        {'name': 'Zoë', 'phone': '41 21 692', 'email': 'zoe@email.com'},
+        {'name': 'alice smith', 'phone': '555-0009', 'email': ''},
+    ]
+
+    def test_same_answers_as_list_functions(self):
+        store = SharedContactStore.create(self.contacts)
+        reader = SharedContactStore.attach(store.name)
+        try:
+            live = [c for c in self.contacts if c is not None]
+            assert len(reader) == 4
+            assert list(reader) == live
+            for name in ['ALICE SMITH', 'zoë', 'charlie', 'David', '']:
+                assert reader.find_contact_by_name(name) == find_contact_by_name(live, name)
+                assert reader.contact_exists(name) == contact_exists(live, name)
+            for term in ['smith', '555', 'Ë', '00', '', 'xyz', 'e']:
+                assert reader.search_contacts(term) == search_contacts(live, term)
+            assert reader.count_contacts_with_email() == 2
+            assert reader.get_all_phone_numbers() == get_all_phone_numbers(live)
+            assert reader.sort_contacts_by_name() == sort_contacts_by_name(live)
+        finally:
+            reader.close()
+            store.close()
+            store.unlink()
+
+    def test_attach_from_other_process(self):
+        store = SharedContactStore.create(self.contacts)
+        try:
+            # a separate interpreter has its own resource tracker, which unlinks
+            # every block registered with it when that interpreter exits
+            script = ("from contact_shm import SharedContactStore; "
+                      f"reader = SharedContactStore.attach({store.name!r}); "
+                      "print(reader.find_contact_by_name('charlie')['phone']); reader.close()")
+            result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+            assert result.stdout.strip() == '555-0003'
+            # the block outlives the process that attached to it
+            reader = SharedContactStore.attach(store.name)
+            assert len(reader) == 4
+            reader.close()
+        finally:
+            store.close()
+            store.unlink()
+
+    def test_empty_store(self):
+        store = SharedContactStore.create([])
+        try:
+            assert len(store) == 0
+            assert store.find_contact_by_name('Alice') is None
+            assert store.search_contacts('a') == []
+        finally:
+            store.close()
+            store.unlink()
+
 
 # Problem 4 Tests: JSON File Operations
 class TestProblem4:
@@ -257,6 +812,571 @@ class TestProblem4:
         assert results[0]['name'] == 'Alice'
 
 
+# Problem 4 Tests: Name Bloom filter
+class TestNameBloom:
+    def setup_method(self):
+        self.cleanup()
+
+    def teardown_method(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file in ['test_contacts.json', 'test_contacts.json.bloom']:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def test_contact_exists_with_bloom(self):
+        contacts = [{'name': f'Person {i}', 'phone': '555-0000', 'email': ''} for i in range(1000)]
+        bloom = build_name_bloom(contacts, error_rate=0.01)
+        # never a false "no"
+        assert all(contact_exists(contacts, f'PERSON {i}', bloom) for i in range(1000))
+        assert contact_exists(contacts, 'Nobody', bloom) == False
+        false_positives = sum(f'nobody {i}' in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_save_and_load_bloom(self):
+        contacts = [{'name': 'Alice', 'phone': '555-0001', 'email': ''}]
+        save_contacts_to_file(contacts, 'test_contacts.json')
+        assert load_name_bloom('test_contacts.json') is None
+        loaded, bloom = load_contacts_with_bloom('test_contacts.json')
+        assert loaded == contacts and 'alice' in bloom
+        assert os.path.exists('test_contacts.json.bloom')
+        assert 'alice' in load_name_bloom('test_contacts.json')
+        # a changed contacts file makes the saved filter stale
+        save_contacts_to_file(contacts + [{'name': 'Bob', 'phone': '555-0002', 'email': ''}],
+                              'test_contacts.json')
+        assert load_name_bloom('test_contacts.json') is None
+        loaded, bloom = load_contacts_with_bloom('test_contacts.json')
+        assert 'bob' in bloom
+
+    def test_save_name_bloom_round_trip(self):
+        contacts = [{'name': f'Person {i}', 'phone': '555-0000', 'email': ''} for i in range(100)]
+        bloom = build_name_bloom(contacts)
+        # the filter belongs to a contacts file, so there must be one
+        assert save_name_bloom(bloom, 'test_contacts.json') == False
+        save_contacts_to_file(contacts, 'test_contacts.json')
+        assert save_name_bloom(bloom, 'test_contacts.json') == True
+        loaded = load_name_bloom('test_contacts.json')
+        assert loaded.to_bytes() == bloom.to_bytes()
+        assert all(f'person {i}' in loaded for i in range(100))
+
+    def test_damaged_bloom_file(self):
+        save_contacts_to_file([], 'test_contacts.json')
+        with open('test_contacts.json.bloom', 'wb') as f:
+            f.write(b'garbage')
+        assert load_name_bloom('test_contacts.json') is None
+
+
+# Problem 4 Tests: JSON Lines contacts files
+class TestJsonLines:
+    def setup_method(self):
+        self.cleanup()
+
+    def teardown_method(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file in ['test_contacts.jsonl', 'test_contacts.json']:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def test_append_writes_one_line(self):
+        contacts = [{'name': 'Alice', 'phone': '555-0001', 'email': ''}]
+        save_contacts_to_file(contacts, 'test_contacts.jsonl')
+        append_contact_to_file({'name': 'Bob', 'phone': '555-0002', 'email': ''}, 'test_contacts.jsonl')
+        with open('test_contacts.jsonl') as f:
+            lines = f.readlines()
+        assert len(lines) == 2
+        assert [c['name'] for c in load_contacts_from_file('test_contacts.jsonl')] == ['Alice', 'Bob']
+
+    def test_format_detection(self):
+        assert contacts_file_format('contacts.jsonl') == 'jsonl'
+        assert contacts_file_format('contacts.json', 'jsonl') == 'jsonl'
+        with pytest.raises(ValueError):
+            contacts_file_format('contacts.json', 'xml')
+        # a .json file that holds JSON Lines is recognized by its first two lines
+        for name in ['Alice', 'Bob']:
+            append_contact_to_file({'name': name, 'phone': '555-0001', 'email': ''},
+                                   'test_contacts.json', file_format='jsonl')
+        append_contact_to_file({'name': 'Carol', 'phone': '555-0003', 'email': ''}, 'test_contacts.json')
+        assert contacts_file_format('test_contacts.json') == 'jsonl'
+        assert len(load_contacts_from_file('test_contacts.json')) == 3
+        assert get_file_stats('test_contacts.json', use_cache=False)['count'] == 3
+        # a dictionary saved on one line is JSON, not a JSON Lines file with one contact
+        with open('test_contacts.json', 'w') as f:
+            json.dump({'a': 1}, f)
+        assert contacts_file_format('test_contacts.json') == 'json'
+        assert load_contacts_from_file('test_contacts.json') == {'a': 1}
+
+    def test_one_line_json_lines_file(self):
+        append_contact_to_file({'name': 'Alice', 'phone': '555-0001', 'email': ''},
+                               'test_contacts.json', file_format='jsonl')
+        assert contacts_file_format('test_contacts.json') == 'jsonl'
+        assert load_contacts_from_file('test_contacts.json') == [{'name': 'Alice', 'phone': '555-0001', 'email': ''}]
+        assert append_contact_to_file({'name': 'Bob', 'phone': '555-0002', 'email': ''}, 'test_contacts.json') == True
+        assert [c['name'] for c in load_contacts_from_file('test_contacts.json')] == ['Alice', 'Bob']
+        stats = get_file_stats('test_contacts.json', use_cache=False)
+        assert (stats['type'], stats['count']) == ('list', 2)
+
+    def test_cut_off_last_line(self):
+        save_contacts_to_file([{'name': 'Alice', 'phone': '555-0001', 'email': ''}], 'test_contacts.jsonl')
+        with open('test_contacts.jsonl', 'a') as f:
+            f.write('{"name": "Bo')
+        assert len(load_contacts_from_file('test_contacts.jsonl')) == 1
+        append_contact_to_file({'name': 'Carol', 'phone': '555-0003', 'email': ''}, 'test_contacts.jsonl')
+        assert [c['name'] for c in load_contacts_from_file('test_contacts.jsonl')] == ['Alice', 'Carol']
+
+
+# Problem 4 Tests: Streaming JSON reader
+class TestJsonStream:
+    def setup_method(self):
+        self.cleanup()
+
+    def teardown_method(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file in ['test_contacts.json', 'test_contacts.jsonl']:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def test_iter_json_array_small_chunks(self):
+        data = [1, 12.5e3, "a, ]b", {'name': 'Zoë', 'tags': [1, [2]]}, None, True, []]
+        for chunk_size in [1, 2, 5, 64]:
+            assert list(iter_json_array(io.StringIO(json.dumps(data, indent=2)), chunk_size)) == data
+        assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+
+    def test_iter_json_array_errors(self):
+        for text in ['{"a": 1}', '[1, 2', '[1,]', '[1 2]', '[1] [2]']:
+            with pytest.raises(ValueError):
+                list(iter_json_array(io.StringIO(text), 2))
+
+    def test_bad_item_does_not_read_the_rest(self):
+        for item in ['nope', '"a\tb"', '"a\\qb"', '{"a\u0001": 1}']:
+            source = io.StringIO('[1, ' + item + ', ' + ', '.join(['{"a": "xxxxxxxxxx"}'] * 10000) + ']')
+            with pytest.raises(ValueError):
+                list(iter_json_array(source, 64))
+            assert source.tell() <= 64
+        # a string cut off by the end of a chunk is read on
+        data = ['x' * 1000, 'y\\' * 100, '"' * 200]
+        assert list(iter_json_array(io.StringIO(json.dumps(data)), 64)) == data
+
+    def test_search_and_stats_stream(self):
+        contacts = [{'name': f'Person {i}', 'phone': f'555-{i:04d}', 'email': ''} for i in range(500)]
+        save_contacts_to_file(contacts, 'test_contacts.json')
+        assert search_json_file('test_contacts.json', 'phone', '555-0042') == [contacts[42]]
+        assert get_file_stats('test_contacts.json')['count'] == 500
+        assert list(iter_contacts_from_file('test_contacts.json')) == contacts
+        save_contacts_to_file(contacts, 'test_contacts.jsonl')
+        assert search_json_file('test_contacts.jsonl', 'name', 'Person 7') == [contacts[7]]
+        assert get_file_stats('test_contacts.jsonl') == {
+            'exists': True, 'size_bytes': os.path.getsize('test_contacts.jsonl'), 'type': 'list', 'count': 500
+        }
+        with open('test_contacts.json', 'w') as f:
+            f.write('[{"name": "Alice"}, {"name": ')
+        assert search_json_file('test_contacts.json', 'name', 'Alice') == []
+        assert get_file_stats('test_contacts.json')['type'] == 'corrupt_or_empty'
+
+    def test_scan_json_file(self):
+        cases = [
+            ([{'name': 'a, "b"]', 'tags': [1, {'x': '}'}]}, 2, 'three', {}], ('list', 4)),
+            ({'a': 1, 'b': [1, 2], 'c': {'d': ','}}, ('dict', 3)),
+            ([{'name': 'say "hi", {', 'note': '\\'}, {'name': '[x'}], ('list', 2)),
+            ([], ('list', 0)),
+            ({}, ('dict', 0)),
+            ("text", ('other', 1)),
+        ]
+        for data, expected in cases:
+            save_to_json(data, 'test_contacts.json')
+            for chunk_size in [1, 3, 1 << 20]:
+                assert scan_json_file('test_contacts.json', chunk_size) == expected
+        for text in ['', '[1, 2', '[1}', '[1] [2]', '[\n  1,\n  {"a": [}\n]', '[\n  1,\n  "a\n]',
+                     '[1, 2] x', '[1,,2]', '[1 2]', '[\n  1\n  2\n]', '{"a": 1,}', 'nul']:
+            with open('test_contacts.json', 'w') as f:
+                f.write(text)
+            with pytest.raises(ValueError):
+                scan_json_file('test_contacts.json')
+
+    def test_file_stats_cache(self):
+        clear_file_stats_cache()
+        with open('test_contacts.json', 'w') as f:
+            f.write('[1, 2, 3]')
+        assert get_file_stats('test_contacts.json')['count'] == 3
+        mtime_ns = os.stat('test_contacts.json').st_mtime_ns
+        # same size and modification time: the remembered stats are returned
+        with open('test_contacts.json', 'w') as f:
+            f.write('[12, 345]')
+        os.utime('test_contacts.json', ns=(mtime_ns, mtime_ns))
+        assert get_file_stats('test_contacts.json')['count'] == 3
+        assert get_file_stats('test_contacts.json', use_cache=False)['count'] == 2
+        clear_file_stats_cache()
+        assert get_file_stats('test_contacts.json')['count'] == 2
+        # a new modification time is noticed
+        with open('test_contacts.json', 'w') as f:
+            f.write('[1, 2, 3]')
+        os.utime('test_contacts.json', ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+        assert get_file_stats('test_contacts.json')['count'] == 3
+
+
+# Problem 4 Tests: Sidecar search index
+class TestJsonIndex:
+    def setup_method(self):
+        self.cleanup()
+
+    def teardown_method(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file in ['test_contacts.json', 'test_contacts.json.idx', 'test_contacts.jsonl',
+                     'test_contacts.jsonl.idx']:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def test_indexed_search_matches_scan(self):
+        contacts = [
+            {'name': 'Zoë', 'phone': '555-0001', 'email': ''},
+            {'name': 'Bob', 'phone': 1, 'email': ''},
+            {'name': 'Zoë', 'phone': True, 'email': ''},
+            {'name': 'Ann', 'phone': '1', 'email': ''},
+            {'name': 'No phone'}
+        ]
+        queries = [('name', 'Zoë'), ('name', 'Nobody'), ('phone', 1), ('phone', '1'), ('phone', None)]
+        for filename in ['test_contacts.json', 'test_contacts.jsonl']:
+            save_contacts_to_file(contacts, filename)
+            expected = [search_json_file(filename, key, value) for key, value in queries]
+            assert index_json_file(filename, ['name', 'phone'])
+            with load_json_index(filename) as index:
+                assert index.keys == ['name', 'phone']
+                assert len(index.spans('name', 'Zoë')) == 2
+            assert [search_json_file(filename, key, value) for key, value in queries] == expected
+            assert expected[2] == [contacts[1], contacts[2]]
+
+    def test_stale_or_damaged_index_is_ignored(self):
+        save_contacts_to_file([{'name': 'Alice', 'phone': '555-0001', 'email': ''}], 'test_contacts.json')
+        index_json_file('test_contacts.json', ['name'])
+        assert load_json_index('test_contacts.json') is not None
+        # the index still points at Alice's old position, the scan finds Bob
+        save_contacts_to_file([{'name': 'Bob', 'phone': '555-0002', 'email': ''}], 'test_contacts.json')
+        assert load_json_index('test_contacts.json') is None
+        assert search_json_file('test_contacts.json', 'name', 'Bob')[0]['phone'] == '555-0002'
+        with open('test_contacts.json.idx', 'wb') as f:
+            f.write(b'PS4X' + bytes(40))
+        assert load_json_index('test_contacts.json') is None
+
+
+    def test_prefilter_search(self):
+        contacts = [
+            {'name': 'Zoë', 'note': '{"name": "Ann"}', 'phone': '555-0001'},
+            {'name': 'Ann', 'note': 'x}{', 'phone': '555-0002'},
+            {'name': 'Bob', 'note': 'Ann', 'phone': '555-0003'},
+            {'note': 'say "Ann"'}
+        ]
+        for ensure_ascii in [True, False]:
+            with open('test_contacts.json', 'w', encoding='utf-8') as f:
+                json.dump(contacts, f, indent=2, ensure_ascii=ensure_ascii)
+            for key, value in [('name', 'Ann'), ('name', 'Zoë'), ('note', 'Ann'), ('name', 'Nobody')]:
+                expected = search_json_file('test_contacts.json', key, value)
+                assert search_json_file('test_contacts.json', key, value, prefilter=True) == expected
+        save_contacts_to_file(contacts, 'test_contacts.jsonl')
+        assert search_json_file('test_contacts.jsonl', 'name', 'Ann', prefilter=True) == [contacts[1]]
+        assert search_json_file('missing.json', 'name', 'Ann', prefilter=True) == []
+
+    def test_prefilter_nested_records(self):
+        # an object nested in a record is not a record of its own
+        contacts = [
+            {'name': 'Bob', 'friends': [{'name': 'Alice'}, {'name': 'Ann', 'tags': [{}]}]},
+            {'name': 'Alice', 'friends': []},
+        ]
+        for indent in [None, 1, 2, 4]:
+            with open('test_contacts.json', 'w') as f:
+                json.dump(contacts if indent else contacts[:1], f, indent=indent)
+            for name in ['Alice', 'Ann', 'Bob']:
+                expected = search_json_file('test_contacts.json', 'name', name)
+                assert search_json_file('test_contacts.json', 'name', name, prefilter=True) == expected
+        assert search_json_file('test_contacts.json', 'name', 'Alice', prefilter=True) == [contacts[1]]
+        with open('test_contacts.json', 'w') as f:
+            json.dump(contacts[:1], f)
+        assert search_json_file('test_contacts.json', 'name', 'Alice', prefilter=True) == []
+
+    def test_prefilter_brace_inside_string(self):
+        # "{" and "[{" inside string values look like record starts
+        with open('test_contacts.json', 'w') as f:
+            f.write('[{"name":"a,{b","phone":"X"},{"name":"c","phone":"X"},'
+                    '{"name":"d [{\\"e\\": 1}","phone":"X"}]')
+        expected = search_json_file('test_contacts.json', 'phone', 'X')
+        assert [item['name'] for item in expected] == ['a,{b', 'c', 'd [{"e": 1}']
+        assert search_json_file('test_contacts.json', 'phone', 'X', prefilter=True) == expected
+
+
+# Problem 4 Tests: Byte-copy backups
+class TestBackup:
+    def setup_method(self):
+        self.cleanup()
+
+    def teardown_method(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file in ['test_contacts.json', 'test_backup.json', 'test_backup.json.meta', 'test_backup.json.tmp']:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def test_backup_copies_bytes(self):
+        with open('test_contacts.json', 'w') as f:
+            f.write('[{"name": "Alice"},\n {"name": "Zoë"}]')
+        assert backup_file('test_contacts.json', 'test_backup.json') == True
+        with open('test_contacts.json', 'rb') as source, open('test_backup.json', 'rb') as backup:
+            assert source.read() == backup.read()
+        assert backup_file('missing.json', 'test_backup.json') == False
+
+    def test_invalid_source_keeps_old_backup(self):
+        save_contacts_to_file([{'name': 'Alice', 'phone': '555-0001', 'email': ''}], 'test_contacts.json')
+        backup_file('test_contacts.json', 'test_backup.json')
+        with open('test_contacts.json', 'w') as f:
+            f.write('[{"name": "Ali')
+        assert validate_json_file('test_contacts.json') == False
+        assert backup_file('test_contacts.json', 'test_backup.json') == False
+        assert load_from_json('test_backup.json')[0]['name'] == 'Alice'
+        assert not os.path.exists('test_backup.json.tmp')
+        assert backup_file('test_contacts.json', 'test_backup.json', validate=False) == True
+
+    def test_incremental_backup(self):
+        save_contacts_to_file([{'name': 'Alice', 'phone': '555-0001', 'email': ''}], 'test_contacts.json')
+        assert backup_file('test_contacts.json', 'test_backup.json', incremental=True)
+        state = load_from_json('test_backup.json.meta')
+        assert state['size'] == os.path.getsize('test_contacts.json')
+        # an unchanged source is not copied again
+        os.remove('test_backup.json')
+        save_to_json([], 'test_backup.json')
+        assert backup_file('test_contacts.json', 'test_backup.json', incremental=True)
+        assert load_from_json('test_backup.json') == []
+        # same content with a new modification time: only the state is updated
+        os.utime('test_contacts.json', ns=(1, 1))
+        assert backup_file('test_contacts.json', 'test_backup.json', incremental=True)
+        assert load_from_json('test_backup.json') == []
+        assert load_from_json('test_backup.json.meta')['mtime_ns'] == 1
+        # changed content is copied
+        save_contacts_to_file([{'name': 'Bob', 'phone': '555-0002', 'email': ''}], 'test_contacts.json')
+        assert backup_file('test_contacts.json', 'test_backup.json', incremental=True)
+        assert load_from_json('test_backup.json')[0]['name'] == 'Bob'
+
+
+# Problem 4 Tests: Group commit writer
+class TestGroupCommitWriter:
+    def setup_method(self):
+        self.cleanup()
+
+    def teardown_method(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file in ['test_contacts.json', 'test_contacts.jsonl']:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def test_concurrent_appends_are_batched(self):
+        for filename in ['test_contacts.json', 'test_contacts.jsonl']:
+            save_contacts_to_file([{'name': 'Alice', 'phone': '555-0001', 'email': ''}], filename)
+            with GroupCommitWriter(filename, max_latency=0.01) as writer:
+                def append(number):
+                    for i in range(20):
+                        assert writer.append({'name': f'Person {number}-{i}', 'phone': '', 'email': ''})
+
+                threads = [threading.Thread(target=append, args=(n,)) for n in range(5)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                assert writer.writes == 100 and writer.commits < 100
+            assert len(load_contacts_from_file(filename)) == 101
+            assert not os.path.exists(filename + '.tmp')
+
+    def test_save_then_append_in_one_batch(self):
+        with GroupCommitWriter('test_contacts.json', max_latency=0.05) as writer:
+            saved = writer.save([{'name': 'Bob', 'phone': '555-0002', 'email': ''}], wait=False)
+            appended = writer.append({'name': 'Carol', 'phone': '555-0003', 'email': ''}, wait=False)
+            writer.flush()
+            assert saved.result() and appended.result()
+            assert writer.commits == 1
+        assert [c['name'] for c in load_contacts_from_file('test_contacts.json')] == ['Bob', 'Carol']
+        with pytest.raises(ValueError):
+            writer.append({'name': 'Dave', 'phone': '', 'email': ''})
+
+    def test_failed_write(self):
+        with GroupCommitWriter(os.path.join('missing_directory', 'contacts.json')) as writer:
+            assert writer.append({'name': 'Alice', 'phone': '', 'email': ''}) == False
+
+    def test_bad_contact_does_not_fail_its_batch(self):
+        with GroupCommitWriter('test_contacts.json', max_latency=0.05) as writer:
+            good = writer.append({'name': 'Alice', 'phone': '', 'email': ''}, wait=False)
+            bad = writer.append({'name': 'Bob', 'phone': object(), 'email': ''}, wait=False)
+            assert bad.done() and bad.result() == False
+            assert writer.save([{'name': 'Carol', 'phone': {1, 2}}]) == False
+            assert good.result() == True
+        assert [c['name'] for c in load_contacts_from_file('test_contacts.json')] == ['Alice']
+
+    def test_leftover_writes_keep_their_deadline(self):
+        class SlowWriter(GroupCommitWriter):
+            def _commit(self, batch):
+                time.sleep(0.5)
+                return super()._commit(batch)
+
+        contact = {'name': 'Alice', 'phone': '', 'email': ''}
+        with SlowWriter('test_contacts.jsonl', max_latency=1.0, max_batch=2) as writer:
+            start = time.monotonic()
+            first = [writer.append(contact, wait=False) for _ in range(2)]
+            time.sleep(0.05)
+            # arrive during the first commit: two fill the next batch, the third is left
+            # over and is due max_latency after it arrived, not after that batch was taken
+            later = [writer.append(contact, wait=False) for _ in range(3)]
+            assert all(future.result() for future in first + later)
+            assert time.monotonic() - start < 1.8
+        assert len(load_contacts_from_file('test_contacts.jsonl')) == 5
+
+
+# Problem 4 Tests: Streaming merge
+class TestMergeJsonFiles:
+    def setup_method(self):
+        self.cleanup()
+
+    def teardown_method(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file in ['test_a.json', 'test_b.jsonl', 'test_c.json', 'test_merged.json', 'test_merged.jsonl']:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def write_inputs(self):
+        save_to_json([{'id': 1, 'name': 'Alice'}, {'id': 4, 'name': 'Dave'}], 'test_a.json')
+        save_contacts_to_file([{'id': 2, 'name': 'Bob'}, {'id': 4, 'name': 'Dan'}], 'test_b.jsonl')
+        save_to_json([{'id': 3, 'name': 'Carol'}], 'test_c.json')
+        return ['test_a.json', 'test_b.jsonl', 'missing.json', 'test_c.json']
+
+    def test_concatenates_like_json_dump(self):
+        inputs = self.write_inputs()
+        assert merge_many_json_files(inputs, 'test_merged.json') == True
+        merged = load_from_json('test_merged.json')
+        assert [item['name'] for item in merged] == ['Alice', 'Dave', 'Bob', 'Dan', 'Carol']
+        with open('test_merged.json') as f:
+            assert f.read() == json.dumps(merged, indent=2)
+
+    def test_dedupe_key(self):
+        inputs = self.write_inputs()
+        assert merge_many_json_files(inputs, 'test_merged.json', dedupe_key='id') == True
+        assert [item['name'] for item in load_from_json('test_merged.json')] == ['Alice', 'Dave', 'Bob', 'Carol']
+
+    def test_dedupe_key_keeps_empty_values(self):
+        save_to_json([{'name': 'A', 'email': ''}, {'name': 'B'}, {'name': 'C', 'email': 'c@x.com'}], 'test_a.json')
+        save_to_json([{'name': 'D', 'email': ''}, {'name': 'E', 'email': ''}, {'name': 'F', 'email': 'c@x.com'}],
+                     'test_c.json')
+        assert merge_many_json_files(['test_a.json', 'test_c.json'], 'test_merged.json', dedupe_key='email') == True
+        assert [item['name'] for item in load_from_json('test_merged.json')] == ['A', 'B', 'C', 'D', 'E']
+        # sorted by the same field, the empty values are next to each other
+        assert merge_many_json_files(['test_c.json'], 'test_merged.json', dedupe_key='email', sort_key='email') == True
+        assert [item['name'] for item in load_from_json('test_merged.json')] == ['D', 'E', 'F']
+
+    def test_sorted_merge(self):
+        inputs = self.write_inputs()
+        assert merge_many_json_files(inputs, 'test_merged.jsonl', dedupe_key='id', sort_key='id') == True
+        merged = load_contacts_from_file('test_merged.jsonl')
+        assert [item['name'] for item in merged] == ['Alice', 'Bob', 'Carol', 'Dave']
+
+    def test_unsorted_input_keeps_old_output(self):
+        save_to_json([{'id': 0}], 'test_merged.json')
+        save_to_json([{'id': 2}, {'id': 1}], 'test_a.json')
+        assert merge_many_json_files(['test_a.json'], 'test_merged.json', sort_key='id') == False
+        assert load_from_json('test_merged.json') == [{'id': 0}]
+        assert not os.path.exists('test_merged.json.tmp')
+
+    def test_two_file_merge_skips_corrupt_input(self):
+        save_to_json([1, 2], 'test_a.json')
+        with open('test_c.json', 'w') as f:
+            f.write('[3, 4')
+        assert merge_json_files('test_a.json', 'test_c.json', 'test_merged.json') == True
+        assert load_from_json('test_merged.json') == [1, 2]
+        assert merge_json_files('test_c.json', 'test_a.json', 'test_merged.json') == True
+        assert load_from_json('test_merged.json') == [1, 2]
+        assert not os.path.exists('test_merged.json.tmp')
+        # merge_many_json_files() fails instead
+        assert merge_many_json_files(['test_a.json', 'test_c.json'], 'test_merged.jsonl') == False
+        assert not os.path.exists('test_merged.jsonl')
+
+
+# Problem 4 Tests: Binary contacts files
+class TestBinaryFormat:
+    def setup_method(self):
+        self.cleanup()
+
+    def teardown_method(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file in ['test_contacts.bin', 'test_contacts.json', 'test_contacts.jsonl', 'test_merged.bin']:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def test_compact_book_round_trip(self):
+        # Contact records of a compact book are saved as dictionaries in every format
+        book = ContactBook(compact=True)
+        book.add_contact("Alice", "555-0001", "alice@email.com")
+        book.add_contact("Zoë", "555-0002")
+        expected = [{'name': 'Alice', 'phone': '555-0001', 'email': 'alice@email.com'},
+                    {'name': 'Zoë', 'phone': '555-0002', 'email': ''}]
+        for filename in ['test_contacts.json', 'test_contacts.jsonl', 'test_contacts.bin']:
+            assert save_contacts_to_file(book.contacts, filename) == True
+            assert load_contacts_from_file(filename) == expected
+        assert append_contact_to_file(Contact("Bob", "555-0003"), 'test_contacts.jsonl') == True
+        assert load_contacts_from_file('test_contacts.jsonl')[-1] == {'name': 'Bob', 'phone': '555-0003', 'email': ''}
+        with GroupCommitWriter('test_contacts.json') as writer:
+            assert writer.append(Contact("Carol", "555-0004")) == True
+        assert load_contacts_from_file('test_contacts.json')[-1]['name'] == 'Carol'
+
+    def test_round_trip(self):
+        contacts = [
+            {'name': 'Alice', 'phone': '555-0001', 'email': ''},
+            {'name': 'Zoë', 'phone': '555-0002', 'email': ''},
+            {'name': 'Bob', 'age': 30, 'vip': True, 'note': None, 'score': 1.5},
+            {'name': 'Carol', 'tags': ['work', 'gym']},
+            {'name': 'A\0B'},
+            'not a dictionary',
+        ]
+        assert save_contacts_to_file(contacts, 'test_contacts.bin') == True
+        assert load_contacts_from_file('test_contacts.bin') == contacts
+        assert list(iter_contacts_from_file('test_contacts.bin')) == contacts
+        # repeated keys and values are stored once, so it is smaller than the JSON file
+        save_contacts_to_file(contacts * 100, 'test_contacts.json')
+        save_contacts_to_file(contacts * 100, 'test_contacts.bin')
+        assert os.path.getsize('test_contacts.bin') < os.path.getsize('test_contacts.json') / 2
+
+    def test_detected_by_content(self):
+        assert contacts_file_format('contacts.bin') == 'binary'
+        save_contacts_to_file([{'name': 'Alice', 'phone': '555-0001', 'email': ''}],
+                              'test_contacts.json', file_format='binary')
+        assert contacts_file_format('test_contacts.json') == 'binary'
+        append_contact_to_file({'name': 'Bob', 'phone': '555-0002', 'email': ''}, 'test_contacts.json')
+        assert [c['name'] for c in load_binary_contacts('test_contacts.json')] == ['Alice', 'Bob']
+        assert get_file_stats('test_contacts.json', use_cache=False)['count'] == 2
+        assert search_json_file('test_contacts.json', 'name', 'Bob', prefilter=True)[0]['phone'] == '555-0002'
+
+    def test_damaged_file(self):
+        save_contacts_to_file([{'name': 'Alice', 'phone': '555-0001', 'email': ''}] * 3, 'test_contacts.bin')
+        assert validate_json_file('test_contacts.bin') == True
+        with open('test_contacts.bin', 'rb') as f:
+            data = f.read()
+        with open('test_contacts.bin', 'wb') as f:
+            f.write(data[:-5])
+        assert validate_json_file('test_contacts.bin') == False
+        assert load_contacts_from_file('test_contacts.bin') == []
+        with pytest.raises(ValueError):
+            load_binary_contacts('test_contacts.bin')
+
+    def test_merge_into_binary(self):
+        save_to_json([{'id': 1}, {'id': 2}], 'test_contacts.json')
+        assert merge_many_json_files(['test_contacts.json', 'test_contacts.json'], 'test_merged.bin', dedupe_key='id')
+        assert load_contacts_from_file('test_merged.bin') == [{'id': 1}, {'id': 2}]
+
+
 # Bonus Tests: Recursion (Optional)
 class TestBonusRecursion:
     def test_recursion_available(self):